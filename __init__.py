@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
 
 from . import models
-from . import report
\ No newline at end of file
+from . import report
+from . import controllers
+from .hooks import pre_init_hook
\ No newline at end of file
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Contractor Statements',
-    'version': '1.0.0',
+    'version': '1.1.0',
     'category': 'Accounting/Accounting',
     'summary': 'Manage contractor statements and progress billing',
     'description': """
@@ -26,12 +26,21 @@
     'data': [
         'security/ir.model.access.csv',
         'data/sequence.xml',
+        'data/ir_cron.xml',
         'report/contractor_statement_report_template.xml',
         'report/contractor_statement_reports.xml',
         'views/contractor_statement_views.xml',
         'views/payment_method_views.xml',
         'views/contractor_analysis_views.xml',
+        'views/contractor_statement_account_views.xml',
+        'views/statement_performance_views.xml',
+        'views/res_users_views.xml',
+        'views/statement_archive_views.xml',
+        'views/progress_snapshot_views.xml',
+        'views/completion_forecast_views.xml',
+        'views/billing_run_views.xml',
     ],
+    'pre_init_hook': 'pre_init_hook',
     'installable': True,
     'auto_install': False,
     'application': True,
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import hmac
+import json
+
+from werkzeug.exceptions import BadRequest, NotFound
+
+from odoo import http
+from odoo.exceptions import ValidationError
+from odoo.http import request
+
+METRICS_TOKEN_PARAM = 'contractor_statement.metrics_token'
+
+
+class ContractorStatementController(http.Controller):
+
+    @http.route('/contractor_statement/metrics', type='http', auth='public', methods=['GET'], csrf=False)
+    def metrics(self, **kwargs):
+        """Prometheus scrape endpoint, served to administrators and to scrapers sending the
+        configured token as ``Authorization: Bearer <token>``"""
+        token = request.env['ir.config_parameter'].sudo().get_param(METRICS_TOKEN_PARAM)
+        authorization = request.httprequest.headers.get('Authorization', '')
+        scraper = bool(token) and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+        if not (scraper or request.env.user.has_group('base.group_system')):
+            raise NotFound()
+        body = request.env['contractor.performance.stat'].sudo().render_prometheus()
+        return request.make_response(body, headers=[('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')])
+
+    @http.route('/contractor_statement/kpis', type='http', auth='user', methods=['GET'], csrf=False)
+    def kpis(self, **kwargs):
+        """Dashboard KPIs per project and contractor, answered with 304 while nothing changed"""
+        request.env['contractor.statement'].check_access_rights('read')
+        etag, body = request.env['contractor.statement.kpi'].sudo().get_cached_kpis()
+        headers = [('ETag', f'"{etag}"'), ('Cache-Control', 'private, no-cache')]
+        if request.httprequest.if_none_match.contains(etag):
+            return request.make_response('', headers=headers, status=304)
+        return request.make_response(body, headers=headers + [('Content-Type', 'application/json')])
+
+    @http.route('/contractor_statement/export/<string:kind>', type='http', auth='user', methods=['GET'], csrf=False)
+    def export_ndjson(self, kind, fields=None, after_write_date=None, after_id=None, **kwargs):
+        """Stream statements or lines as NDJSON, ordered by (write_date, id).
+
+        Resume from the last exported row with ``after_write_date`` and ``after_id``;
+        ``fields`` is a comma-separated subset of the exported fields.
+        """
+        export = request.env['contractor.statement.export']
+        field_names = [name.strip() for name in fields.split(',') if name.strip()] if fields else None
+        after = None
+        if after_write_date or after_id:
+            if not (after_write_date and after_id):
+                raise BadRequest("after_write_date and after_id go together")
+            after = (after_write_date, after_id)
+        try:
+            # Access is checked now; the rows are streamed on a cursor of their own
+            rows = export._iter_ndjson(kind, field_names, after)
+        except ValidationError as e:
+            raise BadRequest(str(e))
+        return request.make_response(rows, headers=[('Content-Type', 'application/x-ndjson')])
+
+    @http.route('/contractor_statement/changes', type='http', auth='user', methods=['GET'], csrf=False)
+    def changes(self, after='0-0', limit='1000', **kwargs):
+        """Changes logged after the ``after`` watermark (``<txid>-<seq>``), with the watermark to send next time"""
+        txid, _sep, seq = after.partition('-')
+        if not (txid.isdigit() and seq.isdigit() and limit.isdigit()):
+            raise BadRequest("after must be a <txid>-<seq> watermark and limit an integer")
+        changes, (txid, seq) = request.env['contractor.change.log'].fetch_changes((int(txid), int(seq)), int(limit))
+        body = json.dumps({'changes': changes, 'watermark': f'{txid}-{seq}'})
+        return request.make_response(body, headers=[('Content-Type', 'application/json')])
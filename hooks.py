@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+from .models.schema import backfill_stored_computes
+
+
+def pre_init_hook(env):
+    """Backfill the stored computed columns in SQL when installing over existing tables"""
+    backfill_stored_computes(env.cr)
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+from odoo.addons.constructor.models.schema import backfill_stored_computes
+
+
+def migrate(cr, version):
+    # Columns created and filled here are left alone by the ORM during the update
+    backfill_stored_computes(cr)
@@ -2,4 +2,17 @@
 
 from . import contractor_statement
 from . import payment_method
+from . import res_users
+from . import statement_performance
+from . import contractor_benchmark
+from . import statement_archive
+from . import statement_kpi
+from . import date_dimension
+from . import progress_snapshot
+from . import billing_run
+from . import statement_export
+from . import change_log
+from . import price_index
+from . import contract_revision
+from . import completion_forecast
 # إضافة استيراد retention config
\ No newline at end of file
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import random
+import time
+
+from dateutil.relativedelta import relativedelta
+from psycopg2 import errors
+
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+
+_logger = logging.getLogger(__name__)
+
+BILLING_BATCH_SIZE = 20
+# A worker stops taking batches after this many seconds and re-triggers itself
+BILLING_WORKER_TIME_BUDGET = 240
+BILLING_WORKER_CRONS = [f'constructor.ir_cron_billing_run_worker_{i}' for i in range(1, 5)]
+# Raised when two workers number statements of the same project and work type; the batch is retried
+CONCURRENCY_ERRORS = (errors.SerializationFailure, errors.DeadlockDetected, errors.LockNotAvailable)
+
+
+class ContractorBillingRun(models.Model):
+    """Month-end run generating the next statement of every active contract"""
+    _name = 'contractor.billing.run'
+    _description = 'Contractor Billing Run'
+    _order = 'period_end desc, id desc'
+
+    name = fields.Char(string='Name', required=True, default=lambda self: f"Billing Run {fields.Date.today():%Y-%m}")
+    period_end = fields.Date(string='Period End', required=True,
+                             default=lambda self: fields.Date.today() + relativedelta(day=31))
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+    ], string='Status', default='draft', required=True, readonly=True)
+    line_ids = fields.One2many('contractor.billing.run.line', 'run_id', string='Contracts')
+    pending_count = fields.Integer(string='Pending', compute='_compute_counts')
+    done_count = fields.Integer(string='Created', compute='_compute_counts')
+    failed_count = fields.Integer(string='Failed', compute='_compute_counts')
+
+    @api.depends('line_ids.state')
+    def _compute_counts(self):
+        groups = self.env['contractor.billing.run.line']._read_group(
+            [('run_id', 'in', self.ids)], ['run_id', 'state'], ['__count'])
+        counts = {(run.id, state): count for run, state, count in groups}
+        for run in self:
+            run.pending_count = counts.get((run.id, 'pending'), 0)
+            run.done_count = counts.get((run.id, 'done'), 0)
+            run.failed_count = counts.get((run.id, 'failed'), 0)
+
+    def action_prepare(self):
+        """List every active (project, work type, contractor) of the contract quantities not billed in the period yet"""
+        for run in self:
+            if run.state != 'draft':
+                raise ValidationError("Only draft billing runs can be prepared.")
+            period_start = run.period_end + relativedelta(day=1)
+            self.env.flush_all()
+            self.env.cr.execute("""
+                INSERT INTO contractor_billing_run_line (run_id, project_id, work_type_id, contractor_id, state,
+                                                         create_uid, create_date, write_uid, write_date)
+                SELECT DISTINCT %(run)s, q.project_id, q.work_type_id, q.contractor_id, 'pending',
+                       %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+                FROM contract_quantity q
+                JOIN project_config p ON p.id = q.project_id AND p.active
+                JOIN work_type_config w ON w.id = q.work_type_id AND w.active
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM contractor_statement s
+                    WHERE s.project_id = q.project_id AND s.work_type_id = q.work_type_id
+                      AND s.contractor_id = q.contractor_id
+                      AND s.statement_date BETWEEN %(start)s AND %(end)s
+                )
+                AND NOT EXISTS (
+                    SELECT 1 FROM contractor_billing_run_line l
+                    WHERE l.run_id = %(run)s AND l.project_id = q.project_id
+                      AND l.work_type_id = q.work_type_id AND l.contractor_id = q.contractor_id
+                )
+            """, {'run': run.id, 'uid': self.env.uid, 'start': period_start, 'end': run.period_end})
+        self.env['contractor.billing.run.line'].invalidate_model()
+        return True
+
+    def action_start(self):
+        """Hand the pending contracts to the billing workers"""
+        if any(run.state != 'draft' for run in self):
+            raise ValidationError("Only draft billing runs can be started.")
+        self.filtered(lambda run: not run.line_ids).action_prepare()
+        self.state = 'running'
+        for xmlid in BILLING_WORKER_CRONS:
+            self.env.ref(xmlid)._trigger()
+        return True
+
+    def action_retry_failed(self):
+        """Put the failed contracts back in the queue"""
+        failed = self.line_ids.filtered(lambda line: line.state == 'failed')
+        failed.write({'state': 'pending', 'message': False})
+        self.filtered(lambda run: run.state == 'done').state = 'running'
+        for xmlid in BILLING_WORKER_CRONS:
+            self.env.ref(xmlid)._trigger()
+        return True
+
+    def action_view_statements(self):
+        return {
+            'name': 'Generated Statements',
+            'type': 'ir.actions.act_window',
+            'view_mode': 'tree,form',
+            'res_model': 'contractor.statement',
+            'domain': [('id', 'in', self.line_ids.statement_id.ids)],
+        }
+
+    @api.model
+    def _cron_process_billing_runs(self):
+        """Worker: take batches of pending contracts that no other worker holds, until none are left.
+
+        Several worker crons run this in parallel; SKIP LOCKED hands each batch to one worker only,
+        and every batch is committed on its own.
+        """
+        started = time.monotonic()
+        cr = self.env.cr
+        while time.monotonic() - started < BILLING_WORKER_TIME_BUDGET:
+            cr.execute("""
+                SELECT l.id FROM contractor_billing_run_line l
+                JOIN contractor_billing_run r ON r.id = l.run_id
+                WHERE l.state = 'pending' AND r.state = 'running'
+                ORDER BY l.project_id, l.work_type_id, l.id
+                LIMIT %s
+                FOR UPDATE OF l SKIP LOCKED
+            """, [BILLING_BATCH_SIZE])
+            line_ids = [row[0] for row in cr.fetchall()]
+            if not line_ids:
+                break
+            try:
+                self.env['contractor.billing.run.line'].browse(line_ids)._generate_statements()
+                cr.commit()  # pylint: disable=invalid-commit
+            except CONCURRENCY_ERRORS:
+                # The lines are still pending: retry them in a fresh transaction
+                cr.rollback()
+                self.env.invalidate_all()
+                time.sleep(random.uniform(0, 1))
+        else:
+            # Out of time budget: continue in a new cron run
+            self.env.ref(BILLING_WORKER_CRONS[0])._trigger()
+
+        # Close the runs that have nothing left to do
+        self.search([('state', '=', 'running')]).filtered(lambda run: not run.pending_count).state = 'done'
+
+
+class ContractorBillingRunLine(models.Model):
+    _name = 'contractor.billing.run.line'
+    _description = 'Contractor Billing Run Line'
+    _order = 'run_id, id'
+
+    run_id = fields.Many2one('contractor.billing.run', string='Billing Run', required=True, ondelete='cascade', index=True)
+    project_id = fields.Many2one('project.config', string='Project', required=True)
+    work_type_id = fields.Many2one('work.type.config', string='Work Type', required=True)
+    contractor_id = fields.Many2one('res.partner', string='Contractor', required=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Created'),
+        ('skipped', 'Already Billed'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True, index=True)
+    statement_id = fields.Many2one('contractor.statement', string='Statement', ondelete='set null')
+    message = fields.Text(string='Message')
+
+    def _generate_statements(self):
+        """Create the next statement of each contract, in one batch when possible"""
+        vals_list = self._prepare_statement_vals()
+        # The latest statement already covers the whole period: nothing is left to bill
+        billed = self.filtered(lambda line: vals_list[line]['work_period_from'] > vals_list[line]['work_period_to'])
+        billed.write({'state': 'skipped', 'message': "The work period is already billed by an earlier statement."})
+        lines = self - billed
+        if not lines:
+            return
+        try:
+            with self.env.cr.savepoint():
+                statements = self.env['contractor.statement'].create([vals_list[line] for line in lines])
+                statements.action_prefill_lines()
+            for line, statement in zip(lines, statements):
+                line.write({'state': 'done', 'statement_id': statement.id, 'message': False})
+            return
+        except CONCURRENCY_ERRORS:
+            raise
+        except Exception:
+            _logger.info("Billing batch failed, retrying contract by contract", exc_info=True)
+
+        # تحديد البند الذي سبب الخطأ
+        for line in lines:
+            try:
+                with self.env.cr.savepoint():
+                    statement = self.env['contractor.statement'].create(vals_list[line])
+                    statement.action_prefill_lines()
+                line.write({'state': 'done', 'statement_id': statement.id, 'message': False})
+            except CONCURRENCY_ERRORS:
+                raise
+            except Exception as e:
+                line.write({'state': 'failed', 'message': str(e)})
+
+    def _prepare_statement_vals(self):
+        """Return {line: statement values}, continuing the latest statement of each contract"""
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (project_id, work_type_id, contractor_id)
+                   project_id, work_type_id, contractor_id, id
+            FROM contractor_statement
+            WHERE (project_id, work_type_id, contractor_id) IN %s
+            ORDER BY project_id, work_type_id, contractor_id, statement_date DESC, id DESC
+        """, [tuple((line.project_id.id, line.work_type_id.id, line.contractor_id.id) for line in self)])
+        previous_ids = {tuple(row[:3]): row[3] for row in self.env.cr.fetchall()}
+        previous = self.env['contractor.statement'].browse(previous_ids.values())
+        previous_by_key = {(s.project_id.id, s.work_type_id.id, s.contractor_id.id): s for s in previous}
+
+        result = {}
+        for line in self:
+            period_end = line.run_id.period_end
+            period_start = period_end + relativedelta(day=1)
+            last = previous_by_key.get((line.project_id.id, line.work_type_id.id, line.contractor_id.id))
+            vals = {
+                'project_id': line.project_id.id,
+                'work_type_id': line.work_type_id.id,
+                'contractor_id': line.contractor_id.id,
+                'statement_date': period_end,
+                'work_period_from': period_start,
+                'work_period_to': period_end,
+            }
+            if last:
+                vals.update({
+                    'contractor_type': last.contractor_type,
+                    'work_period_from': max(period_start, last.work_period_to + relativedelta(days=1)),
+                    'journal_id': last.journal_id.id,
+                    'payment_method_id': last.payment_method_id.id,
+                    'retention_percentage': last.retention_percentage,
+                    'tax_ids': [fields.Command.set(last.tax_ids.ids)],
+                })
+            result[line] = vals
+        return result
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+RETENTION_PARAM = 'contractor_statement.change_log_retention_days'
+CHANGE_BATCH_SIZE = 1000
+# Captured table: natural key columns recorded with each change, so deleted rows stay identifiable
+CAPTURED_TABLES = {
+    'contractor_statement': ('project_id', 'work_type_id', 'contractor_id'),
+    'contractor_statement_line': ('statement_id', 'product_id'),
+    'contract_quantity': ('project_id', 'work_type_id', 'contractor_id', 'product_id'),
+    'contractor_quantity_tracker': ('project_id', 'work_type_id', 'contractor_id', 'product_id'),
+}
+OPERATIONS = {'INSERT': 'I', 'UPDATE': 'U', 'DELETE': 'D'}
+
+
+class ContractorChangeLog(models.Model):
+    """Change feed of statements, lines, contract quantities and quantity trackers.
+
+    Statement-level triggers write one row per changed record, so every write path is captured:
+    ORM writes and unlinks as well as the raw SQL of the tracker updates and cleanup, the
+    archiving moves and the cascaded line deletions.
+    """
+    _name = 'contractor.change.log'
+    _description = 'Contractor Change Log'
+    _auto = False
+    _table = 'contractor_change_log'
+    _order = 'id'
+    _log_access = False
+
+    table_name = fields.Char(string='Table', readonly=True)
+    record_id = fields.Integer(string='Record ID', readonly=True)
+    operation = fields.Selection([
+        ('I', 'Insert'),
+        ('U', 'Update'),
+        ('D', 'Delete'),
+    ], string='Operation', readonly=True)
+    record_key = fields.Json(string='Key', readonly=True)
+    changed_at = fields.Datetime(string='Changed At', readonly=True)
+
+    def init(self):
+        cr = self.env.cr
+        cr.execute("""
+            CREATE TABLE IF NOT EXISTS contractor_change_log (
+                id bigserial PRIMARY KEY,
+                table_name varchar NOT NULL,
+                record_id integer NOT NULL,
+                operation char(1) NOT NULL,
+                record_key jsonb,
+                changed_at timestamp NOT NULL DEFAULT (now() at time zone 'UTC'),
+                txid bigint NOT NULL DEFAULT txid_current()
+            );
+            CREATE INDEX IF NOT EXISTS contractor_change_log_changed_at_idx ON contractor_change_log (changed_at);
+            CREATE INDEX IF NOT EXISTS contractor_change_log_txid_id_idx ON contractor_change_log (txid, id);
+
+            CREATE OR REPLACE FUNCTION contractor_change_log_capture() RETURNS trigger AS $$
+            BEGIN
+                -- Transition tables only exist for the trigger's own event
+                IF TG_OP = 'DELETE' THEN
+                    INSERT INTO contractor_change_log (table_name, record_id, operation, record_key)
+                    SELECT TG_TABLE_NAME, r.id, 'D', (
+                        SELECT jsonb_object_agg(k, v) FROM jsonb_each(to_jsonb(r)) AS j (k, v) WHERE k = ANY (TG_ARGV)
+                    ) FROM old_rows r;
+                ELSE
+                    INSERT INTO contractor_change_log (table_name, record_id, operation, record_key)
+                    SELECT TG_TABLE_NAME, r.id, left(TG_OP, 1), (
+                        SELECT jsonb_object_agg(k, v) FROM jsonb_each(to_jsonb(r)) AS j (k, v) WHERE k = ANY (TG_ARGV)
+                    ) FROM new_rows r;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql;
+        """)
+        for table, key_columns in CAPTURED_TABLES.items():
+            arguments = ', '.join(f"'{column}'" for column in key_columns)
+            for operation, letter in OPERATIONS.items():
+                transition = 'OLD TABLE AS old_rows' if operation == 'DELETE' else 'NEW TABLE AS new_rows'
+                trigger = f'{table}_change_log_{letter.lower()}'
+                cr.execute(f"""
+                    DROP TRIGGER IF EXISTS {trigger} ON {table};
+                    CREATE TRIGGER {trigger} AFTER {operation} ON {table}
+                        REFERENCING {transition}
+                        FOR EACH STATEMENT EXECUTE FUNCTION contractor_change_log_capture({arguments});
+                """)
+
+    @api.model
+    def fetch_changes(self, after=(0, 0), limit=CHANGE_BATCH_SIZE):
+        """Return (changes, watermark): the changes logged after the ``after`` (txid, sequence number)
+        watermark, in that order.
+
+        Sequence numbers are taken before commit, so a transaction still running may commit a lower
+        number than one already visible. Only the changes of transactions older than every running one
+        are returned, and a transaction committing later has a higher txid: its changes sort after the
+        watermark whatever their sequence numbers, and a watermark never has to be revisited.
+        """
+        self.check_access_rights('read')
+        cr = self.env.cr
+        cr.execute("""
+            SELECT id, table_name, record_id, operation, record_key, changed_at, txid
+            FROM contractor_change_log
+            WHERE (txid, id) > (%s, %s) AND txid < txid_snapshot_xmin(txid_current_snapshot())
+            ORDER BY txid, id
+            LIMIT %s
+        """, (*after, min(limit, CHANGE_BATCH_SIZE)))
+        rows = cr.fetchall()
+        changes = [
+            {
+                'seq': seq,
+                'table': table_name,
+                'id': record_id,
+                'operation': operation,
+                'key': record_key,
+                'changed_at': changed_at.isoformat(),
+            }
+            for seq, table_name, record_id, operation, record_key, changed_at, _txid in rows
+        ]
+        return changes, (rows[-1][6], rows[-1][0]) if rows else tuple(after)
+
+    @api.model
+    def _cron_cleanup(self):
+        """Drop the changes older than the retention period (7 days by default)"""
+        days = int(self.env['ir.config_parameter'].sudo().get_param(RETENTION_PARAM, 7))
+        self.env.cr.execute("""
+            DELETE FROM contractor_change_log
+            WHERE changed_at < (now() at time zone 'UTC') - make_interval(days => %s)
+        """, (days,))
+        _logger.info("Change log cleanup: %s rows removed", self.env.cr.rowcount)
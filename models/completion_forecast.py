@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import math
+from operator import itemgetter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from odoo import models, fields, api
+from odoo.tools import groupby
+
+_logger = logging.getLogger(__name__)
+
+# Month-end snapshots per item the trend is fitted on
+FORECAST_WINDOW = 6
+# Items that would take longer than this many months to complete are reported as stalled
+FORECAST_HORIZON = 120
+
+
+class ContractorCompletionForecast(models.Model):
+    """Forecast completion date and cost at completion of each contract item (BOQ line).
+
+    A linear trend is fitted on the cumulative quantity of the item's last month-end progress
+    snapshots, for all items at once on NumPy arrays, and extended to the current contract
+    quantity. The scheduled refresh replaces the whole table, so the views only read stored rows.
+    """
+    _name = 'contractor.completion.forecast'
+    _description = 'Contractor Completion Forecast'
+    _order = 'project_id, contractor_id, forecast_date'
+
+    project_id = fields.Many2one('project.config', string='Project', required=True, readonly=True, ondelete='cascade')
+    work_type_id = fields.Many2one('work.type.config', string='Work Type', required=True, readonly=True, ondelete='cascade')
+    contractor_id = fields.Many2one('res.partner', string='Contractor', required=True, readonly=True, ondelete='cascade')
+    product_id = fields.Many2one('contractor.product', string='Product', required=True, readonly=True, ondelete='cascade')
+    last_period = fields.Date(string='Last Period', readonly=True)
+    contract_qty = fields.Float(string='Contract Qty', readonly=True)
+    billed_qty = fields.Float(string='Billed Qty', readonly=True)
+    billed_value = fields.Float(string='Billed Value', readonly=True)
+    remaining_qty = fields.Float(string='Remaining Qty', readonly=True)
+    monthly_rate = fields.Float(string='Monthly Rate', readonly=True, help="Quantity billed per month, from the trend")
+    forecast_date = fields.Date(string='Forecast Completion', readonly=True, group_operator='max')
+    cost_at_completion = fields.Float(string='Cost at Completion', readonly=True)
+    forecast_state = fields.Selection([
+        ('completed', 'Completed'),
+        ('forecast', 'Forecast'),
+        ('stalled', 'Stalled'),
+    ], string='Status', readonly=True)
+
+    @api.model
+    def _load_history(self):
+        """Return the snapshot rows the trends are fitted on, ordered by item and period:
+        (item, project, work type, contractor, product, month, contract qty, cumulative qty,
+        cumulative value, unit price), ``month`` counting months since year 0 and ``item``
+        numbering the items from 0"""
+        self.env.cr.execute("""
+            WITH history AS (
+                SELECT *, row_number() OVER (PARTITION BY project_id, work_type_id, contractor_id, product_id
+                                             ORDER BY snapshot_date DESC) AS age
+                FROM contractor_progress_snapshot
+            )
+            SELECT dense_rank() OVER (ORDER BY h.project_id, h.work_type_id, h.contractor_id, h.product_id) - 1,
+                   h.project_id, h.work_type_id, h.contractor_id, h.product_id,
+                   (extract(year FROM h.snapshot_date) * 12 + extract(month FROM h.snapshot_date) - 1)::integer,
+                   COALESCE(q.quantity, h.contract_qty, 0), h.cumulative_qty, h.cumulative_value,
+                   COALESCE(p.unit_price, 0)
+            FROM history h
+            LEFT JOIN contract_quantity q
+                   ON q.project_id = h.project_id AND q.work_type_id = h.work_type_id
+                  AND q.contractor_id = h.contractor_id AND q.product_id = h.product_id
+            LEFT JOIN contractor_price_index p
+                   ON p.project_id = h.project_id AND p.contractor_id = h.contractor_id AND p.product_id = h.product_id
+            WHERE h.age <= %s
+            ORDER BY h.project_id, h.work_type_id, h.contractor_id, h.product_id, h.snapshot_date
+        """, (FORECAST_WINDOW,))
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _forecast_vectorized(self, rows):
+        """Fit the trends of all items at once: least squares sums are accumulated per item with
+        bincount, so the work is a few array operations whatever the number of items"""
+        columns = list(zip(*rows))
+        item = numpy.array(columns[0], dtype=numpy.int64)
+        month = numpy.array(columns[5], dtype=float)
+        contract_qty, qty, value, unit_price = (numpy.array(column, dtype=float) for column in columns[6:10])
+
+        # Rows are ordered by item and period: the last row of each item is its latest snapshot
+        last = numpy.append(item[1:] != item[:-1], True)
+        last_month = month[last]
+        # Periods relative to the latest one keep the sums small
+        x = month - last_month[item]
+        count = numpy.bincount(item).astype(float)
+        sum_x = numpy.bincount(item, x)
+        sum_y = numpy.bincount(item, qty)
+        sum_xx = numpy.bincount(item, x * x)
+        sum_xy = numpy.bincount(item, x * qty)
+        denominator = count * sum_xx - sum_x ** 2
+        rate = numpy.zeros_like(count)
+        numpy.divide(count * sum_xy - sum_x * sum_y, denominator, out=rate, where=denominator > 0)
+
+        contract_qty, billed_qty, billed_value, unit_price = contract_qty[last], qty[last], value[last], unit_price[last]
+        remaining = contract_qty - billed_qty
+        months_left = numpy.full_like(rate, numpy.nan)
+        numpy.divide(remaining, rate, out=months_left, where=rate > 0)
+        completed = remaining <= 1e-6
+        forecast = ~completed & (months_left <= FORECAST_HORIZON)
+        completion_month = numpy.where(completed, last_month,
+                                       numpy.where(forecast, last_month + numpy.ceil(months_left), numpy.nan))
+        # Remaining work at the average rate billed so far, or the last agreed price before any billing
+        average_price = unit_price.copy()
+        numpy.divide(billed_value, billed_qty, out=average_price, where=billed_qty > 0)
+        cost = billed_value + numpy.maximum(remaining, 0) * average_price
+        state = numpy.where(completed, 'completed', numpy.where(forecast, 'forecast', 'stalled'))
+
+        keys = numpy.array(columns[1:5], dtype=numpy.int64).T[last]
+        return {
+            'project_id': keys[:, 0].tolist(),
+            'work_type_id': keys[:, 1].tolist(),
+            'contractor_id': keys[:, 2].tolist(),
+            'product_id': keys[:, 3].tolist(),
+            'last_month': last_month.tolist(),
+            'contract_qty': contract_qty.tolist(),
+            'billed_qty': billed_qty.tolist(),
+            'billed_value': billed_value.tolist(),
+            'remaining_qty': remaining.tolist(),
+            'monthly_rate': rate.tolist(),
+            'completion_month': completion_month.tolist(),
+            'cost_at_completion': cost.tolist(),
+            'forecast_state': state.tolist(),
+        }
+
+    @api.model
+    def _forecast_python(self, rows):
+        """Plain Python variant of _forecast_vectorized, used when NumPy is not installed"""
+        result = {fname: [] for fname in (
+            'project_id', 'work_type_id', 'contractor_id', 'product_id', 'last_month', 'contract_qty', 'billed_qty',
+            'billed_value', 'remaining_qty', 'monthly_rate', 'completion_month', 'cost_at_completion', 'forecast_state',
+        )}
+        for _item, item_rows in groupby(rows, key=itemgetter(0)):
+            latest = item_rows[-1]
+            last_month = latest[5]
+            points = [(row[5] - last_month, row[7]) for row in item_rows]
+            count = len(points)
+            sum_x = sum(x for x, y in points)
+            sum_y = sum(y for x, y in points)
+            denominator = count * sum(x * x for x, y in points) - sum_x ** 2
+            rate = (count * sum(x * y for x, y in points) - sum_x * sum_y) / denominator if denominator > 0 else 0.0
+
+            contract_qty, billed_qty, billed_value, unit_price = latest[6:10]
+            remaining = contract_qty - billed_qty
+            if remaining <= 1e-6:
+                state, completion_month = 'completed', last_month
+            elif rate > 0 and remaining / rate <= FORECAST_HORIZON:
+                state, completion_month = 'forecast', last_month + math.ceil(remaining / rate)
+            else:
+                state, completion_month = 'stalled', math.nan
+            average_price = billed_value / billed_qty if billed_qty > 0 else unit_price
+            values = latest[1:5] + (
+                last_month, contract_qty, billed_qty, billed_value, remaining, rate, completion_month,
+                billed_value + max(remaining, 0) * average_price, state,
+            )
+            for fname, value in zip(result, values):
+                result[fname].append(value)
+        return result
+
+    @api.model
+    def _cron_refresh(self):
+        """Recompute the forecasts of all contract items from the progress snapshots"""
+        rows = self._load_history()
+        self.env.cr.execute("DELETE FROM contractor_completion_forecast")
+        if rows:
+            forecasts = self._forecast_vectorized(rows) if numpy is not None else self._forecast_python(rows)
+            # Months since year 0 back to month-end dates; NaN (no forecast) becomes NULL
+            self.env.cr.execute("""
+                INSERT INTO contractor_completion_forecast (
+                    project_id, work_type_id, contractor_id, product_id, last_period, contract_qty, billed_qty,
+                    billed_value, remaining_qty, monthly_rate, forecast_date, cost_at_completion, forecast_state,
+                    create_uid, create_date, write_uid, write_date
+                )
+                SELECT f.project_id, f.work_type_id, f.contractor_id, f.product_id,
+                       (make_date(f.last_month::integer / 12, f.last_month::integer %% 12 + 1, 1)
+                        + interval '1 month - 1 day')::date,
+                       f.contract_qty, f.billed_qty, f.billed_value, f.remaining_qty, f.monthly_rate,
+                       (make_date(NULLIF(f.completion_month, 'NaN')::integer / 12,
+                                  NULLIF(f.completion_month, 'NaN')::integer %% 12 + 1, 1)
+                        + interval '1 month - 1 day')::date,
+                       f.cost_at_completion, f.forecast_state,
+                       %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+                FROM unnest(%(project_id)s::integer[], %(work_type_id)s::integer[], %(contractor_id)s::integer[],
+                            %(product_id)s::integer[], %(last_month)s::float8[], %(contract_qty)s::float8[],
+                            %(billed_qty)s::float8[], %(billed_value)s::float8[], %(remaining_qty)s::float8[],
+                            %(monthly_rate)s::float8[], %(completion_month)s::float8[],
+                            %(cost_at_completion)s::float8[], %(forecast_state)s::varchar[])
+                     AS f (project_id, work_type_id, contractor_id, product_id, last_month, contract_qty, billed_qty,
+                           billed_value, remaining_qty, monthly_rate, completion_month, cost_at_completion,
+                           forecast_state)
+            """, dict(forecasts, uid=self.env.uid))
+        _logger.info("Completion forecasts refreshed: %s items", self.env.cr.rowcount if rows else 0)
+        self.invalidate_model()
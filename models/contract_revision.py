@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+import psycopg2
+
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+
+from .schema import create_index_concurrently
+
+_logger = logging.getLogger(__name__)
+
+
+class ContractQuantityRevision(models.Model):
+    """Effective-dated quantity of a contract item (BOQ line).
+
+    The original quantity is a revision without start date; each variation order adds a revision
+    from its effective date, which ends the previous one. Statement lines read the quantity in
+    effect on their statement date, so a variation order leaves the statements billed before it alone.
+    """
+    _name = 'contract.quantity.revision'
+    _description = 'Contract Quantity Revision'
+    _order = 'contract_quantity_id, date_from'
+
+    contract_quantity_id = fields.Many2one('contract.quantity', string='Contract Quantity', required=True, ondelete='cascade')
+    name = fields.Char(string='Variation Order')
+    quantity = fields.Float(string='Quantity', required=True)
+    date_from = fields.Date(string='Effective From', help="Empty for the original contract quantity")
+    # Start of the next revision (excluded), maintained in SQL
+    date_to = fields.Date(string='Effective Until', readonly=True)
+
+    def init(self):
+        cr = self.env.cr
+        # Original revisions of the contract quantities created before revisions existed
+        cr.execute("""
+            INSERT INTO contract_quantity_revision (contract_quantity_id, quantity,
+                                                    create_uid, create_date, write_uid, write_date)
+            SELECT q.id, q.quantity, q.write_uid, now() at time zone 'UTC', q.write_uid, now() at time zone 'UTC'
+            FROM contract_quantity q
+            WHERE NOT EXISTS (SELECT 1 FROM contract_quantity_revision r WHERE r.contract_quantity_id = q.id)
+        """)
+        cr.execute("SELECT 1 FROM pg_constraint WHERE conname = 'contract_quantity_revision_no_overlap'")
+        if cr.fetchone():
+            return
+        # One GiST index on (key, validity period) serves the as-of lookups and rejects overlapping
+        # revisions; btree_gist provides the equality operator class of the key
+        try:
+            with cr.savepoint(flush=False):
+                cr.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+                cr.execute("""
+                    ALTER TABLE contract_quantity_revision
+                    ADD CONSTRAINT contract_quantity_revision_no_overlap
+                    EXCLUDE USING gist (contract_quantity_id WITH =, daterange(date_from, date_to) WITH &&)
+                    DEFERRABLE INITIALLY DEFERRED
+                """)
+        except psycopg2.Error:
+            _logger.warning("btree_gist is not available, indexing contract quantity revisions by key and start date",
+                            exc_info=True)
+            create_index_concurrently(cr, 'contract_quantity_revision_key_date_idx', 'contract_quantity_revision',
+                                      '(contract_quantity_id, date_from)')
+
+    @api.constrains('contract_quantity_id', 'date_from')
+    def _check_date_from(self):
+        groups = self._read_group([
+            ('contract_quantity_id', 'in', self.contract_quantity_id.ids),
+        ], ['contract_quantity_id', 'date_from:day'], ['__count'])
+        for contract, date_from, count in groups:
+            if count > 1:
+                raise ValidationError(
+                    f"{contract.display_name} already has a revision effective from {date_from or 'the contract start'}.")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        revisions = super().create(vals_list)
+        revisions._apply_revisions(revisions.contract_quantity_id)
+        return revisions
+
+    def write(self, vals):
+        contracts = self.contract_quantity_id
+        result = super().write(vals)
+        self._apply_revisions(contracts | self.contract_quantity_id)
+        return result
+
+    def unlink(self):
+        contracts = self.contract_quantity_id
+        result = super().unlink()
+        self._apply_revisions(contracts.exists())
+        return result
+
+    @api.model
+    def _apply_revisions(self, contracts):
+        """Close the revision periods of ``contracts``, set their current quantity to today's revision
+        and recompute the contract quantity of their statement lines"""
+        if not contracts:
+            return
+        self.flush_model(['contract_quantity_id', 'date_from'])
+        self.env.cr.execute("""
+            UPDATE contract_quantity_revision r
+            SET date_to = n.date_to
+            FROM (
+                SELECT id, lead(date_from) OVER (PARTITION BY contract_quantity_id ORDER BY date_from NULLS FIRST) AS date_to
+                FROM contract_quantity_revision
+                WHERE contract_quantity_id IN %s
+            ) n
+            WHERE n.id = r.id AND r.date_to IS DISTINCT FROM n.date_to
+        """, [tuple(contracts.ids)])
+        self.invalidate_model(['date_to'])
+
+        today = fields.Date.context_today(self)
+        current = self._get_quantities_as_of({(contract.id, today) for contract in contracts})
+        for contract in contracts:
+            quantity = current.get((contract.id, today))
+            if quantity is not None and quantity != contract.quantity:
+                contract.with_context(contract_revision_sync=True).quantity = quantity
+
+        keys = {
+            (contract.project_id.id, contract.work_type_id.id, contract.contractor_id.id, contract.product_id.id)
+            for contract in contracts
+        }
+        lines = self.env['contractor.statement.line'].search([
+            ('statement_id.project_id', 'in', contracts.project_id.ids),
+            ('statement_id.work_type_id', 'in', contracts.work_type_id.ids),
+            ('statement_id.contractor_id', 'in', contracts.contractor_id.ids),
+            ('product_id', 'in', contracts.product_id.ids),
+        ]).filtered(lambda line: line._get_quantity_key() in keys)
+        if lines:
+            self.env.add_to_compute(lines._fields['contract_qty'], lines)
+
+    @api.model
+    def _get_quantities_as_of(self, requests):
+        """Return {(contract quantity id, date): quantity in effect on that date} for the ``requests``
+        pairs, in one query probing the (key, validity period) index once per pair"""
+        requests = {(contract_id, date) for contract_id, date in requests if contract_id and date}
+        if not requests:
+            return {}
+        self.flush_model(['contract_quantity_id', 'quantity', 'date_from', 'date_to'])
+        contract_ids, dates = zip(*requests)
+        self.env.cr.execute("""
+            SELECT k.contract_quantity_id, k.date, r.quantity
+            FROM unnest(%s::integer[], %s::date[]) AS k (contract_quantity_id, date)
+            JOIN contract_quantity_revision r
+              ON r.contract_quantity_id = k.contract_quantity_id
+             AND daterange(r.date_from, r.date_to) @> k.date
+        """, [list(contract_ids), list(dates)])
+        return {(contract_id, date): quantity for contract_id, date, quantity in self.env.cr.fetchall()}
@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import statistics
+import time
+
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+
+from .schema import backfill_stored_computes
+
+_logger = logging.getLogger(__name__)
+
+BENCH_PREFIX = 'BENCH'
+
+
+class ContractorBenchmark(models.AbstractModel):
+    """Synthetic dataset generator and benchmark suite, meant to be run from ``odoo-bin shell``
+    on a dedicated database (see README). Private methods: not callable over RPC."""
+    _name = 'contractor.benchmark'
+    _description = 'Contractor Statement Benchmark'
+
+    # ------------------------------------------------------------------
+    # Dataset generation
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _generate_dataset(self, projects=2000, products=20000, contractors=200, work_types=10,
+                         contracts_per_project=2, items_per_contract=25, statements_per_contract=20, seed=0.42):
+        """Fill the database with a production-sized dataset using set-based SQL.
+
+        The defaults produce 2,000 projects, 20,000 products, 100,000 contract quantities,
+        80,000 statements and 2,000,000 statement lines. Stored computed columns are written
+        directly with the values the ORM would compute, and the original quantity revisions and
+        the price index are filled the way the ORM fills them.
+        """
+        if contracts_per_project > work_types:
+            raise ValidationError("Contracts per project cannot exceed the number of work types.")
+        if items_per_contract > products // work_types:
+            raise ValidationError("Items per contract cannot exceed the number of products per work type.")
+
+        cr = self.env.cr
+        company = self.env.company
+        expense_account = self.env['account.account'].search([
+            ('company_id', '=', company.id), ('account_type', '=', 'expense')], limit=1)
+        liability_account = self.env['account.account'].search([
+            ('company_id', '=', company.id), ('account_type', '=', 'liability_current')], limit=1)
+        journal = self.env['account.journal'].search([
+            ('company_id', '=', company.id), ('type', '=', 'general')], limit=1)
+        bank_journal = self.env['account.journal'].search([
+            ('company_id', '=', company.id), ('type', '=', 'bank')], limit=1)
+        if not (expense_account and liability_account and journal and bank_journal):
+            raise ValidationError("Please install a chart of accounts before generating the benchmark dataset.")
+
+        started = time.perf_counter()
+        self._generate_configuration(company, liability_account, bank_journal)
+        self.env.flush_all()
+
+        params = {
+            'prefix': BENCH_PREFIX,
+            'uid': self.env.uid,
+            'projects': projects,
+            'products': products,
+            'work_types': work_types,
+            'products_per_wt': products // work_types,
+            'contractors': contractors,
+            'cpp': contracts_per_project,
+            'items': items_per_contract,
+            'statements': statements_per_contract,
+            'account_id': expense_account.id,
+            'journal_id': journal.id,
+            'payment_method_id': self.env['payment.method.config'].search([('code', '=', BENCH_PREFIX)], limit=1).id,
+        }
+        cr.execute("SELECT setseed(%s)", (seed,))
+
+        _logger.info("Benchmark dataset: master data")
+        cr.execute("""
+            DROP TABLE IF EXISTS bench_wt, bench_project, bench_product, bench_partner, bench_combo,
+                                 bench_statement_src, bench_statement;
+
+            INSERT INTO work_type_config (name, code, active, create_uid, create_date, write_uid, write_date)
+            SELECT 'Bench Work Type ' || g, %(prefix)s || '-WT' || g, true,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM generate_series(1, %(work_types)s) g
+            ON CONFLICT (code) DO NOTHING;
+
+            INSERT INTO project_config (name, code, active, create_uid, create_date, write_uid, write_date)
+            SELECT 'Bench Project ' || g, %(prefix)s || '-P' || g, true,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM generate_series(1, %(projects)s) g
+            ON CONFLICT (code) DO NOTHING;
+
+            CREATE TEMP TABLE bench_wt ON COMMIT DROP AS
+            SELECT row_number() OVER (ORDER BY id) - 1 AS idx, id, name, code
+            FROM work_type_config WHERE code LIKE %(prefix)s || '-WT%%';
+
+            INSERT INTO contractor_product (name, code, unit, work_type_id, active, account_type, in_account_id,
+                                            create_uid, create_date, write_uid, write_date)
+            SELECT 'Bench Item ' || g, %(prefix)s || '-I' || g, (ARRAY['m3', 'm2', 'm', 'ton', 'no'])[1 + g %% 5],
+                   wt.id, true, 'in', %(account_id)s,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM generate_series(1, %(products)s) g
+            JOIN bench_wt wt ON wt.idx = g %% %(work_types)s
+            ON CONFLICT (code) DO NOTHING;
+
+            CREATE TEMP TABLE bench_project ON COMMIT DROP AS
+            SELECT row_number() OVER (ORDER BY id) - 1 AS idx, id, name, code
+            FROM project_config WHERE code LIKE %(prefix)s || '-P%%';
+
+            CREATE TEMP TABLE bench_product ON COMMIT DROP AS
+            SELECT row_number() OVER (PARTITION BY work_type_id ORDER BY id) - 1 AS idx, id, name, unit, work_type_id
+            FROM contractor_product WHERE code LIKE %(prefix)s || '-I%%';
+        """, params)
+
+        # Partners go through the ORM: they are few and res.partner has many defaults
+        existing = self.env['res.partner'].search_count([('ref', '=like', BENCH_PREFIX + '-C%')])
+        self.env['res.partner'].create([{
+            'name': f'Bench Contractor {i}',
+            'ref': f'{BENCH_PREFIX}-C{i}',
+            'is_company': True,
+        } for i in range(existing + 1, contractors + 1)])
+        self.env.flush_all()
+        cr.execute("""
+            CREATE TEMP TABLE bench_partner ON COMMIT DROP AS
+            SELECT row_number() OVER (ORDER BY id) - 1 AS idx, id, name
+            FROM res_partner WHERE ref LIKE %(prefix)s || '-C%%'
+            LIMIT %(contractors)s;
+
+            CREATE TEMP TABLE bench_combo ON COMMIT DROP AS
+            SELECT p.idx * %(cpp)s + k AS idx, p.id AS project_id, p.code AS project_code, p.name AS project_name,
+                   wt.id AS work_type_id, wt.code AS work_type_code, wt.name AS work_type_name,
+                   c.id AS contractor_id, c.name AS contractor_name, c.idx AS contractor_idx
+            FROM bench_project p
+            CROSS JOIN generate_series(0, %(cpp)s - 1) k
+            JOIN bench_wt wt ON wt.idx = (p.idx + k) %% %(work_types)s
+            JOIN bench_partner c ON c.idx = (p.idx * %(cpp)s + k) %% %(contractors)s;
+        """, params)
+
+        _logger.info("Benchmark dataset: contract quantities")
+        cr.execute("""
+            INSERT INTO contract_quantity (project_id, work_type_id, contractor_id, product_id, quantity, display_name,
+                                           create_uid, create_date, write_uid, write_date)
+            SELECT cb.project_id, cb.work_type_id, cb.contractor_id, pr.id,
+                   round((100 + random() * 9900)::numeric, 2)::float8,
+                   cb.project_name || ' - ' || cb.work_type_name || ' - ' || cb.contractor_name || ' - ' || pr.name,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM bench_combo cb
+            CROSS JOIN generate_series(0, %(items)s - 1) i
+            JOIN bench_product pr ON pr.work_type_id = cb.work_type_id
+                                 AND pr.idx = (cb.idx * %(items)s + i) %% %(products_per_wt)s
+            ON CONFLICT DO NOTHING;
+
+            -- Original revision of each contract quantity, as ContractQuantity.create makes it
+            INSERT INTO contract_quantity_revision (contract_quantity_id, quantity,
+                                                    create_uid, create_date, write_uid, write_date)
+            SELECT q.id, q.quantity, %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM contract_quantity q
+            JOIN bench_project p ON p.id = q.project_id
+            WHERE NOT EXISTS (SELECT 1 FROM contract_quantity_revision r WHERE r.contract_quantity_id = q.id);
+        """, params)
+
+        _logger.info("Benchmark dataset: statements")
+        cr.execute("""
+            CREATE TEMP TABLE bench_statement_src ON COMMIT DROP AS
+            SELECT cb.*, s.n,
+                   cb.project_code || '-' || cb.work_type_code || '-' || lpad((s.n + 1)::text, 3, '0') AS name,
+                   (date '2015-01-31' + s.n * interval '1 month')::date AS statement_date,
+                   CASE
+                       WHEN s.n = %(statements)s - 1 THEN 'draft'
+                       WHEN s.n = %(statements)s - 2 THEN 'confirmed'
+                       WHEN s.n = %(statements)s - 3 THEN 'approved'
+                       ELSE 'paid'
+                   END AS state
+            FROM bench_combo cb
+            CROSS JOIN generate_series(0, %(statements)s - 1) s(n);
+
+            INSERT INTO contractor_statement (name, project_id, work_type_id, contractor_id, contractor_type,
+                                              statement_date, work_period_from, work_period_to, state,
+                                              journal_id, payment_method_id, retention_percentage,
+                                              advance_payment_deduction, other_deductions, retention,
+                                              created_by, created_date, create_uid, create_date, write_uid, write_date)
+            SELECT src.name, src.project_id, src.work_type_id, src.contractor_id,
+                   CASE WHEN src.contractor_idx %% 5 = 0 THEN 'sub' ELSE 'main' END,
+                   src.statement_date, (src.statement_date - interval '1 month' + interval '1 day')::date, src.statement_date,
+                   src.state, %(journal_id)s, %(payment_method_id)s, 5.0, 0.0, 0.0, 0.0,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM bench_statement_src src
+            WHERE NOT EXISTS (SELECT 1 FROM contractor_statement s WHERE s.name = src.name);
+
+            CREATE TEMP TABLE bench_statement ON COMMIT DROP AS
+            SELECT s.id, src.project_id, src.work_type_id, src.contractor_id, src.n, src.state
+            FROM contractor_statement s
+            JOIN bench_statement_src src ON src.name = s.name;
+        """, params)
+
+        _logger.info("Benchmark dataset: statement lines")
+        cr.execute("""
+            INSERT INTO contractor_statement_line (statement_id, sequence, product_id, description, unit,
+                                                   contract_qty, prev_qty, current_qty, total_qty, remaining_qty,
+                                                   progress_percent, unit_price, current_value, total_value,
+                                                   create_uid, create_date, write_uid, write_date)
+            SELECT st.id, row_number() OVER (PARTITION BY st.id ORDER BY cq.id), cq.product_id, pr.name, pr.unit,
+                   cq.quantity, q.cur * st.n, q.cur, q.cur * (st.n + 1), cq.quantity - q.cur * (st.n + 1),
+                   q.cur * (st.n + 1) / cq.quantity * 100, q.price, q.cur * q.price, q.cur * (st.n + 1) * q.price,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM bench_statement st
+            JOIN contract_quantity cq ON cq.project_id = st.project_id
+                                     AND cq.work_type_id = st.work_type_id
+                                     AND cq.contractor_id = st.contractor_id
+            JOIN contractor_product pr ON pr.id = cq.product_id
+            CROSS JOIN LATERAL (
+                SELECT round((cq.quantity * 0.9 / %(statements)s)::numeric, 2)::float8 AS cur,
+                       (10 + pr.id %% 490)::float8 AS price
+            ) q
+            WHERE NOT EXISTS (SELECT 1 FROM contractor_statement_line l WHERE l.statement_id = st.id);
+
+            UPDATE contractor_statement s
+            SET gross_value = agg.gross,
+                retention = agg.gross * s.retention_percentage / 100,
+                tax_amount = 0.0,
+                subtotal = agg.gross,
+                total_deductions = agg.gross * s.retention_percentage / 100,
+                net_payable = agg.gross - agg.gross * s.retention_percentage / 100
+            FROM (
+                SELECT l.statement_id, SUM(l.current_value) AS gross
+                FROM contractor_statement_line l
+                JOIN bench_statement st ON st.id = l.statement_id
+                GROUP BY l.statement_id
+            ) agg
+            WHERE s.id = agg.statement_id;
+        """, params)
+
+        _logger.info("Benchmark dataset: quantity tracker")
+        cr.execute("""
+            INSERT INTO contractor_quantity_tracker (project_id, work_type_id, contractor_id, product_id,
+                                                     accumulated_quantity, last_updated, display_name,
+                                                     create_uid, create_date, write_uid, write_date)
+            SELECT st.project_id, st.work_type_id, st.contractor_id, l.product_id, SUM(l.current_qty),
+                   now() at time zone 'UTC', cq.display_name,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM contractor_statement_line l
+            JOIN bench_statement st ON st.id = l.statement_id
+            JOIN contract_quantity cq ON cq.project_id = st.project_id
+                                     AND cq.work_type_id = st.work_type_id
+                                     AND cq.contractor_id = st.contractor_id
+                                     AND cq.product_id = l.product_id
+            WHERE st.state != 'draft'
+            GROUP BY st.project_id, st.work_type_id, st.contractor_id, l.product_id, cq.display_name
+            ON CONFLICT (project_id, work_type_id, contractor_id, product_id)
+            DO UPDATE SET accumulated_quantity = EXCLUDED.accumulated_quantity
+        """, params)
+
+        _logger.info("Benchmark dataset: stored computes and price index")
+        # Billed and remaining quantities of the contract quantities
+        backfill_stored_computes(cr)
+        self.env.invalidate_all()
+        self.env['contractor.price.index']._rebuild()
+
+        for table in ('contract_quantity', 'contract_quantity_revision', 'contractor_statement',
+                      'contractor_statement_line', 'contractor_quantity_tracker', 'contractor_price_index'):
+            cr.execute(f"ANALYZE {table}")
+        self.env.invalidate_all()
+        _logger.info("Benchmark dataset generated in %.1fs", time.perf_counter() - started)
+        return self._get_dataset_counts()
+
+    def _generate_configuration(self, company, liability_account, bank_journal):
+        """Default retention, deductions and payment method configuration used by the dataset"""
+        if not self.env['retention.config'].search_count([('is_default', '=', True)]):
+            self.env['retention.config'].create({'is_default': True, 'retention_percentage': 5.0})
+        if not self.env['deductions.config'].search_count([('is_default', '=', True), ('company_id', '=', company.id)]):
+            self.env['deductions.config'].create({
+                'name': 'Benchmark Deductions',
+                'is_default': True,
+                'company_id': company.id,
+                'advance_payment_account_id': liability_account.id,
+                'retention_account_id': liability_account.id,
+                'other_deductions_account_id': liability_account.id,
+            })
+        if not self.env['payment.method.config'].search_count([('code', '=', BENCH_PREFIX)]):
+            self.env['payment.method.config'].create({
+                'name': 'Benchmark Transfer',
+                'code': BENCH_PREFIX,
+                'journal_id': bank_journal.id,
+            })
+
+    @api.model
+    def _get_dataset_counts(self):
+        counts = {}
+        for model in ('project.config', 'contractor.product', 'contract.quantity', 'contractor.statement',
+                      'contractor.statement.line', 'contractor.quantity.tracker'):
+            self.env.cr.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", (self.env[model]._table,))
+            counts[model] = self.env.cr.fetchone()[0]
+        return counts
+
+    # ------------------------------------------------------------------
+    # Benchmarks
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _run_benchmarks(self, repeat=3):
+        """Time the statement hot paths and return machine-readable results.
+
+        Every run is rolled back to a savepoint, so the dataset is left untouched and runs are
+        comparable.
+        """
+        samples = self._get_benchmark_samples()
+        cases = [
+            ('line_computes', self._bench_line_computes, samples['draft']),
+            ('action_confirm', lambda s: s.action_confirm(), samples['draft']),
+            ('action_approve', lambda s: s.action_approve(), samples['confirmed']),
+            ('action_mark_as_paid', lambda s: s.action_mark_as_paid(), samples['approved']),
+            ('export_lines', self._bench_export_lines, samples['draft']),
+            ('export_statements', self._bench_export_statements, samples['recent']),
+            ('report_html', self._bench_report_html, samples['draft']),
+            ('report_pdf', self._bench_report_pdf, samples['draft']),
+            ('analysis_read_group_project', self._bench_analysis_by_project, None),
+            ('analysis_read_group_month', self._bench_analysis_by_month, None),
+        ]
+        module = self.env['ir.module.module'].sudo().search([('name', '=', self._module)], limit=1)
+        results = {
+            'module': self._module,
+            'version': module.latest_version,
+            'database': self.env.cr.dbname,
+            'timestamp': fields.Datetime.now().isoformat(),
+            'repeat': repeat,
+            'dataset': self._get_dataset_counts(),
+            'samples': {key: len(value) for key, value in samples.items()},
+            'benchmarks': {},
+        }
+        for name, func, records in cases:
+            _logger.info("Benchmark %s", name)
+            results['benchmarks'][name] = self._run_case(func, records, repeat)
+        return results
+
+    def _run_case(self, func, records, repeat):
+        if records is not None and not records:
+            return {'skipped': 'no sample records'}
+        cr = self.env.cr
+        timings = []
+        queries = []
+        for __ in range(repeat):
+            self.env.invalidate_all()
+            cr.execute("SAVEPOINT contractor_benchmark")
+            try:
+                query_count = cr.sql_log_count
+                start = time.perf_counter()
+                func(records)
+                self.env.flush_all()
+                timings.append(time.perf_counter() - start)
+                queries.append(cr.sql_log_count - query_count)
+            except Exception as e:
+                return {'error': str(e)}
+            finally:
+                cr.execute("ROLLBACK TO SAVEPOINT contractor_benchmark")
+                cr.execute("RELEASE SAVEPOINT contractor_benchmark")
+                self.env.invalidate_all(flush=False)
+        return {
+            'runs': len(timings),
+            'records': len(records) if records is not None else None,
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'max': max(timings),
+            'queries': max(queries),
+        }
+
+    @api.model
+    def _get_benchmark_samples(self):
+        """Pick the largest statement of each state, and the most recent statements for list exports"""
+        Statement = self.env['contractor.statement']
+        samples = {}
+        for state in ('draft', 'confirmed', 'approved'):
+            self.env.cr.execute("""
+                SELECT s.id
+                FROM contractor_statement s
+                JOIN contractor_statement_line l ON l.statement_id = s.id
+                WHERE s.state = %s
+                GROUP BY s.id
+                ORDER BY COUNT(*) DESC, s.id
+                LIMIT 1
+            """, (state,))
+            samples[state] = Statement.browse([row[0] for row in self.env.cr.fetchall()])
+        samples['recent'] = Statement.search([], limit=1000, order='statement_date desc, id desc')
+        return samples
+
+    def _bench_line_computes(self, statement):
+        lines = statement.statement_line_ids
+        for fname, field in lines._fields.items():
+            if field.compute and field.store:
+                self.env.add_to_compute(field, lines)
+        for fname, field in statement._fields.items():
+            if field.compute == '_compute_amounts':
+                self.env.add_to_compute(field, statement)
+
+    def _bench_export_lines(self, statement):
+        statement.statement_line_ids.export_data([
+            'statement_id/name', 'product_id/name', 'unit', 'contract_qty', 'prev_qty', 'current_qty',
+            'total_qty', 'progress_percent', 'unit_price', 'current_value', 'total_value',
+        ])
+
+    def _bench_export_statements(self, statements):
+        statements.export_data([
+            'name', 'project_id/name', 'work_type_id/name', 'contractor_id/name', 'statement_date',
+            'gross_value', 'tax_amount', 'total_deductions', 'net_payable', 'state',
+        ])
+
+    def _bench_report_html(self, statement):
+        self.env['ir.actions.report']._render_qweb_html(
+            f'{self._module}.action_report_contractor_statement', statement.ids)
+
+    def _bench_report_pdf(self, statement):
+        self.env['ir.actions.report']._render_qweb_pdf(
+            f'{self._module}.action_report_contractor_statement', statement.ids)
+
+    def _bench_analysis_by_project(self, records):
+        self.env['contractor.statement.analysis.report'].read_group(
+            [], ['net_payable:sum', 'gross_value:sum', 'progress_percent:avg'], ['project_id'])
+
+    def _bench_analysis_by_month(self, records):
+        self.env['contractor.statement.analysis.report'].read_group(
+            [], ['net_payable:sum', 'gross_value:sum'], ['statement_date:month', 'contractor_type'], lazy=False)
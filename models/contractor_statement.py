@@ -1,8 +1,42 @@
 # -*- coding: utf-8 -*-
 
 import logging
+import random
+import time
+from collections import defaultdict
+
+from psycopg2 import errors
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
+from odoo.tools import groupby, split_every
+from odoo.tools.lru import LRU
+
+from .statement_performance import instrument
+
+_logger = logging.getLogger(__name__)
+
+# Tracker keys are locked up front, in key order, with a bounded wait and a few local retries;
+# past that the LockNotAvailable error reaches Odoo, which retries the whole request.
+TRACKER_LOCK_TIMEOUT = '2s'
+TRACKER_LOCK_RETRIES = 3
+TRACKER_LOCK_BACKOFF = 0.1
+
+# {(dbname, tax ids, taxes version, base, currency id): account.tax compute_all result}
+_tax_results_cache = LRU(4096)
+
+# Below this many lines the plain Python loop of _compute_line_amounts is faster than building arrays
+VECTORIZE_MIN_LINES = 500
+# Statements planned per batch by the posting simulator
+SIMULATION_BATCH_SIZE = 500
+# Relative difference from the last agreed unit price above which a line is flagged
+PRICE_DEVIATION_TOLERANCE = 0.05
+
 
 class ContractorStatement(models.Model):
     _name = 'contractor.statement'
@@ -71,40 +105,94 @@ class ContractorStatement(models.Model):
     paid_by = fields.Many2one('res.users', string='Paid By', readonly=True)
     paid_date = fields.Datetime(string='Paid Date', readonly=True)
 
+    def init(self):
+        # Last statement number per project and work type, see _assign_statement_names
+        self.env.cr.execute("""
+            CREATE TABLE IF NOT EXISTS contractor_statement_number (
+                project_id integer NOT NULL,
+                work_type_id integer NOT NULL,
+                last_number integer NOT NULL,
+                PRIMARY KEY (project_id, work_type_id)
+            )
+        """)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self._assign_statement_names(vals_list)
+        return super(ContractorStatement, self).create(vals_list)
+
     @api.model
-    def create(self, vals):
-        if vals.get('name', 'New') == 'New':
-            project_id = vals.get('project_id')
-            work_type_id = vals.get('work_type_id')
-            
-            if project_id and work_type_id:
-                project = self.env['project.config'].browse(project_id)
-                work_type = self.env['work.type.config'].browse(work_type_id)
-                
-                # البحث عن آخر مستخلص بنفس المشروع ونوع العمل
-                existing_statements = self.search([
-                    ('project_id', '=', project_id),
-                    ('work_type_id', '=', work_type_id)
-                ], order='name desc', limit=1)
-                
-                if existing_statements:
-                    # استخراج الرقم من آخر مستخلص وزيادته
-                    last_name = existing_statements[0].name
-                    parts = last_name.split('-')
-                    if len(parts) >= 3:
-                        try:
-                            last_number = int(parts[-1])
-                            next_number = last_number + 1
-                        except ValueError:
-                            next_number = 1
-                    else:
-                        next_number = 1
-                else:
-                    next_number = 1
-                
-                vals['name'] = f"{project.code}-{work_type.code}-{next_number:03d}"
-        
-        return super(ContractorStatement, self).create(vals)
+    def _assign_statement_names(self, vals_list):
+        """Name new statements {project code}-{work type code}-{NNN}.
+
+        Numbers are reserved in bulk from the contractor_statement_number counters, seeded from
+        the existing (live and archived) statement names; concurrent transactions numbering the
+        same project and work type wait on the counter row instead of reusing a number.
+        """
+        to_name = [
+            vals for vals in vals_list
+            if vals.get('name', 'New') == 'New' and vals.get('project_id') and vals.get('work_type_id')
+        ]
+        if not to_name:
+            return
+        amounts = defaultdict(int)
+        for vals in to_name:
+            amounts[(vals['project_id'], vals['work_type_id'])] += 1
+        keys = sorted(amounts)
+        values = ', '.join(['(%s, %s, %s)'] * len(keys))
+        params = [value for key in keys for value in (*key, amounts[key])]
+
+        cr = self.env.cr
+        # البحث عن آخر رقم مستخلص بنفس المشروع ونوع العمل (مرة واحدة لكل مفتاح)
+        cr.execute("""
+            WITH requested (project_id, work_type_id, amount) AS (VALUES %s),
+            missing AS (
+                SELECT r.project_id, r.work_type_id FROM requested r
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM contractor_statement_number n
+                    WHERE n.project_id = r.project_id AND n.work_type_id = r.work_type_id
+                )
+            ),
+            existing AS (
+                SELECT s.project_id, s.work_type_id, substring(s.name from '-([0-9]+)$')::int AS number
+                FROM contractor_statement s JOIN missing m USING (project_id, work_type_id)
+                UNION ALL
+                SELECT s.project_id, s.work_type_id, substring(s.name from '-([0-9]+)$')::int
+                FROM contractor_statement_archive s JOIN missing m USING (project_id, work_type_id)
+            )
+            INSERT INTO contractor_statement_number (project_id, work_type_id, last_number)
+            SELECT m.project_id, m.work_type_id, COALESCE(MAX(e.number), 0)
+            FROM missing m
+            LEFT JOIN existing e ON e.project_id = m.project_id AND e.work_type_id = m.work_type_id
+            GROUP BY m.project_id, m.work_type_id
+            ON CONFLICT (project_id, work_type_id) DO NOTHING
+        """ % values, params)
+        # Lock the counters in key order, then reserve the numbers
+        cr.execute("""
+            SELECT 1 FROM contractor_statement_number
+            WHERE (project_id, work_type_id) IN %s
+            ORDER BY project_id, work_type_id
+            FOR UPDATE
+        """, [tuple(keys)])
+        cr.execute("""
+            WITH requested (project_id, work_type_id, amount) AS (VALUES %s)
+            UPDATE contractor_statement_number n
+            SET last_number = n.last_number + r.amount
+            FROM requested r
+            WHERE n.project_id = r.project_id AND n.work_type_id = r.work_type_id
+            RETURNING n.project_id, n.work_type_id, n.last_number - r.amount
+        """ % values, params)
+        next_numbers = {(project_id, work_type_id): number for project_id, work_type_id, number in cr.fetchall()}
+
+        projects = self.env['project.config'].browse([key[0] for key in keys])
+        work_types = self.env['work.type.config'].browse([key[1] for key in keys])
+        project_codes = {project.id: project.code for project in projects}
+        work_type_codes = {work_type.id: work_type.code for work_type in work_types}
+        for vals in to_name:
+            key = (vals['project_id'], vals['work_type_id'])
+            next_numbers[key] += 1
+            vals['name'] = f"{project_codes[key[0]]}-{work_type_codes[key[1]]}-{next_numbers[key]:03d}"
+
     @api.onchange('project_id', 'work_type_id')
     def _onchange_project_work_type_deductions(self):
         """Update deduction accounts and retention percentage when project or work type changes"""
@@ -131,23 +219,23 @@ class ContractorStatement(models.Model):
 
     # FIXED: Updated calculation logic
     @api.depends('statement_line_ids.current_value', 'tax_ids', 'advance_payment_deduction', 'other_deductions', 'retention')
+    @instrument
     def _compute_amounts(self):
+        # 1. حساب القيمة الإجمالية
         for record in self:
-            # 1. حساب القيمة الإجمالية
-            record.gross_value = sum(line.current_value for line in record.statement_line_ids)
-            
-            # 2. حساب الضرائب
-            tax_amount = 0.0
-            if record.tax_ids:
-                for tax in record.tax_ids:
-                    if tax.amount_type == 'percent':
-                        tax_amount += (record.gross_value * tax.amount) / 100
-                    else:
-                        tax_amount += tax.amount
-            record.tax_amount = tax_amount
-            
-            # 3. حساب المجموع الفرعي (القيمة الإجمالية + الضرائب)
-            record.subtotal = record.gross_value + record.tax_amount
+            record.gross_value = sum(record.statement_line_ids.mapped('current_value'))
+
+        # 2. حساب الضرائب (account.tax engine, one cached result per statement)
+        tax_results = self._get_tax_results()
+        for record in self:
+            result = tax_results[record]
+            if result:
+                record.tax_amount = sum(tax['amount'] for tax in result['taxes'])
+                # 3. المجموع الفرعي: القيمة شاملة الضرائب (price-included taxes are already in the gross value)
+                record.subtotal = result['total_included']
+            else:
+                record.tax_amount = 0.0
+                record.subtotal = record.gross_value
             
             # 4. حساب إجمالي الخصومات
             record.total_deductions = (record.advance_payment_deduction + 
@@ -156,6 +244,50 @@ class ContractorStatement(models.Model):
             # 5. حساب صافي المستحق (الصيغة الصحيحة)
             record.net_payable = record.subtotal - record.total_deductions
 
+    def _get_tax_results(self):
+        """Return {statement: account.tax compute_all result on its gross value, or None without taxes}.
+
+        Results are computed once per distinct (taxes, base, currency, rounding method) and kept in
+        a per-process cache, so the stored tax amount and the posted tax lines come from the same figures.
+        """
+        currency = self.env.company.currency_id
+        results = {}
+        versions = {}
+        for record in self:
+            taxes = record.tax_ids
+            if not taxes:
+                results[record] = None
+                continue
+            base = currency.round(record.gross_value)
+            tax_ids = tuple(sorted(taxes._origin.ids))
+            if tax_ids not in versions:
+                versions[tax_ids] = self._get_taxes_version(taxes._origin)
+            # compute_all rounds per line or globally following the company of the taxes
+            company = taxes._origin[0].company_id
+            key = (self.env.cr.dbname, company.id, company.tax_calculation_rounding_method,
+                   tax_ids, versions[tax_ids], base, currency.id)
+            try:
+                result = _tax_results_cache[key]
+            except KeyError:
+                result = _tax_results_cache[key] = taxes.compute_all(base, currency=currency)
+            results[record] = result
+        return results
+
+    @api.model
+    def _get_taxes_version(self, taxes):
+        """Return the latest write date of what compute_all reads for ``taxes``: the taxes, the
+        children of group taxes, their repartition lines and accounts. Editing any of them
+        invalidates the cached results."""
+        taxes |= taxes.children_tax_ids
+        repartition_lines = taxes.invoice_repartition_line_ids | taxes.refund_repartition_line_ids
+        dates = [
+            write_date
+            for records in (taxes, repartition_lines, repartition_lines.account_id)
+            for write_date in records.mapped('write_date')
+            if write_date
+        ]
+        return max(dates, default=None)
+
     @api.onchange('project_id', 'work_type_id')
     def _onchange_project_work_type(self):
         if self.project_id and self.work_type_id:
@@ -202,37 +334,78 @@ class ContractorStatement(models.Model):
             return {'domain': {'statement_line_ids': [('product_id.work_type_id', '=', self.work_type_id.id)]}}
         return {'domain': {'statement_line_ids': []}}
 
+    @instrument
     def action_confirm(self):
         """Confirm the statement"""
-        for record in self:
-            # Update quantity tracker when confirming
-            record._update_quantity_tracker()
-            record.state = 'confirmed'
-            record.confirmed_by = self.env.user.id
-            record.confirmed_date = fields.Datetime.now()
+        # Update quantity tracker when confirming, for all statements at once so the keys are locked together
+        self._update_quantity_tracker()
+        # Same values for the whole recordset: flushed as a single UPDATE
+        self.write({
+            'state': 'confirmed',
+            'confirmed_by': self.env.user.id,
+            'confirmed_date': fields.Datetime.now(),
+        })
+        self.env['contractor.price.index']._update_from_statements(self)
+        self._invalidate_progress_snapshots()
         return True
 
+    @instrument
     def action_approve(self):
-        """Approve the statement"""
-        for record in self:
-            record.state = 'approved'
-            record.approved_by = self.env.user.id
-            record.approved_date = fields.Datetime.now()
-            record._create_journal_entry()
+        """Approve the statement and post its journal entry.
+
+        Safe to retry: under the posting lock, statements already approved are left as they are.
+        """
+        self._lock_for_posting()
+        to_approve = self.filtered(lambda r: r.state not in ('approved', 'paid'))
+        # القيد أولاً ثم الحالة
+        to_approve._create_journal_entry()
+        to_approve.write({
+            'state': 'approved',
+            'approved_by': self.env.user.id,
+            'approved_date': fields.Datetime.now(),
+        })
         return True
 
+    def _lock_for_posting(self):
+        """Serialize approval and payment per statement.
+
+        The advisory lock makes a concurrent request wait for the first one; the row lock then
+        fails with a serialization error if the first one changed the statement, and Odoo
+        retries the request, which finds the statement already processed.
+        """
+        if not self:
+            return
+        self.flush_recordset()
+        self.env.cr.execute("""
+            SELECT pg_advisory_xact_lock(hashtextextended('contractor_statement-' || id, 0))
+            FROM unnest(%s::int[]) AS id
+        """, [sorted(self.ids)])
+        self.env.cr.execute("""
+            SELECT id FROM contractor_statement WHERE id IN %s ORDER BY id FOR NO KEY UPDATE
+        """, [tuple(self.ids)])
+        self.invalidate_recordset(['state', 'move_id', 'payment_id'])
+
     def _update_quantity_tracker(self):
         """Update quantity tracker when statement is confirmed"""
-        for line in self.statement_line_ids:
-            if line.current_qty > 0:
-                tracker = self.env['contractor.quantity.tracker']
-                tracker.update_accumulated_quantity(
-                    self.project_id.id,
-                    self.work_type_id.id,
-                    self.contractor_id.id,
-                    line.product_id.id,
-                    line.current_qty
-                )
+        self.env['contractor.quantity.tracker'].apply_quantity_deltas(self._get_quantity_deltas())
+        self.env['contract.quantity']._apply_billed_statements(self)
+
+    def _get_quantity_deltas(self, sign=1):
+        """Return {(project, work type, contractor, product): quantity} for the positive line quantities of the statements"""
+        if not self:
+            return {}
+        self.env['contractor.statement.line'].flush_model(['statement_id', 'product_id', 'current_qty'])
+        self.flush_recordset(['project_id', 'work_type_id', 'contractor_id'])
+        self.env.cr.execute("""
+            SELECT s.project_id, s.work_type_id, s.contractor_id, l.product_id, SUM(l.current_qty)
+            FROM contractor_statement_line l
+            JOIN contractor_statement s ON s.id = l.statement_id
+            WHERE s.id IN %s AND l.current_qty > 0
+            GROUP BY s.project_id, s.work_type_id, s.contractor_id, l.product_id
+        """, [tuple(self.ids)])
+        return {tuple(row[:4]): sign * row[4] for row in self.env.cr.fetchall()}
+
+    @instrument
     def _create_journal_entry(self):
         """Enhanced journal entry creation with proper accounting logic
         
@@ -252,159 +425,273 @@ class ContractorStatement(models.Model):
         for record in self:
             if not record.journal_id:
                 raise ValidationError("Please select a journal before approving.")
-            
-            if record.move_id:
-                continue
-            
-            # Get deduction accounts
-            if not record.advance_payment_account_id or not record.retention_account_id or not record.other_deductions_account_id:
-                try:
-                    deduction_config = self.env['deductions.config']
-                    accounts = deduction_config.get_deduction_accounts(
-                        project_id=record.project_id.id if record.project_id else None,
-                        work_type_id=record.work_type_id.id if record.work_type_id else None
-                    )
-                    
-                    record.advance_payment_account_id = accounts.get('advance_payment_account_id')
-                    record.retention_account_id = accounts.get('retention_account_id')
-                    record.other_deductions_account_id = accounts.get('other_deductions_account_id')
-                except ValidationError as e:
-                    raise ValidationError(f"Deduction accounts configuration error: {e}")
-            
-        move_vals = {
-            'journal_id': record.journal_id.id,
-            'date': record.statement_date,
-            'ref': record.name,
-            'line_ids': [],
+        records = self.filtered(lambda r: not r.move_id)
+
+        # Get deduction accounts
+        for record, accounts in records._get_deduction_accounts().items():
+            if accounts is None:
+                raise ValidationError("Deduction accounts configuration error: No deductions configuration found! "
+                                      "Please set up at least one default configuration.")
+            record.advance_payment_account_id = accounts.get('advance_payment_account_id')
+            record.retention_account_id = accounts.get('retention_account_id')
+            record.other_deductions_account_id = accounts.get('other_deductions_account_id')
+
+        move_vals_by_record = {
+            record: move_vals
+            for record, move_vals in records._prepare_move_vals().items()
+            if move_vals['line_ids']
         }
+        # إنشاء القيد
+        moves = self.env['account.move'].create(list(move_vals_by_record.values()))
+        moves.action_post()
+        for record, move in zip(move_vals_by_record, moves):
+            record.move_id = move.id
+
+    def _get_deduction_accounts(self):
+        """Return {statement: deduction accounts from the configuration, or None when none applies}
+        for the statements missing one of their deduction accounts"""
+        missing = self.filtered(lambda r: not r.advance_payment_account_id or not r.retention_account_id
+                                or not r.other_deductions_account_id)
+        accounts_by_key = self.env['deductions.config']._get_deduction_accounts_by_key(
+            {(record.project_id.id, record.work_type_id.id) for record in missing})
+        return {record: accounts_by_key[record.project_id.id, record.work_type_id.id] for record in missing}
+
+    def _prepare_move_vals(self, blockers=None):
+        """Return {statement: account.move values} of the journal entries the statements post.
+
+        Accounts, taxes and deduction configurations are looked up once for the whole recordset.
+        Without ``blockers`` the first configuration problem raises a ValidationError; with a
+        ``{statement: [message]}`` dict the problems are collected there instead and every
+        statement is planned as far as it can be.
+        """
+        def block(record, message):
+            if blockers is None:
+                raise ValidationError(message)
+            blockers.setdefault(record, []).append(message)
+
+        currency = self.env.company.currency_id
+        tax_results = self._get_tax_results()
+        configured_accounts = self._get_deduction_accounts()
+        tax_accounts = {}
+        # Batch the reads of the lines, products and contractor accounts
+        self.statement_line_ids.product_id.mapped('in_account_id')
+        self.contractor_id.mapped('property_account_payable_id')
+        self.contractor_id.mapped('property_account_receivable_id')
+
+        result = {}
+        for record in self:
+            if not record.journal_id:
+                block(record, "Please select a journal before approving.")
+            if record in configured_accounts and configured_accounts[record] is None:
+                block(record, "Deduction accounts configuration error: No deductions configuration found! "
+                              "Please set up at least one default configuration.")
+            accounts = configured_accounts.get(record) or {
+                'advance_payment_account_id': record.advance_payment_account_id.id,
+                'retention_account_id': record.retention_account_id.id,
+                'other_deductions_account_id': record.other_deductions_account_id.id,
+            }
+
+            move_vals = {
+                'journal_id': record.journal_id.id,
+                'date': record.statement_date,
+                'ref': record.name,
+                'line_ids': [],
+            }
         
-        # الجانب الأول: مدين - إجمالي قيمة المقاولة (Total Statement Value)
-        for line in record.statement_line_ids:
-            if line.current_value > 0:
-                product = line.product_id
-                account_id = None
+            tax_result = tax_results[record]
+            # Price-included taxes: the lines carry the value net of tax
+            ratio = tax_result['total_excluded'] / record.gross_value if tax_result and record.gross_value else 1.0
+
+            # الجانب الأول: مدين - إجمالي قيمة المقاولة (Total Statement Value)
+            for line in record.statement_line_ids:
+                if line.current_value > 0:
+                    product = line.product_id
+                    account_id = None
                 
-                # تحديد الحساب المناسب
-                if product.account_type == 'in' and product.in_account_id:
-                    account_id = product.in_account_id.id
-                elif product.account_type == 'out' and product.out_account_id:
-                    account_id = product.out_account_id.id
+                    # تحديد الحساب المناسب
+                    if product.account_type == 'in' and product.in_account_id:
+                        account_id = product.in_account_id.id
+                    elif product.account_type == 'out' and product.out_account_id:
+                        account_id = product.out_account_id.id
                 
-                if not account_id:
-                    raise ValidationError(f"Please configure account for product: {product.name}")
+                    if not account_id:
+                        block(record, f"Please configure account for product: {product.name}")
                 
-                product_line = {
-                    'name': f'{product.name} - {record.name}',
-                    'account_id': account_id,
-                    'debit': line.current_value,  # مدين - إجمالي قيمة المقاولة
-                    'credit': 0.0,
-                }
-                move_vals['line_ids'].append((0, 0, product_line))
+                    product_line = {
+                        'name': f'{product.name} - {record.name}',
+                        'account_id': account_id,
+                        'debit': currency.round(line.current_value * ratio),  # مدين - إجمالي قيمة المقاولة
+                        'credit': 0.0,
+                    }
+                    move_vals['line_ids'].append((0, 0, product_line))
+
+            # Rounding difference of the price-included split goes to the last product line
+            if tax_result and move_vals['line_ids']:
+                difference = currency.round(tax_result['total_excluded'] - sum(line[2]['debit'] for line in move_vals['line_ids']))
+                move_vals['line_ids'][-1][2]['debit'] += difference
         
-        # الجانب الأول: مدين - الضرائب (Total Taxes)
-        if record.tax_amount > 0:
-            for tax in record.tax_ids:
-                if tax.amount > 0:
-                    tax_account = record._get_tax_account(tax)
-                    if tax_account:
-                        tax_value = (record.gross_value * tax.amount) / 100 if tax.amount_type == 'percent' else tax.amount
-                        
-                        tax_line = {
-                            'name': f'Tax - {tax.name}',
-                            'account_id': tax_account.id,
-                            'debit': tax_value,  # مدين - الضرائب
-                            'credit': 0.0,
-                        }
-                        move_vals['line_ids'].append((0, 0, tax_line))
+            # الجانب الأول: مدين - الضرائب (Total Taxes), as computed by the tax engine
+            for tax_values in (tax_result or {}).get('taxes', []):
+                if not tax_values['amount']:
+                    continue
+                tax_account_id = tax_values['account_id']
+                if not tax_account_id:
+                    if tax_values['id'] not in tax_accounts:
+                        try:
+                            tax = self.env['account.tax'].browse(tax_values['id'])
+                            tax_accounts[tax_values['id']] = record._get_tax_account(tax).id
+                        except ValidationError as e:
+                            tax_accounts[tax_values['id']] = str(e)
+                    tax_account_id = tax_accounts[tax_values['id']]
+                    if isinstance(tax_account_id, str):
+                        block(record, tax_account_id)
+                        tax_account_id = None
+                tax_line = {
+                    'name': f"Tax - {tax_values['name']}",
+                    'account_id': tax_account_id,
+                    # مدين - الضرائب (withholding taxes are negative: credit)
+                    'debit': max(tax_values['amount'], 0.0),
+                    'credit': max(-tax_values['amount'], 0.0),
+                }
+                move_vals['line_ids'].append((0, 0, tax_line))
         
-        # الجانب الثاني: دائن - الخصومات (Total Deductions)
-        if record.advance_payment_deduction > 0:
-            if not record.advance_payment_account_id:
-                raise ValidationError("Advance payment account is not configured!")
+            # الجانب الثاني: دائن - الخصومات (Total Deductions)
+            if record.advance_payment_deduction > 0:
+                if not accounts['advance_payment_account_id']:
+                    block(record, "Advance payment account is not configured!")
             
-            advance_line = {
-                'name': f'Advance Payment Deduction - {record.name}',
-                'account_id': record.advance_payment_account_id.id,
-                'debit': 0.0,
-                'credit': record.advance_payment_deduction,  # دائن - خصم دفعة مقدمة
-            }
-            move_vals['line_ids'].append((0, 0, advance_line))
+                advance_line = {
+                    'name': f'Advance Payment Deduction - {record.name}',
+                    'account_id': accounts['advance_payment_account_id'],
+                    'debit': 0.0,
+                    'credit': record.advance_payment_deduction,  # دائن - خصم دفعة مقدمة
+                }
+                move_vals['line_ids'].append((0, 0, advance_line))
         
-        if record.retention > 0:
-            if not record.retention_account_id:
-                raise ValidationError("Retention account is not configured!")
+            if record.retention > 0:
+                if not accounts['retention_account_id']:
+                    block(record, "Retention account is not configured!")
             
-            retention_line = {
-                'name': f'Retention - {record.name}',
-                'account_id': record.retention_account_id.id,
-                'debit': 0.0,
-                'credit': record.retention,  # دائن - ضمان حسن التنفيذ
-            }
-            move_vals['line_ids'].append((0, 0, retention_line))
+                retention_line = {
+                    'name': f'Retention - {record.name}',
+                    'account_id': accounts['retention_account_id'],
+                    'debit': 0.0,
+                    'credit': record.retention,  # دائن - ضمان حسن التنفيذ
+                }
+                move_vals['line_ids'].append((0, 0, retention_line))
         
-        if record.other_deductions > 0:
-            if not record.other_deductions_account_id:
-                raise ValidationError("Other deductions account is not configured!")
+            if record.other_deductions > 0:
+                if not accounts['other_deductions_account_id']:
+                    block(record, "Other deductions account is not configured!")
             
-            other_deductions_line = {
-                'name': f'Other Deductions - {record.name}',
-                'account_id': record.other_deductions_account_id.id,
-                'debit': 0.0,
-                'credit': record.other_deductions,  # دائن - خصومات أخرى
-            }
-            move_vals['line_ids'].append((0, 0, other_deductions_line))
+                other_deductions_line = {
+                    'name': f'Other Deductions - {record.name}',
+                    'account_id': accounts['other_deductions_account_id'],
+                    'debit': 0.0,
+                    'credit': record.other_deductions,  # دائن - خصومات أخرى
+                }
+                move_vals['line_ids'].append((0, 0, other_deductions_line))
         
-        # الجانب الثاني: دائن - صافي المستحق (Net Payable)
-        if record.net_payable > 0:
-            # تحديد الحساب حسب نوع المقاول
-            if record.contractor_type == 'sub':
-                contractor_account = record.contractor_id.property_account_payable_id.id
-            else:
-                contractor_account = record.contractor_id.property_account_receivable_id.id
+            # الجانب الثاني: دائن - صافي المستحق (Net Payable)
+            if record.net_payable > 0:
+                # تحديد الحساب حسب نوع المقاول
+                if record.contractor_type == 'sub':
+                    contractor_account = record.contractor_id.property_account_payable_id.id
+                else:
+                    contractor_account = record.contractor_id.property_account_receivable_id.id
+                if not contractor_account:
+                    block(record, f"Please configure the payable/receivable account of contractor: {record.contractor_id.name}")
             
-            contractor_line = {
-                'name': f'Contractor - {record.contractor_id.name}',
-                'partner_id': record.contractor_id.id,
-                'account_id': contractor_account,
-                'debit': 0.0,
-                'credit': record.net_payable,  # دائن - صافي المستحق
-            }
-            move_vals['line_ids'].append((0, 0, contractor_line))
-        
-        # التحقق من توازن القيد المحاسبي
-        total_debit = sum(line[2].get('debit', 0.0) for line in move_vals['line_ids'])
-        total_credit = sum(line[2].get('credit', 0.0) for line in move_vals['line_ids'])
-        
-        _logger = logging.getLogger(__name__)
-        _logger.info(f"Statement: {record.name}")
-        _logger.info(f"Total Statement Value: {record.gross_value}")
-        _logger.info(f"Total Taxes: {record.tax_amount}")
-        _logger.info(f"Total Deductions: {record.advance_payment_deduction + record.retention + record.other_deductions}")
-        _logger.info(f"Net Payable: {record.net_payable}")
-        _logger.info(f"Total Debit: {total_debit}")
-        _logger.info(f"Total Credit: {total_credit}")
+                contractor_line = {
+                    'name': f'Contractor - {record.contractor_id.name}',
+                    'partner_id': record.contractor_id.id,
+                    'account_id': contractor_account,
+                    'debit': 0.0,
+                    'credit': record.net_payable,  # دائن - صافي المستحق
+                }
+                move_vals['line_ids'].append((0, 0, contractor_line))
         
-        # التحقق من صحة المعادلة المحاسبية
-        expected_debit = record.gross_value + record.tax_amount
-        expected_credit = (record.advance_payment_deduction + record.retention + record.other_deductions) + record.net_payable
+            # التحقق من توازن القيد المحاسبي
+            total_debit = sum(line[2].get('debit', 0.0) for line in move_vals['line_ids'])
+            total_credit = sum(line[2].get('credit', 0.0) for line in move_vals['line_ids'])
         
-        if abs(expected_debit - expected_credit) > 0.01:
-            raise ValidationError(
-                f"Accounting equation is not balanced!\n"
-                f"Expected: (Statement Value + Taxes) = (Deductions + Net Payable)\n"
-                f"Expected: ({record.gross_value} + {record.tax_amount}) = ({record.advance_payment_deduction + record.retention + record.other_deductions} + {record.net_payable})\n"
-                f"Expected: {expected_debit} = {expected_credit}\n"
-                f"Difference: {abs(expected_debit - expected_credit)}"
+            _logger.debug(
+                "Statement %s: value %s, taxes %s, deductions %s, net payable %s, debit %s, credit %s",
+                record.name, record.gross_value, record.tax_amount,
+                record.advance_payment_deduction + record.retention + record.other_deductions,
+                record.net_payable, total_debit, total_credit,
             )
         
-        if abs(total_debit - total_credit) > 0.01:
-            raise ValidationError(f"Journal entry is not balanced! Debit: {total_debit}, Credit: {total_credit}")
+            # التحقق من صحة المعادلة المحاسبية
+            expected_debit = record.subtotal
+            expected_credit = (record.advance_payment_deduction + record.retention + record.other_deductions) + record.net_payable
         
-        # إنشاء القيد
-        if move_vals['line_ids']:
-            move = self.env['account.move'].create(move_vals)
-            move.action_post()
-            record.move_id = move.id
+            if abs(expected_debit - expected_credit) > 0.01:
+                block(record,
+                    f"Accounting equation is not balanced!\n"
+                    f"Expected: (Statement Value + Taxes) = (Deductions + Net Payable)\n"
+                    f"Expected: ({record.subtotal}) = ({record.advance_payment_deduction + record.retention + record.other_deductions} + {record.net_payable})\n"
+                    f"Expected: {expected_debit} = {expected_credit}\n"
+                    f"Difference: {abs(expected_debit - expected_credit)}"
+                )
+        
+            if abs(total_debit - total_credit) > 0.01:
+                block(record, f"Journal entry is not balanced! Debit: {total_debit}, Credit: {total_credit}")
+
+            result[record] = move_vals
+        return result
+
+    def _simulate_posting(self):
+        """Dry run of the approval: plan the journal entry of every statement without writing anything.
+
+        Returns the blockers per statement and the planned debit and credit per account.
+        """
+        blockers = {}
+        totals = defaultdict(lambda: [0.0, 0.0])
+        for batch in split_every(SIMULATION_BATCH_SIZE, self.filtered(lambda r: not r.move_id).ids, self.browse):
+            for move_vals in batch._prepare_move_vals(blockers).values():
+                for _command, _id, line in move_vals['line_ids']:
+                    totals[line['account_id']][0] += line['debit']
+                    totals[line['account_id']][1] += line['credit']
+            # Keep the memory flat over thousands of statements
+            self.env.invalidate_all()
+
+        accounts = self.env['account.account'].browse(account_id for account_id in totals if account_id)
+        names = {account.id: account.display_name for account in accounts}
+        return {
+            'statements': len(self),
+            'blocked': [
+                {'id': record.id, 'name': record.name, 'blockers': messages}
+                for record, messages in blockers.items()
+            ],
+            'accounts': [
+                {'account_id': account_id, 'account': names.get(account_id, "Not configured"), 'debit': debit, 'credit': credit}
+                for account_id, (debit, credit) in sorted(totals.items(), key=lambda item: names.get(item[0], ''))
+            ],
+            'debit': sum(debit for debit, _credit in totals.values()),
+            'credit': sum(credit for _debit, credit in totals.values()),
+        }
+
+    def action_simulate_posting(self):
+        """Report what approving the selected statements would post, and what would stop it"""
+        report = self._simulate_posting()
+        lines = [f"{len(report['blocked'])} of {report['statements']} statements blocked."]
+        for blocked in report['blocked']:
+            lines.append(f"{blocked['name']}: {'; '.join(blocked['blockers'])}")
+        for account in report['accounts']:
+            lines.append(f"{account['account']}: debit {account['debit']:,.2f}, credit {account['credit']:,.2f}")
+        lines.append(f"Total: debit {report['debit']:,.2f}, credit {report['credit']:,.2f}")
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': "Posting Simulation",
+                'message': '\n'.join(lines),
+                'type': 'warning' if report['blocked'] else 'success',
+                'sticky': True,
+            },
+        }
+
     def _get_tax_account(self, tax):
         """Get the correct tax account from tax configuration"""
         # البحث عن الحساب المناسب من إعدادات الضريبة
@@ -429,35 +716,41 @@ class ContractorStatement(models.Model):
         
         return tax_account
 
+    @instrument
     def action_reset_to_draft(self):
         """Reset statement to draft"""
-        for record in self:
-            if record.state == 'paid':
-                raise ValidationError("Cannot reset a paid statement to draft!")
-            
-            # إذا كان المستخلص مؤكد، نحتاج لتحديث quantity tracker
-            if record.state == 'confirmed':
-                record._reverse_quantity_tracker()
-            
-            record.state = 'draft'
+        if any(record.state == 'paid' for record in self):
+            raise ValidationError("Cannot reset a paid statement to draft!")
+
+        # Confirmed and approved statements were counted in the tracker and the contract balances
+        billed = self.filtered(lambda r: r.state != 'draft')
+        billed._reverse_quantity_tracker()
+
+        price_keys = billed._get_price_keys()
+        self.write({'state': 'draft'})
+        self.env['contractor.price.index']._rebuild(price_keys)
+        billed._invalidate_progress_snapshots()
         return True
 
+    def _invalidate_progress_snapshots(self):
+        """Have the progress snapshots of the periods these statements are dated in taken again"""
+        dates = [date for date in self.mapped('statement_date') if date]
+        if dates:
+            self.env['contractor.progress.snapshot']._invalidate_from(min(dates))
+
     def _reverse_quantity_tracker(self):
         """Reverse quantity tracker when resetting to draft"""
-        for line in self.statement_line_ids:
-            if line.current_qty > 0:
-                tracker = self.env['contractor.quantity.tracker']
-                tracker.update_accumulated_quantity(
-                    self.project_id.id,
-                    self.work_type_id.id,
-                    self.contractor_id.id,
-                    line.product_id.id,
-                    -line.current_qty  # سالب لإلغاء الكمية
-                )
+        # سالب لإلغاء الكمية
+        self.env['contractor.quantity.tracker'].apply_quantity_deltas(self._get_quantity_deltas(sign=-1))
+        self.env['contract.quantity']._apply_billed_statements(self, sign=-1)
 
+    @instrument
     def action_mark_as_paid(self):
-        """Mark statement as paid and create payment record"""
+        """Mark statement as paid and create payment record, skipping statements already paid"""
+        self._lock_for_posting()
         for record in self:
+            if record.state == 'paid':
+                continue
             if record.state != 'approved':
                 raise ValidationError("Only approved statements can be marked as paid!")
             
@@ -478,20 +771,81 @@ class ContractorStatement(models.Model):
             payment = self.env['account.payment'].create(payment_vals)
             payment.action_post()
             
-            record.payment_id = payment.id
-            record.state = 'paid'
-            record.paid_by = self.env.user.id
-            record.paid_date = fields.Datetime.now()
+            record.write({
+                'payment_id': payment.id,
+                'state': 'paid',
+                'paid_by': self.env.user.id,
+                'paid_date': fields.Datetime.now(),
+            })
+        return True
+
+    @instrument
+    def action_prefill_lines(self):
+        """Prefill lines from the contract quantities (BOQ) of the statement's project, work type and contractor"""
+        line_vals = []
+        for record in self:
+            if record.state != 'draft':
+                raise ValidationError("Lines can only be prefilled on draft statements.")
+
+            contracts = self.env['contract.quantity'].search([
+                ('project_id', '=', record.project_id.id),
+                ('work_type_id', '=', record.work_type_id.id),
+                ('contractor_id', '=', record.contractor_id.id),
+            ], order='product_id')
+            # تجاهل البنود الموجودة بالفعل في المستخلص
+            existing_products = set(record.statement_line_ids.product_id.ids)
+            contracts = contracts.filtered(lambda c: c.product_id.id not in existing_products)
+            if not contracts:
+                continue
+
+            last_prices = record._get_last_unit_prices(contracts.product_id.ids)
+            sequence = max(record.statement_line_ids.mapped('sequence'), default=0)
+            for contract in contracts:
+                sequence += 1
+                line_vals.append({
+                    'statement_id': record.id,
+                    'sequence': sequence,
+                    'product_id': contract.product_id.id,
+                    'current_qty': 0.0,
+                    'unit_price': last_prices.get(contract.product_id.id, 0.0),
+                })
+
+        # Contract and previous quantities are computed in batch by the line computes
+        if line_vals:
+            self.env['contractor.statement.line'].create(line_vals)
         return True
 
+    def _get_last_unit_prices(self, product_ids):
+        """Return {product_id: unit price} of the latest non-draft statement of each product, from the price index"""
+        self.ensure_one()
+        prices = self.env['contractor.price.index']._get_prices(
+            {(self.project_id.id, self.contractor_id.id, product_id) for product_id in product_ids})
+        return {key[2]: price[0] for key, price in prices.items()}
+
+    def _get_price_keys(self):
+        """Return the (project, contractor, product) price index keys of the statements' lines"""
+        return {
+            (record.project_id.id, record.contractor_id.id, product.id)
+            for record in self for product in record.statement_line_ids.product_id
+        }
+
+    def write(self, vals):
+        if 'state' in vals:
+            self.env['contractor.statement.kpi']._invalidate_cache()
+        return super(ContractorStatement, self).write(vals)
+
     def unlink(self):
         """Override unlink to handle quantity tracker and prevent deletion of approved statements"""
-        for record in self:
-            if record.state in ['approved', 'paid']:
-                raise ValidationError("You cannot delete an approved or paid statement because it has generated accounting entries.")
-            if record.state == 'confirmed':
-                record._reverse_quantity_tracker()
-        return super(ContractorStatement, self).unlink()
+        self.env['contractor.statement.kpi']._invalidate_cache()
+        if any(record.state in ['approved', 'paid'] for record in self):
+            raise ValidationError("You cannot delete an approved or paid statement because it has generated accounting entries.")
+        billed = self.filtered(lambda r: r.state != 'draft')
+        billed._reverse_quantity_tracker()
+        price_keys = billed._get_price_keys()
+        billed._invalidate_progress_snapshots()
+        res = super(ContractorStatement, self).unlink()
+        self.env['contractor.price.index']._rebuild(price_keys)
+        return res
 
 
 class ContractorStatementLine(models.Model):
@@ -508,89 +862,189 @@ class ContractorStatementLine(models.Model):
     contract_qty = fields.Float(string='Contract Qty', compute='_compute_contract_qty', store=True)
     prev_qty = fields.Float(string='Previous Qty', compute='_compute_prev_qty', store=True)
     current_qty = fields.Float(string='Current Qty', required=True)
-    total_qty = fields.Float(string='Total Qty', compute='_compute_total_qty', store=True)
-    progress_percent = fields.Float(string='Progress %', compute='_compute_progress', store=True)
+    total_qty = fields.Float(string='Total Qty', compute='_compute_line_amounts', store=True)
+    remaining_qty = fields.Float(string='Remaining Qty', compute='_compute_line_amounts', store=True)
+    progress_percent = fields.Float(string='Progress %', compute='_compute_line_amounts', store=True)
     
     # Prices
     unit_price = fields.Float(string='Unit Price', required=True)
-    current_value = fields.Float(string='Current Value', compute='_compute_current_value', store=True)
-    total_value = fields.Float(string='Total Value', compute='_compute_total_value', store=True)
+    current_value = fields.Float(string='Current Value', compute='_compute_line_amounts', store=True)
+    total_value = fields.Float(string='Total Value', compute='_compute_line_amounts', store=True)
+    # Last agreed price of the product, from the price index
+    last_unit_price = fields.Float(string='Last Unit Price', compute='_compute_price_deviation')
+    price_deviation = fields.Float(string='Price Deviation %', compute='_compute_price_deviation')
+    price_deviates = fields.Boolean(string='Price Deviates', compute='_compute_price_deviation')
+
+    def _get_quantity_key(self):
+        """Return the (project, work type, contractor, product) key of the line, or None if incomplete"""
+        self.ensure_one()
+        statement = self.statement_id
+        if statement.project_id and statement.work_type_id and statement.contractor_id and self.product_id:
+            return (statement.project_id.id, statement.work_type_id.id, statement.contractor_id.id, self.product_id.id)
+        return None
 
-    @api.depends('statement_id.project_id', 'statement_id.work_type_id', 'statement_id.contractor_id', 'product_id')
+    @api.model
+    def _browse_by_quantity_keys(self, model_name, keys):
+        """Return {(project, work type, contractor, product): record} of ``model_name`` in a single search"""
+        if not keys:
+            return {}
+        records = self.env[model_name].search([
+            ('project_id', 'in', list({key[0] for key in keys})),
+            ('work_type_id', 'in', list({key[1] for key in keys})),
+            ('contractor_id', 'in', list({key[2] for key in keys})),
+            ('product_id', 'in', list({key[3] for key in keys})),
+        ])
+        result = {}
+        for record in records:
+            key = (record.project_id.id, record.work_type_id.id, record.contractor_id.id, record.product_id.id)
+            if key in keys:
+                result[key] = record
+        return result
+
+    @api.depends('statement_id.project_id', 'statement_id.work_type_id', 'statement_id.contractor_id', 'product_id',
+                 'statement_id.statement_date')
+    @instrument
     def _compute_contract_qty(self):
+        keys = {line: line._get_quantity_key() for line in self}
+        contracts = self._browse_by_quantity_keys('contract.quantity', set(keys.values()) - {None})
+        # Variation orders: the quantity in effect on the statement date, looked up in one query
+        today = fields.Date.context_today(self)
+        dates = {line: line.statement_id.statement_date or today for line in self}
+        quantities = self.env['contract.quantity.revision']._get_quantities_as_of(
+            {(contracts[keys[line]].id, dates[line]) for line in self if keys[line] in contracts})
         for line in self:
-            if line.statement_id.project_id and line.statement_id.work_type_id and line.statement_id.contractor_id and line.product_id:
-                contract_qty_record = self.env['contract.quantity'].search([
-                    ('project_id', '=', line.statement_id.project_id.id),
-                    ('work_type_id', '=', line.statement_id.work_type_id.id),
-                    ('contractor_id', '=', line.statement_id.contractor_id.id),
-                    ('product_id', '=', line.product_id.id)
-                ], limit=1)
-                line.contract_qty = contract_qty_record.quantity if contract_qty_record else 0.0
-            else:
-                line.contract_qty = 0.0
+            contract = contracts.get(keys[line])
+            line.contract_qty = quantities.get((contract.id, dates[line]), contract.quantity) if contract else 0.0
 
     @api.depends('statement_id.project_id', 'statement_id.work_type_id', 'statement_id.contractor_id', 'product_id', 'statement_id.statement_date')
+    @instrument
     def _compute_prev_qty(self):
+        previous_quantities = self._get_previous_quantities()
         for line in self:
-            line.prev_qty = line._get_previous_quantity()
+            line.prev_qty = previous_quantities.get(line, 0.0)
 
     def _get_previous_quantity(self):
         """Get previous quantity from database table or computed from previous statements"""
-        # First, check if we have a record in the new quantity tracker table
-        tracker = self.env['contractor.quantity.tracker'].search([
-            ('project_id', '=', self.statement_id.project_id.id),
-            ('work_type_id', '=', self.statement_id.work_type_id.id),
-            ('contractor_id', '=', self.statement_id.contractor_id.id),
-            ('product_id', '=', self.product_id.id)
-        ], limit=1)
-        
-        if tracker:
-            return tracker.accumulated_quantity
-        else:
-            # If no tracker record, compute from previous statements
-            if self.statement_id.project_id and self.statement_id.work_type_id and self.statement_id.contractor_id and self.product_id:
-                domain = [
-                    ('statement_id.project_id', '=', self.statement_id.project_id.id),
-                    ('statement_id.work_type_id', '=', self.statement_id.work_type_id.id),
-                    ('statement_id.contractor_id', '=', self.statement_id.contractor_id.id),
-                    ('product_id', '=', self.product_id.id),
-                    ('statement_id.statement_date', '<', self.statement_id.statement_date),
-                    ('statement_id.state', '!=', 'draft')
-                ]
-                previous_lines = self.search(domain)
-                return sum(previous_lines.mapped('current_qty'))
+        self.ensure_one()
+        return self._get_previous_quantities().get(self, 0.0)
+
+    def _get_previous_quantities(self):
+        """Return {line: previous quantity} read from the quantity tracker in one search,
+        falling back to previous statements (one grouped query per statement)"""
+        keys = {line: line._get_quantity_key() for line in self}
+        trackers = self._browse_by_quantity_keys('contractor.quantity.tracker', set(keys.values()) - {None})
+
+        result = {}
+        missing = []
+        for line, key in keys.items():
+            if key is None:
+                result[line] = 0.0
+            elif key in trackers:
+                result[line] = trackers[key].accumulated_quantity
             else:
-                return 0.0
-
-    @api.depends('prev_qty', 'current_qty')
-    def _compute_total_qty(self):
-        for line in self:
-            line.total_qty = line.prev_qty + line.current_qty
+                missing.append(line)
 
-    @api.depends('total_qty', 'contract_qty')
-    def _compute_progress(self):
-        for line in self:
-            if line.contract_qty > 0:
-                line.progress_percent = (line.total_qty / line.contract_qty) * 100
-            else:
-                line.progress_percent = 0.0
-
-    @api.depends('current_qty', 'unit_price')
-    def _compute_current_value(self):
+        # If no tracker record, compute from previous statements
+        for statement, lines in groupby(missing, key=lambda line: line.statement_id):
+            if not statement.statement_date:
+                result.update(dict.fromkeys(lines, 0.0))
+                continue
+            groups = self._read_group([
+                ('statement_id.project_id', '=', statement.project_id.id),
+                ('statement_id.work_type_id', '=', statement.work_type_id.id),
+                ('statement_id.contractor_id', '=', statement.contractor_id.id),
+                ('product_id', 'in', [line.product_id.id for line in lines]),
+                ('statement_id.statement_date', '<', statement.statement_date),
+                ('statement_id.state', '!=', 'draft')
+            ], ['product_id'], ['current_qty:sum'])
+            quantities = {product.id: qty for product, qty in groups}
+            # Paid statements of finished projects may have been moved to the archive
+            archived = self.env['contractor.statement.line.archive']._get_archived_quantities(
+                statement, [line.product_id.id for line in lines])
+            for product_id, qty in archived.items():
+                quantities[product_id] = quantities.get(product_id, 0.0) + qty
+            for line in lines:
+                result[line] = quantities.get(line.product_id.id, 0.0)
+        return result
+
+    @api.depends('prev_qty', 'current_qty', 'contract_qty', 'unit_price')
+    @instrument
+    def _compute_line_amounts(self):
+        """Compute total and remaining quantities, progress and values in one pass"""
+        if numpy is not None and len(self) >= VECTORIZE_MIN_LINES:
+            self._compute_line_amounts_vectorized()
+            return
         for line in self:
+            total_qty = line.prev_qty + line.current_qty
+            line.total_qty = total_qty
+            line.remaining_qty = line.contract_qty - total_qty
+            line.progress_percent = (total_qty / line.contract_qty) * 100 if line.contract_qty > 0 else 0.0
             line.current_value = line.current_qty * line.unit_price
-
-    @api.depends('total_qty', 'unit_price')
-    def _compute_total_value(self):
+            line.total_value = total_qty * line.unit_price
+
+    def _compute_line_amounts_vectorized(self):
+        """NumPy variant of _compute_line_amounts for large recordsets: the columns are read and
+        written back to the cache as whole arrays instead of record by record. New records (onchange)
+        are assigned one by one, the dirty cache only takes real ids"""
+        prev_qty = numpy.array(self.mapped('prev_qty'), dtype=float)
+        current_qty = numpy.array(self.mapped('current_qty'), dtype=float)
+        contract_qty = numpy.array(self.mapped('contract_qty'), dtype=float)
+        unit_price = numpy.array(self.mapped('unit_price'), dtype=float)
+
+        total_qty = prev_qty + current_qty
+        progress = numpy.zeros_like(total_qty)
+        numpy.divide(total_qty * 100, contract_qty, out=progress, where=contract_qty > 0)
+        columns = {
+            'total_qty': total_qty,
+            'remaining_qty': contract_qty - total_qty,
+            'progress_percent': progress,
+            'current_value': current_qty * unit_price,
+            'total_value': total_qty * unit_price,
+        }
+        saved = numpy.array([bool(line_id) for line_id in self._ids])
+        saved_lines = self.filtered('id')
+        # dirty=True: the stored values are flushed like regular assignments
+        if saved_lines:
+            for fname, values in columns.items():
+                self.env.cache.update(saved_lines, self._fields[fname], values[saved].tolist(), dirty=True)
+        new_lines = self - saved_lines
+        if new_lines:
+            new_columns = {fname: values[~saved].tolist() for fname, values in columns.items()}
+            for index, line in enumerate(new_lines):
+                line.update({fname: values[index] for fname, values in new_columns.items()})
+
+    def _get_price_key(self):
+        self.ensure_one()
+        return (self.statement_id.project_id.id, self.statement_id.contractor_id.id, self.product_id.id)
+
+    @api.depends('statement_id.project_id', 'statement_id.contractor_id', 'product_id', 'unit_price')
+    def _compute_price_deviation(self):
+        keys = {line: line._get_price_key() for line in self}
+        prices = self.env['contractor.price.index']._get_prices(set(keys.values()))
         for line in self:
-            line.total_value = line.total_qty * line.unit_price
+            unit_price, previous_price, statement_id = prices.get(keys[line], (0.0, 0.0, None))
+            # Once the statement is confirmed the index holds its own price: compare with the one before
+            last_price = (previous_price if statement_id and statement_id == line.statement_id._origin.id else unit_price) or 0.0
+            line.last_unit_price = last_price
+            line.price_deviation = (line.unit_price - last_price) / last_price * 100 if last_price else 0.0
+            line.price_deviates = abs(line.price_deviation) > PRICE_DEVIATION_TOLERANCE * 100
+
+    @api.onchange('product_id')
+    def _onchange_product_id_unit_price(self):
+        """Default the unit price to the last agreed price of the product"""
+        if self.product_id and not self.unit_price:
+            key = self._get_price_key()
+            prices = self.env['contractor.price.index']._get_prices({key})
+            if key in prices:
+                self.unit_price = prices[key][0]
 
     @api.constrains('current_qty', 'contract_qty', 'total_qty')
     def _check_quantities(self):
+        # contract_qty is the quantity in effect on the statement date, resolved in batch by its compute
         for line in self:
             if line.total_qty > line.contract_qty:
-                raise ValidationError(f"Total quantity ({line.total_qty}) cannot exceed contract quantity ({line.contract_qty}) for item: {line.description}")
+                raise ValidationError(f"Total quantity ({line.total_qty}) cannot exceed contract quantity ({line.contract_qty}) "
+                                      f"as of {line.statement_id.statement_date} for item: {line.description}")
 
 
 class ContractorQuantityTracker(models.Model):
@@ -617,30 +1071,86 @@ class ContractorQuantityTracker(models.Model):
 
     def update_accumulated_quantity(self, project_id, work_type_id, contractor_id, product_id, quantity_to_add):
         """Update or create tracker record"""
-        tracker = self.search([
-            ('project_id', '=', project_id),
-            ('work_type_id', '=', work_type_id),
-            ('contractor_id', '=', contractor_id),
-            ('product_id', '=', product_id)
-        ], limit=1)
-        
-        if tracker:
-            tracker.accumulated_quantity += quantity_to_add
-            tracker.last_updated = fields.Datetime.now()
-            
-            # تنظيف السجلات التي تحتوي على كمية صفر
-            if tracker.accumulated_quantity == 0:
-                tracker.unlink()
-        else:
-            if quantity_to_add > 0:  # إنشاء سجل جديد فقط إذا كانت الكمية أكبر من صفر
-                self.create({
-                    'project_id': project_id,
-                    'work_type_id': work_type_id,
-                    'contractor_id': contractor_id,
-                    'product_id': product_id,
-                    'accumulated_quantity': quantity_to_add,
-                    'last_updated': fields.Datetime.now()
-                })
+        self.apply_quantity_deltas({(project_id, work_type_id, contractor_id, product_id): quantity_to_add})
+
+    @api.model
+    def apply_quantity_deltas(self, deltas):
+        """Add {(project, work type, contractor, product): quantity} to the accumulated quantities
+        in a constant number of queries, whatever the number of keys"""
+        deltas = {key: quantity for key, quantity in deltas.items() if quantity}
+        if not deltas:
+            return
+        self._lock_quantity_keys(deltas)
+        self.flush_model()
+        values = ', '.join(['(%s, %s, %s, %s, %s::float8)'] * len(deltas))
+        params = [value for key, quantity in deltas.items() for value in (*key, quantity)]
+
+        # إنشاء سجل جديد فقط إذا كانت الكمية أكبر من صفر
+        self.env.cr.execute("""
+            WITH delta (project_id, work_type_id, contractor_id, product_id, quantity) AS (VALUES %s)
+            INSERT INTO contractor_quantity_tracker (project_id, work_type_id, contractor_id, product_id,
+                                                     accumulated_quantity, last_updated, display_name,
+                                                     create_uid, create_date, write_uid, write_date)
+            SELECT d.project_id, d.work_type_id, d.contractor_id, d.product_id, d.quantity,
+                   now() at time zone 'UTC',
+                   p.name || ' - ' || w.name || ' - ' || c.name || ' - ' || pr.name,
+                   %%s, now() at time zone 'UTC', %%s, now() at time zone 'UTC'
+            FROM delta d
+            JOIN project_config p ON p.id = d.project_id
+            JOIN work_type_config w ON w.id = d.work_type_id
+            JOIN res_partner c ON c.id = d.contractor_id
+            JOIN contractor_product pr ON pr.id = d.product_id
+            WHERE d.quantity > 0 OR EXISTS (
+                SELECT 1 FROM contractor_quantity_tracker t
+                WHERE t.project_id = d.project_id AND t.work_type_id = d.work_type_id
+                  AND t.contractor_id = d.contractor_id AND t.product_id = d.product_id
+            )
+            ON CONFLICT (project_id, work_type_id, contractor_id, product_id) DO UPDATE
+            SET accumulated_quantity = contractor_quantity_tracker.accumulated_quantity + EXCLUDED.accumulated_quantity,
+                last_updated = EXCLUDED.last_updated,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """ % values, params + [self.env.uid, self.env.uid])
+
+        # تنظيف السجلات التي تحتوي على كمية صفر
+        self.env.cr.execute("""
+            WITH delta (project_id, work_type_id, contractor_id, product_id) AS (VALUES %s)
+            DELETE FROM contractor_quantity_tracker t
+            USING delta d
+            WHERE t.project_id = d.project_id AND t.work_type_id = d.work_type_id
+              AND t.contractor_id = d.contractor_id AND t.product_id = d.product_id
+              AND ABS(t.accumulated_quantity) < 0.000001
+        """ % ', '.join(['(%s, %s, %s, %s)'] * len(deltas)), [value for key in deltas for value in key])
+        self.invalidate_model()
+
+    @api.model
+    def _lock_quantity_keys(self, keys):
+        """Take transaction-level advisory locks on the tracker keys, always in the same order,
+        so concurrent confirmations sharing products queue up instead of deadlocking"""
+        cr = self.env.cr
+        values = ', '.join(['(%s, %s, %s, %s)'] * len(keys))
+        params = [value for key in keys for value in key]
+        for attempt in range(TRACKER_LOCK_RETRIES):
+            try:
+                with cr.savepoint(flush=False):
+                    cr.execute("SELECT current_setting('lock_timeout'), set_config('lock_timeout', %s, true)",
+                               (TRACKER_LOCK_TIMEOUT,))
+                    previous_timeout = cr.fetchone()[0]
+                    cr.execute("""
+                        SELECT pg_advisory_xact_lock(k)
+                        FROM (
+                            SELECT DISTINCT hashtextextended(concat_ws('-', 'contractor_quantity_tracker', p, w, c, pr), 0) AS k
+                            FROM (VALUES %s) AS d (p, w, c, pr)
+                        ) AS keys
+                        ORDER BY k
+                    """ % values, params)
+                    cr.execute("SELECT set_config('lock_timeout', %s, true)", (previous_timeout,))
+                return
+            except errors.LockNotAvailable:
+                if attempt == TRACKER_LOCK_RETRIES - 1:
+                    raise
+                _logger.debug("Quantity tracker keys busy, retrying (%s)", attempt + 1)
+                time.sleep(random.uniform(0, TRACKER_LOCK_BACKOFF * 2 ** attempt))
 
     _sql_constraints = [
         ('unique_tracker', 'unique(project_id, work_type_id, contractor_id, product_id)', 
@@ -659,6 +1169,40 @@ class ContractQuantity(models.Model):
     product_id = fields.Many2one('contractor.product', string='Product', required=True)
     quantity = fields.Float(string='Contract Quantity', required=True)
     display_name = fields.Char(string='Display Name', compute='_compute_display_name', store=True)
+    # Billed on non-draft statements, maintained by confirm and reset in SQL
+    billed_qty = fields.Float(string='Billed Qty', readonly=True, default=0.0)
+    billed_value = fields.Float(string='Billed Value', readonly=True, default=0.0)
+    remaining_qty = fields.Float(string='Remaining Qty', compute='_compute_balance', store=True)
+    progress_percent = fields.Float(string='Progress %', compute='_compute_balance', store=True, group_operator='avg')
+    revision_ids = fields.One2many('contract.quantity.revision', 'contract_quantity_id', string='Revisions')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        # Original quantity, in effect from the contract start
+        self.env['contract.quantity.revision'].create([
+            {'contract_quantity_id': record.id, 'quantity': record.quantity}
+            for record in records if not record.revision_ids
+        ])
+        return records
+
+    def write(self, vals):
+        result = super().write(vals)
+        if 'quantity' in vals and not self.env.context.get('contract_revision_sync'):
+            # A direct change is a revision effective today (or on the given revision_date)
+            self._revise_quantity(vals['quantity'], self.env.context.get('revision_date') or fields.Date.context_today(self))
+        return result
+
+    def _revise_quantity(self, quantity, date_from):
+        """Set the quantity in effect from ``date_from``, adding a revision or updating the one starting then"""
+        date_from = fields.Date.to_date(date_from)
+        Revision = self.env['contract.quantity.revision']
+        existing = Revision.search([('contract_quantity_id', 'in', self.ids), ('date_from', '=', date_from)])
+        existing.write({'quantity': quantity})
+        Revision.create([
+            {'contract_quantity_id': record.id, 'quantity': quantity, 'date_from': date_from}
+            for record in self - existing.contract_quantity_id
+        ])
 
     @api.depends('project_id', 'work_type_id', 'contractor_id', 'product_id')
     def _compute_display_name(self):
@@ -668,6 +1212,42 @@ class ContractQuantity(models.Model):
             else:
                 record.display_name = "Contract Quantity"
 
+    @api.depends('quantity', 'billed_qty')
+    def _compute_balance(self):
+        for record in self:
+            record.remaining_qty = record.quantity - record.billed_qty
+            record.progress_percent = record.billed_qty / record.quantity * 100 if record.quantity > 0 else 0.0
+
+    @api.model
+    def _apply_billed_statements(self, statements, sign=1):
+        """Add (sign=1) or remove (sign=-1) the positive line quantities and values of ``statements``
+        to the balances of their contract quantities, in one UPDATE"""
+        if not statements:
+            return
+        self.env['contractor.statement.line'].flush_model(['statement_id', 'product_id', 'current_qty', 'current_value'])
+        statements.flush_recordset(['project_id', 'work_type_id', 'contractor_id'])
+        self.flush_model(['quantity', 'billed_qty', 'billed_value'])
+        self.env.cr.execute("""
+            UPDATE contract_quantity q
+            SET billed_qty = q.billed_qty + d.qty,
+                billed_value = q.billed_value + d.value,
+                remaining_qty = q.quantity - (q.billed_qty + d.qty),
+                progress_percent = CASE WHEN q.quantity > 0 THEN (q.billed_qty + d.qty) / q.quantity * 100 ELSE 0 END,
+                write_uid = %(uid)s,
+                write_date = now() at time zone 'UTC'
+            FROM (
+                SELECT s.project_id, s.work_type_id, s.contractor_id, l.product_id,
+                       %(sign)s * SUM(l.current_qty) AS qty, %(sign)s * SUM(l.current_value) AS value
+                FROM contractor_statement_line l
+                JOIN contractor_statement s ON s.id = l.statement_id
+                WHERE s.id IN %(ids)s AND l.current_qty > 0
+                GROUP BY s.project_id, s.work_type_id, s.contractor_id, l.product_id
+            ) d
+            WHERE q.project_id = d.project_id AND q.work_type_id = d.work_type_id
+              AND q.contractor_id = d.contractor_id AND q.product_id = d.product_id
+        """, {'ids': tuple(statements.ids), 'sign': sign, 'uid': self.env.uid})
+        self.invalidate_model(['billed_qty', 'billed_value', 'remaining_qty', 'progress_percent', 'write_uid', 'write_date'])
+
     @api.onchange('work_type_id')
     def _onchange_work_type_id(self):
         if self.work_type_id:
@@ -825,46 +1405,42 @@ class DeductionsConfig(models.Model):
         Get the appropriate deduction accounts based on project and work type
         Returns a dictionary with account IDs and retention percentage
         """
-        # Search for specific configuration first
-        config = None
-        
-        if project_id and work_type_id:
-            config = self.search([
-                ('project_id', '=', project_id),
-                ('work_type_id', '=', work_type_id),
-                ('active', '=', True)
-            ], limit=1)
-        
-        if not config and project_id:
-            config = self.search([
-                ('project_id', '=', project_id),
-                ('work_type_id', '=', False),
-                ('active', '=', True)
-            ], limit=1)
-        
-        if not config and work_type_id:
-            config = self.search([
-                ('project_id', '=', False),
-                ('work_type_id', '=', work_type_id),
-                ('active', '=', True)
-            ], limit=1)
-        
-        # Fall back to default configuration
-        if not config:
-            config = self.search([
-                ('is_default', '=', True),
-                ('active', '=', True)
-            ], limit=1)
-        
-        if not config:
+        accounts = self._get_deduction_accounts_by_key([(project_id or False, work_type_id or False)])
+        if not accounts[project_id or False, work_type_id or False]:
             raise ValidationError("No deductions configuration found! Please set up at least one default configuration.")
-        
-        return {
-            'advance_payment_account_id': config.advance_payment_account_id.id if config.advance_payment_account_id else False,
-            'retention_account_id': config.retention_account_id.id if config.retention_account_id else False,
-            'other_deductions_account_id': config.other_deductions_account_id.id if config.other_deductions_account_id else False,
-            'retention_percentage': config.retention_percentage,
-        }
+        return accounts[project_id or False, work_type_id or False]
+
+    @api.model
+    def _get_deduction_accounts_by_key(self, keys):
+        """Return {(project_id, work_type_id): deduction accounts, or None without configuration}
+        from a single search: specific configuration first, then project, work type and default"""
+        configs = self.search([('active', '=', True)])
+        by_scope = {}
+        default = None
+        for config in configs:
+            by_scope.setdefault((config.project_id.id, config.work_type_id.id), config)
+            if config.is_default and not default:
+                default = config
+
+        result = {}
+        for project_id, work_type_id in keys:
+            config = None
+            if project_id and work_type_id:
+                config = by_scope.get((project_id, work_type_id))
+            if not config and project_id:
+                config = by_scope.get((project_id, False))
+            if not config and work_type_id:
+                config = by_scope.get((False, work_type_id))
+            # Fall back to default configuration
+            if not config:
+                config = default
+            result[project_id, work_type_id] = config and {
+                'advance_payment_account_id': config.advance_payment_account_id.id if config.advance_payment_account_id else False,
+                'retention_account_id': config.retention_account_id.id if config.retention_account_id else False,
+                'other_deductions_account_id': config.other_deductions_account_id.id if config.other_deductions_account_id else False,
+                'retention_percentage': config.retention_percentage,
+            }
+        return result
 
     _sql_constraints = [
         ('unique_project_work_type', 'unique(project_id, work_type_id, company_id)', 
@@ -985,308 +1561,3 @@ def action_export_excel(self):
             'url': f'/web/content/?model=contractor.statement&id={record.id}&field=xls_file&filename_field=xls_filename&download=true',
             'target': 'self',
         }
-
-
-
-
-
-class ContractorQuantityTracker(models.Model):
-    """Model to track accumulated quantities for better performance"""
-    _name = 'contractor.quantity.tracker'
-    _description = 'Contractor Quantity Tracker'
-    _rec_name = 'display_name'
-
-    project_id = fields.Many2one('project.config', string='Project', required=True)
-    work_type_id = fields.Many2one('work.type.config', string='Work Type', required=True)
-    contractor_id = fields.Many2one('res.partner', string='Contractor', required=True)
-    product_id = fields.Many2one('contractor.product', string='Product', required=True)
-    accumulated_quantity = fields.Float(string='Accumulated Quantity', default=0.0)
-    last_updated = fields.Datetime(string='Last Updated', default=fields.Datetime.now)
-    display_name = fields.Char(string='Display Name', compute='_compute_display_name', store=True)
-
-    @api.depends('project_id', 'work_type_id', 'contractor_id', 'product_id')
-    def _compute_display_name(self):
-        for record in self:
-            if record.project_id and record.work_type_id and record.contractor_id and record.product_id:
-                record.display_name = f"{record.project_id.name} - {record.work_type_id.name} - {record.contractor_id.name} - {record.product_id.name}"
-            else:
-                record.display_name = "Quantity Tracker"
-
-    def update_accumulated_quantity(self, project_id, work_type_id, contractor_id, product_id, quantity_to_add):
-        """Update or create tracker record"""
-        tracker = self.search([
-            ('project_id', '=', project_id),
-            ('work_type_id', '=', work_type_id),
-            ('contractor_id', '=', contractor_id),
-            ('product_id', '=', product_id)
-        ], limit=1)
-        
-        if tracker:
-            tracker.accumulated_quantity += quantity_to_add
-            tracker.last_updated = fields.Datetime.now()
-            
-            # تنظيف السجلات التي تحتوي على كمية صفر
-            if tracker.accumulated_quantity == 0:
-                tracker.unlink()
-        else:
-            if quantity_to_add > 0:  # إنشاء سجل جديد فقط إذا كانت الكمية أكبر من صفر
-                self.create({
-                    'project_id': project_id,
-                    'work_type_id': work_type_id,
-                    'contractor_id': contractor_id,
-                    'product_id': product_id,
-                    'accumulated_quantity': quantity_to_add,
-                    'last_updated': fields.Datetime.now()
-                })
-
-    _sql_constraints = [
-        ('unique_tracker', 'unique(project_id, work_type_id, contractor_id, product_id)', 
-         'Quantity tracker must be unique per project, work type, contractor, and product!'),
-    ]
-
-
-class ContractQuantity(models.Model):
-    _name = 'contract.quantity'
-    _description = 'Contract Quantity'
-    _rec_name = 'display_name'
-
-    project_id = fields.Many2one('project.config', string='Project', required=True)
-    work_type_id = fields.Many2one('work.type.config', string='Work Type', required=True)
-    contractor_id = fields.Many2one('res.partner', string='Contractor', domain="[('is_company', '=', True)]", required=True)
-    product_id = fields.Many2one('contractor.product', string='Product', required=True)
-    quantity = fields.Float(string='Contract Quantity', required=True)
-    display_name = fields.Char(string='Display Name', compute='_compute_display_name', store=True)
-
-    @api.depends('project_id', 'work_type_id', 'contractor_id', 'product_id')
-    def _compute_display_name(self):
-        for record in self:
-            if record.project_id and record.work_type_id and record.contractor_id and record.product_id:
-                record.display_name = f"{record.project_id.name} - {record.work_type_id.name} - {record.contractor_id.name} - {record.product_id.name}"
-            else:
-                record.display_name = "Contract Quantity"
-
-    @api.onchange('work_type_id')
-    def _onchange_work_type_id(self):
-        if self.work_type_id:
-            return {'domain': {'product_id': [('work_type_id', '=', self.work_type_id.id)]}}
-        return {'domain': {'product_id': []}}
-
-    _sql_constraints = [
-        ('unique_contract_qty', 'unique(project_id, work_type_id, contractor_id, product_id)', 
-         'Contract quantity must be unique per project, work type, contractor, and product!'),
-    ]
-class RetentionConfig(models.Model):
-    _name = 'retention.config'
-    _description = 'Retention Configuration'
-    _rec_name = 'display_name'
-
-    project_id = fields.Many2one('project.config', string='Project')
-    work_type_id = fields.Many2one('work.type.config', string='Work Type')
-    retention_percentage = fields.Float(string='Retention Percentage (%)', required=True, default=5.0)
-    is_default = fields.Boolean(string='Is Default', default=False)
-    active = fields.Boolean(string='Active', default=True)
-    display_name = fields.Char(string='Display Name', compute='_compute_display_name', store=True)
-
-    @api.depends('project_id', 'work_type_id', 'is_default')
-    def _compute_display_name(self):
-        for record in self:
-            if record.is_default:
-                record.display_name = f"Default - {record.retention_percentage}%"
-            elif record.project_id and record.work_type_id:
-                record.display_name = f"{record.project_id.name} - {record.work_type_id.name} - {record.retention_percentage}%"
-            elif record.project_id:
-                record.display_name = f"{record.project_id.name} - {record.retention_percentage}%"
-            elif record.work_type_id:
-                record.display_name = f"{record.work_type_id.name} - {record.retention_percentage}%"
-            else:
-                record.display_name = f"Retention Config - {record.retention_percentage}%"
-
-    @api.constrains('is_default')
-    def _check_default_unique(self):
-        for record in self:
-            if record.is_default:
-                existing_default = self.search([
-                    ('is_default', '=', True),
-                    ('id', '!=', record.id)
-                ])
-                if existing_default:
-                    raise ValidationError("Only one default retention configuration is allowed!")
-
-    _sql_constraints = [
-        ('unique_project_work_type', 'unique(project_id, work_type_id)', 
-         'Retention configuration must be unique per project and work type!'),
-    ]
-
-
-class ProjectConfig(models.Model):
-    _name = 'project.config'
-    _description = 'Project Configuration'
-    
-    name = fields.Char(string='Project Name', required=True)
-    code = fields.Char(string='Project Code', required=True)
-    description = fields.Text(string='Description')
-    active = fields.Boolean(string='Active', default=True)
-    
-    _sql_constraints = [
-        ('code_unique', 'unique(code)', 'Project code must be unique!'),
-    ]
-
-
-class WorkTypeConfig(models.Model):
-    _name = 'work.type.config'
-    _description = 'Work Type Configuration'
-    
-    name = fields.Char(string='Work Type', required=True)
-    code = fields.Char(string='Work Type Code', required=True)
-    description = fields.Text(string='Description')
-    active = fields.Boolean(string='Active', default=True)
-    
-    _sql_constraints = [
-        ('code_unique', 'unique(code)', 'Work type code must be unique!'),
-    ]
-
-class DeductionsConfig(models.Model):
-    _name = 'deductions.config'
-    _description = 'Deductions Configuration'
-    _rec_name = 'display_name'
-
-    # Configuration Info
-    name = fields.Char(string='Configuration Name', required=True, default='Default Deductions Configuration')
-    active = fields.Boolean(string='Active', default=True)
-    is_default = fields.Boolean(string='Is Default Configuration', default=False)
-    company_id = fields.Many2one('res.company', string='Company', default=lambda self: self.env.company)
-    
-    # Deduction Accounts
-    advance_payment_account_id = fields.Many2one(
-        'account.account', 
-        string='Advance Payment Account',
-        domain="[('company_id', '=', company_id)]",
-        help="Account used for advance payment deductions"
-    )
-    
-    retention_account_id = fields.Many2one(
-        'account.account', 
-        string='Retention Account',
-        domain="[('company_id', '=', company_id)]",
-        help="Account used for retention/warranty deductions"
-    )
-    
-    retention_percentage = fields.Float(
-        string='Retention %', 
-        default=5.0,
-        help="Default percentage for retention deductions"
-    )
-    
-    other_deductions_account_id = fields.Many2one(
-        'account.account', 
-        string='Other Deductions Account',
-        domain="[('company_id', '=', company_id)]",
-        help="Account used for other miscellaneous deductions"
-    )
-    
-    # Optional: Project/Work Type Specific
-    project_id = fields.Many2one('project.config', string='Specific Project', help="Leave empty for general configuration")
-    work_type_id = fields.Many2one('work.type.config', string='Specific Work Type', help="Leave empty for general configuration")
-    
-    # Display Name
-    display_name = fields.Char(string='Display Name', compute='_compute_display_name', store=True)
-    
-    @api.depends('name', 'project_id', 'work_type_id', 'is_default')
-    def _compute_display_name(self):
-        for record in self:
-            if record.is_default:
-                record.display_name = f"Default - {record.name}"
-            elif record.project_id and record.work_type_id:
-                record.display_name = f"{record.project_id.name} - {record.work_type_id.name} - {record.name}"
-            elif record.project_id:
-                record.display_name = f"{record.project_id.name} - {record.name}"
-            elif record.work_type_id:
-                record.display_name = f"{record.work_type_id.name} - {record.name}"
-            else:
-                record.display_name = record.name
-
-    @api.constrains('is_default')
-    def _check_default_unique(self):
-        for record in self:
-            if record.is_default:
-                existing_default = self.search([
-                    ('is_default', '=', True),
-                    ('id', '!=', record.id),
-                    ('company_id', '=', record.company_id.id)
-                ])
-                if existing_default:
-                    raise ValidationError("Only one default deductions configuration is allowed per company!")
-
-    def get_deduction_accounts(self, project_id=None, work_type_id=None):
-        """
-        Get the appropriate deduction accounts based on project and work type
-        Returns a dictionary with account IDs and retention percentage
-        """
-        # Search for specific configuration first
-        config = None
-        
-        if project_id and work_type_id:
-            config = self.search([
-                ('project_id', '=', project_id),
-                ('work_type_id', '=', work_type_id),
-                ('active', '=', True)
-            ], limit=1)
-        
-        if not config and project_id:
-            config = self.search([
-                ('project_id', '=', project_id),
-                ('work_type_id', '=', False),
-                ('active', '=', True)
-            ], limit=1)
-        
-        if not config and work_type_id:
-            config = self.search([
-                ('project_id', '=', False),
-                ('work_type_id', '=', work_type_id),
-                ('active', '=', True)
-            ], limit=1)
-        
-        # Fall back to default configuration
-        if not config:
-            config = self.search([
-                ('is_default', '=', True),
-                ('active', '=', True)
-            ], limit=1)
-        
-        if not config:
-            raise ValidationError("No deductions configuration found! Please set up at least one default configuration.")
-        
-        return {
-            'advance_payment_account_id': config.advance_payment_account_id.id if config.advance_payment_account_id else False,
-            'retention_account_id': config.retention_account_id.id if config.retention_account_id else False,
-            'other_deductions_account_id': config.other_deductions_account_id.id if config.other_deductions_account_id else False,
-            'retention_percentage': config.retention_percentage,
-        }
-
-    _sql_constraints = [
-        ('unique_project_work_type', 'unique(project_id, work_type_id, company_id)', 
-         'Deductions configuration must be unique per project, work type, and company!'),
-    ]
-
-
-class ContractorProduct(models.Model):
-    _name = 'contractor.product'
-    _description = 'Contractor Product'
-    
-    name = fields.Char(string='Product Name', required=True)
-    code = fields.Char(string='Product Code', required=True)
-    unit = fields.Char(string='Unit of Measure', required=True)
-    work_type_id = fields.Many2one('work.type.config', string='Work Type', required=True)
-    description = fields.Text(string='Description')
-    active = fields.Boolean(string='Active', default=True)
-    
-    # Account Configuration
-    account_type = fields.Selection([
-        ('in', 'In'),
-        ('out', 'Out')
-    ], string='Account Type', required=True, default='in')
-    in_account_id = fields.Many2one('account.account', string='In Account')
-    out_account_id = fields.Many2one('account.account', string='Out Account')
-    
-    _sql_constraints = [
-        ('code_unique', 'unique(code)', 'Product code must be unique!'),]
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+
+DIMENSION_START = '2000-01-01'
+DIMENSION_END = '2060-12-31'
+
+
+class ContractorDateDimension(models.Model):
+    """Calendar dimension joined by the analysis views on the company and the statement date.
+
+    Every period comes as a sortable integer key (``YYYYMM``, ``YYYYQ``, ``IYYYIW``) next to its
+    label. There is one row per company and date, so fiscal periods follow each company's fiscal
+    year end.
+    """
+    _name = 'contractor.date.dimension'
+    _description = 'Contractor Date Dimension'
+    _order = 'date'
+    _rec_name = 'date'
+
+    company_id = fields.Many2one('res.company', string='Company', required=True, readonly=True, ondelete='cascade')
+    date = fields.Date(string='Date', required=True, readonly=True)
+    day_key = fields.Integer(string='Day Key', readonly=True, group_operator=False)
+    month_key = fields.Integer(string='Month Key', readonly=True, group_operator=False)
+    quarter_key = fields.Integer(string='Quarter Key', readonly=True, group_operator=False)
+    week_key = fields.Integer(string='Week Key', readonly=True, group_operator=False)
+    year = fields.Integer(string='Year', readonly=True, group_operator=False)
+    month_name = fields.Char(string='Month', readonly=True)
+    quarter_name = fields.Char(string='Quarter', readonly=True)
+    week_name = fields.Char(string='Week', readonly=True)
+    fiscal_year = fields.Integer(string='Fiscal Year', readonly=True, group_operator=False)
+    fiscal_period = fields.Integer(string='Fiscal Period', readonly=True, group_operator=False)
+    fiscal_period_key = fields.Integer(string='Fiscal Period Key', readonly=True, group_operator=False)
+    fiscal_period_name = fields.Char(string='Fiscal Period Name', readonly=True)
+
+    _sql_constraints = [
+        ('date_unique', 'unique(company_id, date)', 'The date dimension holds one row per company and date!'),
+    ]
+
+    def init(self):
+        self._populate()
+
+    @api.model
+    def _populate(self, companies=None, date_from=DIMENSION_START, date_to=DIMENSION_END):
+        """Insert (or refresh) one row per company (all of them by default) and day in a single
+        set-based statement"""
+        companies = companies or self.env['res.company'].sudo().with_context(active_test=False).search([])
+        if not companies:
+            return
+        self.env.cr.execute("""
+            WITH companies AS (
+                SELECT * FROM unnest(%(company_ids)s::integer[], %(last_months)s::integer[]) AS c (id, last_month)
+            ), days AS (
+                SELECT d::date AS date,
+                       extract(month FROM d)::int AS month,
+                       extract(year FROM d)::int AS year
+                FROM generate_series(%(date_from)s::date, %(date_to)s::date, interval '1 day') AS d
+            ), fiscal AS (
+                -- The fiscal year is named after the calendar year it ends in
+                SELECT c.id AS company_id, days.*,
+                       year + (month > c.last_month)::int AS fiscal_year,
+                       (month - c.last_month + 11) %% 12 + 1 AS fiscal_period
+                FROM companies c
+                CROSS JOIN days
+            )
+            INSERT INTO contractor_date_dimension (
+                company_id, date, day_key, month_key, quarter_key, week_key, year,
+                month_name, quarter_name, week_name,
+                fiscal_year, fiscal_period, fiscal_period_key, fiscal_period_name,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT company_id, date,
+                   to_char(date, 'YYYYMMDD')::int,
+                   year * 100 + month,
+                   year * 10 + extract(quarter FROM date)::int,
+                   to_char(date, 'IYYYIW')::int,
+                   year,
+                   to_char(date, 'FMMonth YYYY'),
+                   'Q' || to_char(date, 'Q YYYY'),
+                   to_char(date, 'IYYY-"W"IW'),
+                   fiscal_year,
+                   fiscal_period,
+                   fiscal_year * 100 + fiscal_period,
+                   'FY' || fiscal_year || ' P' || lpad(fiscal_period::text, 2, '0'),
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM fiscal
+            ON CONFLICT (company_id, date) DO UPDATE
+            SET fiscal_year = EXCLUDED.fiscal_year,
+                fiscal_period = EXCLUDED.fiscal_period,
+                fiscal_period_key = EXCLUDED.fiscal_period_key,
+                fiscal_period_name = EXCLUDED.fiscal_period_name,
+                write_date = EXCLUDED.write_date
+            WHERE contractor_date_dimension.fiscal_period_key IS DISTINCT FROM EXCLUDED.fiscal_period_key
+        """, {
+            'company_ids': companies.ids,
+            'last_months': [int(company.fiscalyear_last_month or 12) for company in companies],
+            'date_from': date_from,
+            'date_to': date_to,
+            'uid': self.env.uid,
+        })
+        self.invalidate_model()
+
+
+class ResCompany(models.Model):
+    _inherit = 'res.company'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        companies = super(ResCompany, self).create(vals_list)
+        self.env['contractor.date.dimension']._populate(companies)
+        return companies
+
+    def write(self, vals):
+        res = super(ResCompany, self).write(vals)
+        if 'fiscalyear_last_month' in vals:
+            self.env['contractor.date.dimension']._populate(self)
+        return res
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+
+
+class ContractorPriceIndex(models.Model):
+    """Latest agreed unit price per (project, contractor, product).
+
+    Upserted when statements are confirmed and rebuilt from the statement history (live and
+    archived) for the keys of statements reset to draft or deleted, so prefill, onchange and
+    deviation checks read one row per product instead of scanning the statement lines.
+    """
+    _name = 'contractor.price.index'
+    _description = 'Contractor Unit Price Index'
+    _rec_name = 'product_id'
+
+    project_id = fields.Many2one('project.config', string='Project', required=True, readonly=True, ondelete='cascade')
+    contractor_id = fields.Many2one('res.partner', string='Contractor', required=True, readonly=True, ondelete='cascade')
+    product_id = fields.Many2one('contractor.product', string='Product', required=True, readonly=True, ondelete='cascade')
+    unit_price = fields.Float(string='Last Unit Price', readonly=True)
+    previous_price = fields.Float(string='Previous Unit Price', readonly=True)
+    statement_id = fields.Many2one('contractor.statement', string='Last Statement', readonly=True, ondelete='set null')
+    statement_date = fields.Date(string='Last Statement Date', readonly=True)
+
+    _sql_constraints = [
+        ('unique_price_index', 'unique(project_id, contractor_id, product_id)',
+         'Only one price index entry per project, contractor and product!'),
+    ]
+
+    def init(self):
+        self.env.cr.execute("SELECT 1 FROM contractor_price_index LIMIT 1")
+        if not self.env.cr.fetchone():
+            self._rebuild()
+
+    @api.model
+    def _get_prices(self, keys):
+        """Return {(project_id, contractor_id, product_id): (unit price, previous price, statement id)}"""
+        keys = {key for key in keys if all(key)}
+        if not keys:
+            return {}
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT project_id, contractor_id, product_id, unit_price, previous_price, statement_id
+            FROM contractor_price_index
+            WHERE (project_id, contractor_id, product_id) IN %s
+        """, [tuple(keys)])
+        return {tuple(row[:3]): row[3:] for row in self.env.cr.fetchall()}
+
+    @api.model
+    def _update_from_statements(self, statements):
+        """Record the unit prices of newly confirmed ``statements``, unless a later statement set them"""
+        if not statements:
+            return
+        self.env['contractor.statement'].flush_model(['project_id', 'contractor_id', 'statement_date'])
+        self.env['contractor.statement.line'].flush_model(['statement_id', 'product_id', 'unit_price'])
+        self.env.cr.execute("""
+            INSERT INTO contractor_price_index (project_id, contractor_id, product_id, unit_price, statement_id,
+                                                statement_date, create_uid, create_date, write_uid, write_date)
+            SELECT DISTINCT ON (s.project_id, s.contractor_id, l.product_id)
+                   s.project_id, s.contractor_id, l.product_id, l.unit_price, s.id, s.statement_date,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM contractor_statement_line l
+            JOIN contractor_statement s ON s.id = l.statement_id
+            WHERE s.id IN %(ids)s
+            ORDER BY s.project_id, s.contractor_id, l.product_id, s.statement_date DESC, s.id DESC, l.id DESC
+            ON CONFLICT (project_id, contractor_id, product_id) DO UPDATE
+            SET previous_price = CASE WHEN contractor_price_index.statement_id = EXCLUDED.statement_id
+                                      THEN contractor_price_index.previous_price
+                                      ELSE contractor_price_index.unit_price END,
+                unit_price = EXCLUDED.unit_price,
+                statement_id = EXCLUDED.statement_id,
+                statement_date = EXCLUDED.statement_date,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+            WHERE (EXCLUDED.statement_date, EXCLUDED.statement_id)
+                  >= (contractor_price_index.statement_date, COALESCE(contractor_price_index.statement_id, 0))
+        """, {'ids': tuple(statements.ids), 'uid': self.env.uid})
+        self.invalidate_model()
+
+    @api.model
+    def _rebuild(self, keys=None):
+        """Recompute the entries of ``keys`` (all entries without keys) from the non-draft statements"""
+        if keys is not None:
+            keys = {key for key in keys if all(key)}
+            if not keys:
+                return
+        self.env.flush_all()
+        key_filter = "(s.project_id, s.contractor_id, l.product_id) IN %(keys)s" if keys else "TRUE"
+        params = {'keys': tuple(keys or ()), 'uid': self.env.uid}
+        self.env.cr.execute(f"""
+            DELETE FROM contractor_price_index
+            WHERE {"(project_id, contractor_id, product_id) IN %(keys)s" if keys else "TRUE"}
+        """, params)
+        self.env.cr.execute(f"""
+            WITH per_statement AS (
+                SELECT DISTINCT ON (s.project_id, s.contractor_id, l.product_id, s.id)
+                       s.project_id, s.contractor_id, l.product_id, l.unit_price, s.id AS statement_id,
+                       s.statement_date, false AS archived
+                FROM contractor_statement_line l
+                JOIN contractor_statement s ON s.id = l.statement_id
+                WHERE s.state != 'draft' AND {key_filter}
+                ORDER BY s.project_id, s.contractor_id, l.product_id, s.id, l.id DESC
+            ), per_archived_statement AS (
+                SELECT DISTINCT ON (s.project_id, s.contractor_id, l.product_id, s.id)
+                       s.project_id, s.contractor_id, l.product_id, l.unit_price, s.id AS statement_id,
+                       s.statement_date, true AS archived
+                FROM contractor_statement_line_archive l
+                JOIN contractor_statement_archive s ON s.id = l.statement_id
+                WHERE {key_filter}
+                ORDER BY s.project_id, s.contractor_id, l.product_id, s.id, l.id DESC
+            ), ranked AS (
+                SELECT *, row_number() OVER (PARTITION BY project_id, contractor_id, product_id
+                                             ORDER BY statement_date DESC, statement_id DESC) AS rank
+                FROM (SELECT * FROM per_statement UNION ALL SELECT * FROM per_archived_statement) AS history
+            )
+            INSERT INTO contractor_price_index (project_id, contractor_id, product_id, unit_price, previous_price,
+                                                statement_id, statement_date,
+                                                create_uid, create_date, write_uid, write_date)
+            SELECT c.project_id, c.contractor_id, c.product_id, c.unit_price, p.unit_price,
+                   CASE WHEN c.archived THEN NULL ELSE c.statement_id END, c.statement_date,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM ranked c
+            LEFT JOIN ranked p ON p.project_id = c.project_id AND p.contractor_id = c.contractor_id
+                              AND p.product_id = c.product_id AND p.rank = 2
+            WHERE c.rank = 1
+        """, params)
+        self.invalidate_model()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import models, fields, api
+
+from .schema import create_index_concurrently
+
+_logger = logging.getLogger(__name__)
+
+
+class ContractorProgressSnapshot(models.Model):
+    """Cumulative progress per (project, work type, contractor, product) at each month end.
+
+    Each period is written with one INSERT ... SELECT that adds the period's billed lines to the
+    previous snapshot, so S-curves read a compact time series instead of the statement history.
+    Confirming or resetting a statement of a period already taken drops that period and the ones
+    after it, and the scheduled action takes them again.
+    """
+    _name = 'contractor.progress.snapshot'
+    _description = 'Contractor Progress Snapshot'
+    _order = 'snapshot_date, project_id, product_id'
+
+    snapshot_date = fields.Date(string='Period End', required=True, readonly=True)
+    project_id = fields.Many2one('project.config', string='Project', required=True, readonly=True)
+    work_type_id = fields.Many2one('work.type.config', string='Work Type', required=True, readonly=True)
+    contractor_id = fields.Many2one('res.partner', string='Contractor', required=True, readonly=True)
+    product_id = fields.Many2one('contractor.product', string='Product', required=True, readonly=True)
+    contract_qty = fields.Float(string='Contract Qty', readonly=True)
+    cumulative_qty = fields.Float(string='Cumulative Qty', readonly=True)
+    cumulative_value = fields.Float(string='Cumulative Value', readonly=True)
+    progress_percent = fields.Float(string='Progress %', readonly=True, group_operator='avg')
+
+    _sql_constraints = [
+        ('unique_snapshot', 'unique(snapshot_date, project_id, work_type_id, contractor_id, product_id)',
+         'Only one progress snapshot per period and item!'),
+    ]
+
+    def init(self):
+        create_index_concurrently(self.env.cr, 'contractor_progress_snapshot_project_date_idx',
+                                  self._table, '(project_id, snapshot_date)')
+
+    @api.model
+    def _take_snapshot(self, period_end, previous_end=None):
+        """Write the snapshot of ``period_end`` from the one of ``previous_end`` plus the lines
+        of non-draft statements dated in between (the whole history without ``previous_end``)"""
+        self.env.flush_all()
+        self.env.cr.execute("""
+            WITH billed AS (
+                SELECT s.project_id, s.work_type_id, s.contractor_id, l.product_id, l.current_qty, l.current_value
+                FROM contractor_statement s
+                JOIN contractor_statement_line l ON l.statement_id = s.id
+                WHERE s.state != 'draft'
+                  AND s.statement_date <= %(period_end)s
+                  AND (%(previous_end)s::date IS NULL OR s.statement_date > %(previous_end)s::date)
+                UNION ALL
+                SELECT s.project_id, s.work_type_id, s.contractor_id, l.product_id, l.current_qty, l.current_value
+                FROM contractor_statement_archive s
+                JOIN contractor_statement_line_archive l ON l.statement_id = s.id
+                WHERE s.statement_date <= %(period_end)s
+                  AND (%(previous_end)s::date IS NULL OR s.statement_date > %(previous_end)s::date)
+                UNION ALL
+                SELECT project_id, work_type_id, contractor_id, product_id, cumulative_qty, cumulative_value
+                FROM contractor_progress_snapshot
+                WHERE snapshot_date = %(previous_end)s::date
+            ), totals AS (
+                SELECT project_id, work_type_id, contractor_id, product_id,
+                       SUM(current_qty) AS qty, SUM(current_value) AS value
+                FROM billed
+                GROUP BY project_id, work_type_id, contractor_id, product_id
+            )
+            INSERT INTO contractor_progress_snapshot (
+                snapshot_date, project_id, work_type_id, contractor_id, product_id,
+                contract_qty, cumulative_qty, cumulative_value, progress_percent,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT %(period_end)s, t.project_id, t.work_type_id, t.contractor_id, t.product_id,
+                   COALESCE(r.quantity, q.quantity, 0), t.qty, t.value,
+                   CASE WHEN COALESCE(r.quantity, q.quantity) > 0 THEN t.qty / COALESCE(r.quantity, q.quantity) * 100 ELSE 0 END,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM totals t
+            LEFT JOIN contract_quantity q
+                   ON q.project_id = t.project_id AND q.work_type_id = t.work_type_id
+                  AND q.contractor_id = t.contractor_id AND q.product_id = t.product_id
+            -- Contract quantity in effect at the end of the period
+            LEFT JOIN contract_quantity_revision r
+                   ON r.contract_quantity_id = q.id AND daterange(r.date_from, r.date_to) @> %(period_end)s::date
+            ON CONFLICT (snapshot_date, project_id, work_type_id, contractor_id, product_id) DO UPDATE
+            SET contract_qty = EXCLUDED.contract_qty,
+                cumulative_qty = EXCLUDED.cumulative_qty,
+                cumulative_value = EXCLUDED.cumulative_value,
+                progress_percent = EXCLUDED.progress_percent,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """, {'period_end': period_end, 'previous_end': previous_end, 'uid': self.env.uid})
+        rows = self.env.cr.rowcount
+        self.invalidate_model()
+        return rows
+
+    @api.model
+    def _invalidate_from(self, date):
+        """Drop the snapshots of the periods ending on or after ``date``, whose totals changed, and
+        have the scheduled action take them again from the previous period"""
+        if not date:
+            return
+        self.env.cr.execute("DELETE FROM contractor_progress_snapshot WHERE snapshot_date >= %s", [date])
+        if self.env.cr.rowcount:
+            _logger.info("Progress snapshots from %s dropped: %s items", date, self.env.cr.rowcount)
+            self.invalidate_model()
+            self.env.ref('constructor.ir_cron_progress_snapshots')._trigger()
+
+    @api.model
+    def _cron_take_snapshots(self):
+        """Snapshot every month end since the last snapshot (or the first statement), up to last month"""
+        last_period = fields.Date.today() + relativedelta(day=1, days=-1)
+        self.env.cr.execute("SELECT MAX(snapshot_date) FROM contractor_progress_snapshot")
+        previous_end = self.env.cr.fetchone()[0]
+        if previous_end:
+            period_end = previous_end + relativedelta(months=1, day=31)
+        else:
+            self.env.cr.execute("""
+                SELECT MIN(statement_date) FROM (
+                    SELECT statement_date FROM contractor_statement WHERE state != 'draft'
+                    UNION ALL
+                    SELECT statement_date FROM contractor_statement_archive
+                ) AS dates
+            """)
+            first_date = self.env.cr.fetchone()[0]
+            if not first_date:
+                return
+            period_end = first_date + relativedelta(day=31)
+
+        while period_end <= last_period:
+            rows = self._take_snapshot(period_end, previous_end)
+            _logger.info("Progress snapshot of %s: %s items", period_end, rows)
+            previous_end = period_end
+            period_end = period_end + relativedelta(months=1, day=31)
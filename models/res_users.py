@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+
+
+class ResUsers(models.Model):
+    _inherit = 'res.users'
+
+    contractor_profile_calls = fields.Integer(
+        string='Profile Next Statement Calls',
+        default=0,
+        help="Number of upcoming contractor statement actions and computes run by this user to capture "
+             "with cProfile and SQL timings. Each capture is stored as a zip file only administrators can read.",
+    )
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'contractor_profile_calls' in vals:
+            # Cached by contractor.performance.stat._get_instrumentation_state
+            self.env.registry.clear_cache()
+        return res
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""Set-based schema helpers shared by the models' ``init``, the init hooks and the migrations"""
+
+import logging
+from contextlib import closing
+
+from odoo import sql_db
+
+_logger = logging.getLogger(__name__)
+
+# Python formats floats as "5.0", PostgreSQL as "5"
+_PERCENT_SQL = "CASE WHEN {0} = trunc({0}) THEN trunc({0})::bigint::text || '.0' ELSE {0}::text END || '%'"
+
+# table: [(column, type, UPDATE statement setting the column from the same inputs as its compute)]
+STORED_COMPUTES = {
+    'contract_quantity': [
+        ('display_name', 'varchar', """
+            UPDATE contract_quantity t
+            SET display_name = p.name || ' - ' || w.name || ' - ' || c.name || ' - ' || pr.name
+            FROM project_config p, work_type_config w, res_partner c, contractor_product pr
+            WHERE p.id = t.project_id AND w.id = t.work_type_id AND c.id = t.contractor_id AND pr.id = t.product_id
+              AND t.display_name IS DISTINCT FROM p.name || ' - ' || w.name || ' - ' || c.name || ' - ' || pr.name
+        """),
+        ('billed_qty', 'float8', None),
+        ('billed_value', 'float8', None),
+        ('remaining_qty', 'float8', None),
+        ('progress_percent', 'float8', """
+            WITH billed AS (
+                SELECT s.project_id, s.work_type_id, s.contractor_id, l.product_id, l.current_qty, l.current_value
+                FROM contractor_statement_line l
+                JOIN contractor_statement s ON s.id = l.statement_id
+                WHERE s.state != 'draft' AND l.current_qty > 0
+                {archived}
+            ), totals AS (
+                SELECT q.id, COALESCE(SUM(b.current_qty), 0) AS qty, COALESCE(SUM(b.current_value), 0) AS value
+                FROM contract_quantity q
+                LEFT JOIN billed b ON b.project_id = q.project_id AND b.work_type_id = q.work_type_id
+                                  AND b.contractor_id = q.contractor_id AND b.product_id = q.product_id
+                GROUP BY q.id
+            )
+            UPDATE contract_quantity q
+            SET billed_qty = t.qty,
+                billed_value = t.value,
+                remaining_qty = q.quantity - t.qty,
+                progress_percent = CASE WHEN q.quantity > 0 THEN t.qty / q.quantity * 100 ELSE 0 END
+            FROM totals t
+            WHERE t.id = q.id
+              AND (q.billed_qty IS DISTINCT FROM t.qty OR q.billed_value IS DISTINCT FROM t.value
+                   OR q.remaining_qty IS DISTINCT FROM q.quantity - t.qty OR q.progress_percent IS NULL)
+        """),
+    ],
+    'contractor_quantity_tracker': [('display_name', 'varchar', """
+        UPDATE contractor_quantity_tracker t
+        SET display_name = p.name || ' - ' || w.name || ' - ' || c.name || ' - ' || pr.name
+        FROM project_config p, work_type_config w, res_partner c, contractor_product pr
+        WHERE p.id = t.project_id AND w.id = t.work_type_id AND c.id = t.contractor_id AND pr.id = t.product_id
+          AND t.display_name IS DISTINCT FROM p.name || ' - ' || w.name || ' - ' || c.name || ' - ' || pr.name
+    """)],
+    'retention_config': [('display_name', 'varchar', f"""
+        UPDATE retention_config t
+        SET display_name = n.name
+        FROM (
+            SELECT r.id, CASE
+                WHEN r.is_default THEN 'Default - '
+                WHEN p.id IS NOT NULL AND w.id IS NOT NULL THEN p.name || ' - ' || w.name || ' - '
+                WHEN p.id IS NOT NULL THEN p.name || ' - '
+                WHEN w.id IS NOT NULL THEN w.name || ' - '
+                ELSE 'Retention Config - '
+            END || {_PERCENT_SQL.format('r.retention_percentage')} AS name
+            FROM retention_config r
+            LEFT JOIN project_config p ON p.id = r.project_id
+            LEFT JOIN work_type_config w ON w.id = r.work_type_id
+        ) n
+        WHERE n.id = t.id AND t.display_name IS DISTINCT FROM n.name
+    """)],
+    'deductions_config': [('display_name', 'varchar', """
+        UPDATE deductions_config t
+        SET display_name = n.name
+        FROM (
+            SELECT d.id, CASE
+                WHEN d.is_default THEN 'Default - ' || d.name
+                WHEN p.id IS NOT NULL AND w.id IS NOT NULL THEN p.name || ' - ' || w.name || ' - ' || d.name
+                WHEN p.id IS NOT NULL THEN p.name || ' - ' || d.name
+                WHEN w.id IS NOT NULL THEN w.name || ' - ' || d.name
+                ELSE d.name
+            END AS name
+            FROM deductions_config d
+            LEFT JOIN project_config p ON p.id = d.project_id
+            LEFT JOIN work_type_config w ON w.id = d.work_type_id
+        ) n
+        WHERE n.id = t.id AND t.display_name IS DISTINCT FROM n.name
+    """)],
+    'contractor_statement_line': [
+        ('unit', 'varchar', None),
+        ('description', 'varchar', """
+            UPDATE contractor_statement_line l
+            SET description = pr.name, unit = pr.unit
+            FROM contractor_product pr
+            WHERE pr.id = l.product_id
+              AND (l.description IS DISTINCT FROM pr.name OR l.unit IS DISTINCT FROM pr.unit)
+        """),
+        ('contract_qty', 'float8', """
+            UPDATE contractor_statement_line l
+            SET contract_qty = n.contract_qty
+            FROM (
+                SELECT l.id, COALESCE(r.quantity, q.quantity, 0) AS contract_qty
+                FROM contractor_statement_line l
+                JOIN contractor_statement s ON s.id = l.statement_id
+                LEFT JOIN contract_quantity q
+                       ON q.project_id = s.project_id AND q.work_type_id = s.work_type_id
+                      AND q.contractor_id = s.contractor_id AND q.product_id = l.product_id
+                {revision}
+            ) n
+            WHERE n.id = l.id AND l.contract_qty IS DISTINCT FROM n.contract_qty
+        """),
+        ('prev_qty', 'float8', None),
+        ('total_qty', 'float8', None),
+        ('remaining_qty', 'float8', None),
+        ('progress_percent', 'float8', None),
+        ('current_value', 'float8', None),
+        ('total_value', 'float8', """
+            UPDATE contractor_statement_line
+            SET total_qty = COALESCE(prev_qty, 0) + current_qty,
+                remaining_qty = COALESCE(contract_qty, 0) - (COALESCE(prev_qty, 0) + current_qty),
+                progress_percent = CASE WHEN contract_qty > 0
+                                        THEN (COALESCE(prev_qty, 0) + current_qty) / contract_qty * 100 ELSE 0 END,
+                current_value = current_qty * unit_price,
+                total_value = (COALESCE(prev_qty, 0) + current_qty) * unit_price
+            WHERE total_qty IS DISTINCT FROM COALESCE(prev_qty, 0) + current_qty
+               OR remaining_qty IS DISTINCT FROM COALESCE(contract_qty, 0) - (COALESCE(prev_qty, 0) + current_qty)
+               OR current_value IS DISTINCT FROM current_qty * unit_price
+               OR total_value IS DISTINCT FROM (COALESCE(prev_qty, 0) + current_qty) * unit_price
+        """),
+    ],
+}
+
+# Previous quantities of newly added prev_qty columns, read as the compute reads them: the quantity
+# tracker of the contract item, else the quantities billed on its earlier non-draft statements (live or archived)
+_PREV_QTY_BACKFILL = """
+    CREATE TEMPORARY TABLE contractor_prev_qty ON COMMIT DROP AS
+    SELECT project_id, work_type_id, contractor_id, product_id, statement_date,
+           SUM(SUM(current_qty)) OVER (PARTITION BY project_id, work_type_id, contractor_id, product_id
+                                       ORDER BY statement_date) AS cumulative_qty
+    FROM (
+        SELECT s.project_id, s.work_type_id, s.contractor_id, l.product_id, s.statement_date, l.current_qty
+        FROM contractor_statement_line l
+        JOIN contractor_statement s ON s.id = l.statement_id
+        WHERE s.state != 'draft'
+        {archived}
+    ) AS billed
+    GROUP BY project_id, work_type_id, contractor_id, product_id, statement_date;
+    CREATE INDEX ON contractor_prev_qty (project_id, work_type_id, contractor_id, product_id, statement_date);
+    ANALYZE contractor_prev_qty;
+
+    -- As _get_previous_quantities: the quantity tracker first, the earlier statements without tracker
+    UPDATE contractor_statement_line l
+    SET prev_qty = COALESCE({tracker}, (
+        SELECT p.cumulative_qty FROM contractor_prev_qty p
+        WHERE p.project_id = s.project_id AND p.work_type_id = s.work_type_id
+          AND p.contractor_id = s.contractor_id AND p.product_id = l.product_id
+          AND p.statement_date < s.statement_date
+        ORDER BY p.statement_date DESC
+        LIMIT 1
+    ), 0)
+    FROM contractor_statement s
+    WHERE s.id = l.statement_id;
+"""
+_PREV_QTY_TRACKER = """(
+        SELECT COALESCE(t.accumulated_quantity, 0) FROM contractor_quantity_tracker t
+        WHERE t.project_id = s.project_id AND t.work_type_id = s.work_type_id
+          AND t.contractor_id = s.contractor_id AND t.product_id = l.product_id
+    )"""
+_PREV_QTY_ARCHIVED = """
+        UNION ALL
+        SELECT s.project_id, s.work_type_id, s.contractor_id, l.product_id, s.statement_date, l.current_qty
+        FROM contractor_statement_line_archive l
+        JOIN contractor_statement_archive s ON s.id = l.statement_id
+"""
+
+_BILLED_ARCHIVED = """
+                UNION ALL
+                SELECT s.project_id, s.work_type_id, s.contractor_id, l.product_id, l.current_qty, l.current_value
+                FROM contractor_statement_line_archive l
+                JOIN contractor_statement_archive s ON s.id = l.statement_id
+                WHERE l.current_qty > 0
+"""
+# Quantity in effect on the statement date, once variation orders are recorded as revisions
+_REVISION_JOIN = """
+                LEFT JOIN contract_quantity_revision r
+                       ON r.contract_quantity_id = q.id AND daterange(r.date_from, r.date_to) @> s.statement_date
+"""
+_NO_REVISION_JOIN = "LEFT JOIN (SELECT NULL::float8 AS quantity) r ON true"
+
+
+def _table_exists(cr, table):
+    cr.execute("SELECT to_regclass(%s)", (table,))
+    return cr.fetchone()[0] is not None
+
+
+def backfill_stored_computes(cr):
+    """Create the stored computed columns the ORM would fill record by record, and fill them in SQL.
+
+    Columns that already exist are not recomputed by the ORM on install or upgrade, so creating
+    them here first leaves the whole backfill to a handful of UPDATE statements. Each UPDATE
+    only touches the rows whose value differs, so running it again costs one scan.
+    """
+    for table, columns in STORED_COMPUTES.items():
+        if not _table_exists(cr, table):
+            continue
+        cr.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = %s
+        """, (table,))
+        existing = {row[0] for row in cr.fetchall()}
+        added = set()
+        for column, column_type, update in columns:
+            if column not in existing:
+                cr.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {column_type}')
+                added.add(column)
+            if column == 'prev_qty' and column in added:
+                cr.execute(_PREV_QTY_BACKFILL.format(
+                    archived=_PREV_QTY_ARCHIVED if _table_exists(cr, 'contractor_statement_line_archive') else '',
+                    tracker=_PREV_QTY_TRACKER if _table_exists(cr, 'contractor_quantity_tracker') else 'NULL',
+                ))
+            if update:
+                if '{' in update:
+                    # Tables that may not exist yet: the statement archive and the quantity revisions
+                    update = update.format(
+                        archived=_BILLED_ARCHIVED if _table_exists(cr, 'contractor_statement_line_archive') else '',
+                        revision=_REVISION_JOIN if _table_exists(cr, 'contract_quantity_revision') else _NO_REVISION_JOIN,
+                    )
+                cr.execute(update)
+                _logger.info("Backfilled %s.%s: %s rows", table, column, cr.rowcount)
+
+
+def create_index_concurrently(cr, name, table, definition):
+    """Create the index ``name`` on ``table`` ``definition`` once the current transaction commits,
+    with CREATE INDEX CONCURRENTLY so writes on the table are not blocked while it builds"""
+    cr.execute("""
+        SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s
+    """, (name,))
+    row = cr.fetchone()
+    if row and row[0]:
+        return
+    dbname = cr.dbname
+
+    @cr.postcommit.add
+    def create_index():
+        # CONCURRENTLY cannot run inside a transaction block
+        with closing(sql_db.db_connect(dbname).cursor()) as index_cr:
+            index_cr._cnx.autocommit = True
+            try:
+                if row:
+                    # Left invalid by an interrupted build
+                    index_cr.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+                index_cr.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" {definition}')
+            except Exception:
+                _logger.warning("Could not create index %s, it will be retried on the next update", name, exc_info=True)
+            finally:
+                index_cr._cnx.autocommit = False
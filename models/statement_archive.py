@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+
+from .schema import create_index_concurrently
+
+_logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 1000
+# Records attached to a statement by (model name column, res_id): they follow it to the archive model and back
+ATTACHED_TABLES = [
+    ('mail_message', 'model'),
+    ('mail_followers', 'res_model'),
+    ('ir_attachment', 'res_model'),
+]
+
+
+def _table_columns(cr, table):
+    cr.execute("""
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+        ORDER BY attnum
+    """, (table,))
+    return [row[0] for row in cr.fetchall()]
+
+
+def _sync_archive_table(cr, live_table, archive_table):
+    """Create the archive table as a copy of the live table and add the columns the live table gained since"""
+    cr.execute(f"CREATE TABLE IF NOT EXISTS {archive_table} (LIKE {live_table} INCLUDING DEFAULTS INCLUDING INDEXES)")
+    cr.execute("""
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+        FROM pg_attribute a
+        WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_attribute b
+              WHERE b.attrelid = %s::regclass AND b.attname = a.attname AND NOT b.attisdropped
+          )
+        ORDER BY a.attnum
+    """, (live_table, archive_table))
+    for column, column_type in cr.fetchall():
+        # NOT NULL is left out: archived rows predate the new column
+        cr.execute(f'ALTER TABLE {archive_table} ADD COLUMN "{column}" {column_type}')
+
+
+def _move_attached(env, statement_ids, from_model, to_model):
+    """Re-point the chatter messages, followers and attachments of the statements to ``to_model``;
+    the statements keep their ids, so the (model, res_id) pairs stay valid"""
+    for table, model_column in ATTACHED_TABLES:
+        env.cr.execute(f"""
+            UPDATE {table} SET {model_column} = %s WHERE {model_column} = %s AND res_id IN %s
+        """, (to_model, from_model, statement_ids))
+    for model_name in ('mail.message', 'mail.followers', 'ir.attachment'):
+        env[model_name].invalidate_model()
+
+
+def _moved_columns(cr, live_table, archive_table):
+    archive_columns = set(_table_columns(cr, archive_table))
+    return ', '.join(f'"{column}"' for column in _table_columns(cr, live_table) if column in archive_columns)
+
+
+class ContractorStatementArchive(models.Model):
+    """Paid statements of finished projects, moved out of the live tables.
+
+    The table mirrors ``contractor_statement`` and is kept in sync with it on every module update;
+    archived rows keep their ids so they can be restored as they were.
+    """
+    _name = 'contractor.statement.archive'
+    _description = 'Archived Contractor Statement'
+    _auto = False
+    _table = 'contractor_statement_archive'
+    _order = 'statement_date desc'
+
+    name = fields.Char(string='Statement Number', readonly=True)
+    project_id = fields.Many2one('project.config', string='Project Name', readonly=True)
+    work_type_id = fields.Many2one('work.type.config', string='Work Type', readonly=True)
+    contractor_id = fields.Many2one('res.partner', string='Contractor Name', readonly=True)
+    contractor_type = fields.Selection([
+        ('main', 'Main Contractor'),
+        ('sub', 'Sub Contractor')
+    ], string='Contractor Type', readonly=True)
+    statement_date = fields.Date(string='Statement Date', readonly=True)
+    work_period_from = fields.Date(string='Work Period From', readonly=True)
+    work_period_to = fields.Date(string='Work Period To', readonly=True)
+    statement_line_ids = fields.One2many('contractor.statement.line.archive', 'statement_id', string='Statement Lines', readonly=True)
+    gross_value = fields.Float(string='Gross Value', readonly=True)
+    tax_amount = fields.Float(string='Tax Amount', readonly=True)
+    retention = fields.Float(string='Retention', readonly=True)
+    total_deductions = fields.Float(string='Total Deductions', readonly=True)
+    net_payable = fields.Float(string='Net Payable', readonly=True)
+    move_id = fields.Many2one('account.move', string='Journal Entry', readonly=True)
+    payment_id = fields.Many2one('account.payment', string='Payment', readonly=True)
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('confirmed', 'Confirmed'),
+        ('approved', 'Approved'),
+        ('paid', 'Paid'),
+    ], string='Status', readonly=True)
+    archived_date = fields.Datetime(string='Archived Date', readonly=True)
+
+    def init(self):
+        cr = self.env.cr
+        _sync_archive_table(cr, 'contractor_statement', self._table)
+        cr.execute(f"""
+            ALTER TABLE {self._table} ADD COLUMN IF NOT EXISTS archived_date timestamp;
+            ALTER TABLE {self._table} ADD COLUMN IF NOT EXISTS tax_ids integer[];
+        """)
+        create_index_concurrently(cr, 'contractor_statement_archive_project_idx', self._table,
+                                  '(project_id, work_type_id, contractor_id, statement_date)')
+
+    @api.model
+    def archive_statements(self, statements):
+        """Move paid statements and their lines to the archive tables, return the number moved"""
+        statements = statements.filtered(lambda s: s.state == 'paid')
+        if not statements:
+            return 0
+        # Activities are to-dos on live records: none are left once the statement is archived
+        self.env['mail.activity'].search([
+            ('res_model', '=', 'contractor.statement'), ('res_id', 'in', statements.ids),
+        ]).unlink()
+        self.env.flush_all()
+        cr = self.env.cr
+        statement_ids = tuple(statements.ids)
+        tax_field = self.env['contractor.statement']._fields['tax_ids']
+
+        _move_attached(self.env, statement_ids, 'contractor.statement', self._name)
+        # References the archive cannot hold: the price index marks archived statements with NULL
+        # (see _rebuild), billing run lines keep their status without the statement
+        cr.execute("UPDATE contractor_price_index SET statement_id = NULL WHERE statement_id IN %s", (statement_ids,))
+        cr.execute("UPDATE contractor_billing_run_line SET statement_id = NULL WHERE statement_id IN %s", (statement_ids,))
+        self.env['contractor.price.index'].invalidate_model(['statement_id'])
+        self.env['contractor.billing.run.line'].invalidate_model(['statement_id'])
+
+        line_columns = _moved_columns(cr, 'contractor_statement_line', 'contractor_statement_line_archive')
+        cr.execute(f"""
+            WITH moved AS (
+                DELETE FROM contractor_statement_line WHERE statement_id IN %s RETURNING {line_columns}
+            )
+            INSERT INTO contractor_statement_line_archive ({line_columns})
+            SELECT {line_columns} FROM moved
+        """, (statement_ids,))
+
+        # The tax relation rows are still visible to the statement that deletes (and cascades) them
+        columns = _moved_columns(cr, 'contractor_statement', self._table)
+        cr.execute(f"""
+            WITH moved AS (
+                DELETE FROM contractor_statement WHERE id IN %s RETURNING {columns}
+            )
+            INSERT INTO {self._table} ({columns}, tax_ids, archived_date)
+            SELECT {columns},
+                   ARRAY(SELECT rel.{tax_field.column2} FROM {tax_field.relation} rel WHERE rel.{tax_field.column1} = moved.id),
+                   now() at time zone 'UTC'
+            FROM moved
+        """, (statement_ids,))
+        moved = cr.rowcount
+
+        self.env['contractor.statement'].invalidate_model()
+        self.env['contractor.statement.line'].invalidate_model()
+        self.env['contractor.statement.kpi']._invalidate_cache()
+        _logger.info("Archived %s contractor statements", moved)
+        return moved
+
+    def action_restore(self):
+        """Move the archived statements and their lines back to the live tables"""
+        if not self.env.user.has_group('base.group_system'):
+            raise ValidationError("Only administrators can restore archived statements.")
+        if not self:
+            return True
+        cr = self.env.cr
+        statement_ids = tuple(self.ids)
+        tax_field = self.env['contractor.statement']._fields['tax_ids']
+
+        columns = _moved_columns(cr, 'contractor_statement', self._table)
+        cr.execute(f"""
+            WITH moved AS (
+                DELETE FROM {self._table} WHERE id IN %s RETURNING {columns}, tax_ids
+            ), restored AS (
+                INSERT INTO contractor_statement ({columns})
+                SELECT {columns} FROM moved
+            )
+            INSERT INTO {tax_field.relation} ({tax_field.column1}, {tax_field.column2})
+            SELECT moved.id, unnest(moved.tax_ids) FROM moved
+        """, (statement_ids,))
+
+        line_columns = _moved_columns(cr, 'contractor_statement_line', 'contractor_statement_line_archive')
+        cr.execute(f"""
+            WITH moved AS (
+                DELETE FROM contractor_statement_line_archive WHERE statement_id IN %s RETURNING {line_columns}
+            )
+            INSERT INTO contractor_statement_line ({line_columns})
+            SELECT {line_columns} FROM moved
+        """, (statement_ids,))
+
+        _move_attached(self.env, statement_ids, self._name, 'contractor.statement')
+        self.invalidate_model()
+        self.env['contractor.statement.line.archive'].invalidate_model()
+        self.env['contractor.statement.kpi']._invalidate_cache()
+        # Point the price index back at the restored statements
+        statements = self.env['contractor.statement'].browse(statement_ids)
+        self.env['contractor.price.index']._rebuild(statements._get_price_keys())
+        return True
+
+    @api.model
+    def _cron_archive_closed_projects(self):
+        """Archive the paid statements of inactive (finished) projects, batch by batch"""
+        statements = self.env['contractor.statement'].search([
+            ('project_id.active', '=', False),
+            ('state', '=', 'paid'),
+        ], limit=ARCHIVE_BATCH_SIZE, order='id')
+        self.archive_statements(statements)
+        if len(statements) == ARCHIVE_BATCH_SIZE:
+            self.env.ref('constructor.ir_cron_archive_closed_projects')._trigger()
+
+
+class ContractorStatementLineArchive(models.Model):
+    _name = 'contractor.statement.line.archive'
+    _description = 'Archived Contractor Statement Line'
+    _auto = False
+    _table = 'contractor_statement_line_archive'
+    _order = 'statement_id, sequence'
+
+    statement_id = fields.Many2one('contractor.statement.archive', string='Statement', readonly=True)
+    sequence = fields.Integer(string='#', readonly=True)
+    product_id = fields.Many2one('contractor.product', string='Product', readonly=True)
+    description = fields.Char(string='Item Description', readonly=True)
+    unit = fields.Char(string='Unit', readonly=True)
+    contract_qty = fields.Float(string='Contract Qty', readonly=True)
+    prev_qty = fields.Float(string='Previous Qty', readonly=True)
+    current_qty = fields.Float(string='Current Qty', readonly=True)
+    total_qty = fields.Float(string='Total Qty', readonly=True)
+    progress_percent = fields.Float(string='Progress %', readonly=True)
+    unit_price = fields.Float(string='Unit Price', readonly=True)
+    current_value = fields.Float(string='Current Value', readonly=True)
+    total_value = fields.Float(string='Total Value', readonly=True)
+
+    def init(self):
+        _sync_archive_table(self.env.cr, 'contractor_statement_line', self._table)
+        create_index_concurrently(self.env.cr, 'contractor_statement_line_archive_statement_idx', self._table,
+                                  '(statement_id, product_id)')
+
+    @api.model
+    def _get_archived_quantities(self, statement, product_ids):
+        """Return {product_id: quantity} billed on archived statements before ``statement``"""
+        groups = self._read_group([
+            ('statement_id.project_id', '=', statement.project_id.id),
+            ('statement_id.work_type_id', '=', statement.work_type_id.id),
+            ('statement_id.contractor_id', '=', statement.contractor_id.id),
+            ('statement_id.statement_date', '<', statement.statement_date),
+            ('product_id', 'in', product_ids),
+        ], ['product_id'], ['current_qty:sum'])
+        return {product.id: quantity for product, quantity in groups}
+
+
+class ProjectConfig(models.Model):
+    _inherit = 'project.config'
+
+    def action_archive_statements(self):
+        """Move the paid statements of the finished project to the archive"""
+        statements = self.env['contractor.statement'].search([
+            ('project_id', 'in', self.ids),
+            ('state', '=', 'paid'),
+        ])
+        self.env['contractor.statement.archive'].archive_statements(statements)
+        return True
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import json
+from datetime import datetime
+
+from odoo import models, api
+from odoo.exceptions import ValidationError
+from odoo.tools import json_default
+
+from .read_replica import get_replica_uri, open_replica_cursor
+from .schema import create_index_concurrently
+
+EXPORT_PAGE_SIZE = 2000
+
+# Exported name: SQL expression over the statement (s), its line (l) and their related names
+STATEMENT_COLUMNS = {
+    'id': 's.id',
+    'write_date': 's.write_date',
+    'name': 's.name',
+    'project_id': 's.project_id',
+    'project': 'p.name',
+    'work_type_id': 's.work_type_id',
+    'work_type': 'w.name',
+    'contractor_id': 's.contractor_id',
+    'contractor': 'c.name',
+    'contractor_type': 's.contractor_type',
+    'statement_date': 's.statement_date',
+    'work_period_from': 's.work_period_from',
+    'work_period_to': 's.work_period_to',
+    'gross_value': 's.gross_value',
+    'tax_amount': 's.tax_amount',
+    'subtotal': 's.subtotal',
+    'advance_payment_deduction': 's.advance_payment_deduction',
+    'retention': 's.retention',
+    'other_deductions': 's.other_deductions',
+    'total_deductions': 's.total_deductions',
+    'net_payable': 's.net_payable',
+    'state': 's.state',
+}
+LINE_COLUMNS = {
+    'id': 'l.id',
+    'write_date': 'l.write_date',
+    'sequence': 'l.sequence',
+    'product_id': 'l.product_id',
+    'product': 'pr.name',
+    'description': 'l.description',
+    'unit': 'l.unit',
+    'contract_qty': 'l.contract_qty',
+    'prev_qty': 'l.prev_qty',
+    'current_qty': 'l.current_qty',
+    'total_qty': 'l.total_qty',
+    'remaining_qty': 'l.remaining_qty',
+    'progress_percent': 'l.progress_percent',
+    'unit_price': 'l.unit_price',
+    'current_value': 'l.current_value',
+    'total_value': 'l.total_value',
+    # Flattened statement header
+    **{f'statement_{name}': column for name, column in STATEMENT_COLUMNS.items() if name != 'write_date'},
+}
+EXPORTS = {
+    'statements': ('contractor.statement', STATEMENT_COLUMNS, 's', """
+        contractor_statement s
+        JOIN project_config p ON p.id = s.project_id
+        JOIN work_type_config w ON w.id = s.work_type_id
+        JOIN res_partner c ON c.id = s.contractor_id
+    """),
+    'lines': ('contractor.statement.line', LINE_COLUMNS, 'l', """
+        contractor_statement_line l
+        JOIN contractor_statement s ON s.id = l.statement_id
+        JOIN contractor_product pr ON pr.id = l.product_id
+        JOIN project_config p ON p.id = s.project_id
+        JOIN work_type_config w ON w.id = s.work_type_id
+        JOIN res_partner c ON c.id = s.contractor_id
+    """),
+}
+
+
+def export_default(value):
+    """JSON encoding of the exported values; write dates keep their microseconds so a consumer
+    resuming from the last row does not get the rows of the same second again"""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return json_default(value)
+
+
+class ContractorStatementExport(models.AbstractModel):
+    """NDJSON export of statements and lines, paginated on (write_date, id)"""
+    _name = 'contractor.statement.export'
+    _description = 'Contractor Statement Export'
+
+    def init(self):
+        # Keyset pagination reads both tables in (write_date, id) order
+        create_index_concurrently(self.env.cr, 'contractor_statement_write_date_id_idx',
+                                  'contractor_statement', '(write_date, id)')
+        create_index_concurrently(self.env.cr, 'contractor_statement_line_write_date_id_idx',
+                                  'contractor_statement_line', '(write_date, id)')
+
+    @api.model
+    def _prepare_export(self, kind, field_names=None):
+        """Check the request and return (model name, {field: column}, table alias, FROM clause)"""
+        if kind not in EXPORTS:
+            raise ValidationError(f"Unknown export: {kind}")
+        model_name, columns, alias, from_clause = EXPORTS[kind]
+        self.env[model_name].check_access_rights('read')
+        if field_names:
+            unknown = set(field_names) - set(columns)
+            if unknown:
+                raise ValidationError(f"Unknown fields: {', '.join(sorted(unknown))}")
+            # The keyset columns are always exported so consumers can resume
+            columns = {name: columns[name] for name in ['write_date', 'id', *field_names] if name in columns}
+        return model_name, columns, alias, from_clause
+
+    @api.model
+    def _get_access_clause(self, model_name, alias):
+        """Return (SQL condition, parameters) keeping the rows of ``alias`` the record rules let the
+        current user read: the export reads them in SQL, on a cursor of its own"""
+        domain = self.env['ir.rule']._compute_domain(model_name, 'read')
+        if not domain:
+            return 'TRUE', []
+        # Evaluated as the ORM applies record rules: as superuser, archived records included
+        subquery = self.env[model_name].sudo().with_context(active_test=False)._search(domain).subselect()
+        return f'{alias}.id IN ({subquery.code})', list(subquery.params)
+
+    @api.model
+    def _iter_ndjson(self, kind, field_names=None, after=None):
+        """Return an iterator of NDJSON lines of ``kind`` changed after the ``after`` (write_date, id) position.
+
+        The query is prepared right away, with the record rules of the current user; the rows are
+        read later, one page at a time on a cursor of its own (on the read replica when one is
+        reachable), so memory stays constant whatever the table size and the streaming response
+        can outlive the request cursor.
+        """
+        if after:
+            # Checked now: once the response has started, an error can only cut the stream short
+            try:
+                after = (datetime.fromisoformat(after[0]), int(after[1]))
+            except (TypeError, ValueError):
+                raise ValidationError("The export position must be an ISO write date and a record id.")
+        model_name, columns, alias, from_clause = self._prepare_export(kind, field_names)
+        access_clause, access_params = self._get_access_clause(model_name, alias)
+        names = list(columns)
+        select = ', '.join(f'{column} AS "{name}"' for name, column in columns.items())
+        query = f"""
+            SELECT {select} FROM {from_clause}
+            WHERE ({alias}.write_date, {alias}.id) > (%s, %s) AND {access_clause}
+            ORDER BY {alias}.write_date, {alias}.id
+            LIMIT %s
+        """
+        write_date_index, id_index = names.index('write_date'), names.index('id')
+        registry = self.env.registry
+        replica_uri, dbname = get_replica_uri(self.env), self.env.cr.dbname
+
+        def iter_pages(position):
+            with open_replica_cursor(replica_uri, dbname) or registry.cursor() as cr:
+                while True:
+                    cr.execute(query, (*position, *access_params, EXPORT_PAGE_SIZE))
+                    rows = cr.fetchall()
+                    for row in rows:
+                        yield json.dumps(dict(zip(names, row)), default=export_default) + '\n'
+                    if len(rows) < EXPORT_PAGE_SIZE:
+                        break
+                    position = (rows[-1][write_date_index], rows[-1][id_index])
+
+        return iter_pages(after or ('-infinity', 0))
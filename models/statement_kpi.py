@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+from collections import defaultdict
+
+from odoo import models, api
+
+GENERATION_SEQUENCE = 'contractor_statement_kpi_generation'
+PROGRESS_RANGES = ('0-25', '26-50', '51-75', '76-100', 'completed')
+
+# {dbname: (generation, etag, body)}, valid while the generation sequence has not moved
+_cache = {}
+
+
+class ContractorStatementKpi(models.AbstractModel):
+    """Per-project and per-contractor KPIs for the dashboard endpoint.
+
+    Results are cached per process and tagged with a generation number kept in a Postgres
+    sequence; statement state changes bump the sequence once their transaction commits.
+    """
+    _name = 'contractor.statement.kpi'
+    _description = 'Contractor Statement KPIs'
+
+    def init(self):
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {GENERATION_SEQUENCE}")
+
+    @api.model
+    def _get_generation(self):
+        self.env.cr.execute(f"SELECT last_value FROM {GENERATION_SEQUENCE}")
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _invalidate_cache(self):
+        """Bump the generation after the current transaction commits, once per transaction"""
+        cr = self.env.cr
+        if cr.postcommit.data.get('contractor_kpi_invalidated'):
+            return
+        cr.postcommit.data['contractor_kpi_invalidated'] = True
+        registry = self.env.registry
+
+        @cr.postcommit.add
+        def bump_generation():
+            with registry.cursor() as bump_cr:
+                bump_cr.execute(f"SELECT nextval('{GENERATION_SEQUENCE}')")
+
+    @api.model
+    def get_cached_kpis(self):
+        """Return (etag, JSON body) of the KPIs, computing them only when the generation moved"""
+        generation = self._get_generation()
+        key = self.env.cr.dbname
+        cached = _cache.get(key)
+        if cached and cached[0] == generation:
+            return cached[1], cached[2]
+
+        # Computed on the primary, in the snapshot the generation was read from: a lagging replica
+        # could store figures older than the generation they are cached under
+        kpis = self.get_kpis()
+        body = json.dumps(dict(kpis, generation=generation))
+        etag = hashlib.sha1(f'{key}-{generation}'.encode()).hexdigest()
+        _cache[key] = (generation, etag, body)
+        return etag, body
+
+    @api.model
+    def get_kpis(self):
+        """Billed to date, remaining contract value, retention held, outstanding net payable and
+        progress distribution, per project and per contractor"""
+        cr = self.env.cr
+        # Two grouped queries on (project, contractor), rolled up in Python
+        cr.execute("""
+            WITH statements AS (
+                SELECT project_id, contractor_id, state, gross_value, retention, net_payable
+                FROM contractor_statement
+                WHERE state != 'draft'
+                UNION ALL
+                SELECT project_id, contractor_id, state, gross_value, retention, net_payable
+                FROM contractor_statement_archive
+            )
+            SELECT project_id, contractor_id,
+                   SUM(gross_value),
+                   SUM(retention) FILTER (WHERE state IN ('approved', 'paid')),
+                   SUM(net_payable) FILTER (WHERE state = 'approved')
+            FROM statements
+            GROUP BY project_id, contractor_id
+        """)
+        amounts = cr.fetchall()
+
+        cr.execute("""
+            WITH prices AS (
+                SELECT DISTINCT ON (s.project_id, s.work_type_id, s.contractor_id, l.product_id)
+                       s.project_id, s.work_type_id, s.contractor_id, l.product_id, l.unit_price
+                FROM contractor_statement_line l
+                JOIN contractor_statement s ON s.id = l.statement_id
+                WHERE s.state != 'draft'
+                ORDER BY s.project_id, s.work_type_id, s.contractor_id, l.product_id, s.statement_date DESC, s.id DESC
+            ), items AS (
+                SELECT q.project_id, q.contractor_id,
+                       GREATEST(q.quantity - COALESCE(t.accumulated_quantity, 0), 0) * COALESCE(p.unit_price, 0) AS remaining_value,
+                       CASE WHEN q.quantity > 0 THEN COALESCE(t.accumulated_quantity, 0) / q.quantity * 100 ELSE 0 END AS progress
+                FROM contract_quantity q
+                LEFT JOIN contractor_quantity_tracker t
+                       ON t.project_id = q.project_id AND t.work_type_id = q.work_type_id
+                      AND t.contractor_id = q.contractor_id AND t.product_id = q.product_id
+                LEFT JOIN prices p
+                       ON p.project_id = q.project_id AND p.work_type_id = q.work_type_id
+                      AND p.contractor_id = q.contractor_id AND p.product_id = q.product_id
+            )
+            SELECT project_id, contractor_id,
+                   SUM(remaining_value),
+                   COUNT(*) FILTER (WHERE progress < 26),
+                   COUNT(*) FILTER (WHERE progress >= 26 AND progress < 51),
+                   COUNT(*) FILTER (WHERE progress >= 51 AND progress < 76),
+                   COUNT(*) FILTER (WHERE progress >= 76 AND progress < 100),
+                   COUNT(*) FILTER (WHERE progress >= 100)
+            FROM items
+            GROUP BY project_id, contractor_id
+        """)
+        progress = cr.fetchall()
+
+        def empty():
+            return {
+                'billed_to_date': 0.0,
+                'remaining_contract_value': 0.0,
+                'retention_held': 0.0,
+                'net_payable_outstanding': 0.0,
+                'progress_distribution': dict.fromkeys(PROGRESS_RANGES, 0),
+            }
+        by_project = defaultdict(empty)
+        by_contractor = defaultdict(empty)
+        for project_id, contractor_id, billed, retention, outstanding in amounts:
+            for kpis in (by_project[project_id], by_contractor[contractor_id]):
+                kpis['billed_to_date'] += billed or 0.0
+                kpis['retention_held'] += retention or 0.0
+                kpis['net_payable_outstanding'] += outstanding or 0.0
+        for project_id, contractor_id, remaining, *counts in progress:
+            for kpis in (by_project[project_id], by_contractor[contractor_id]):
+                kpis['remaining_contract_value'] += remaining or 0.0
+                for progress_range, count in zip(PROGRESS_RANGES, counts):
+                    kpis['progress_distribution'][progress_range] += count
+
+        def rows(model_name, kpis_by_id):
+            records = self.env[model_name].sudo().with_context(active_test=False).browse(list(kpis_by_id))
+            names = {record.id: record.display_name for record in records}
+            return [dict(kpis, id=record_id, name=names.get(record_id)) for record_id, kpis in sorted(kpis_by_id.items())]
+
+        return {
+            'projects': rows('project.config', by_project),
+            'contractors': rows('res.partner', by_contractor),
+        }
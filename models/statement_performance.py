@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+
+import cProfile
+import functools
+import io
+import json
+import logging
+import marshal
+import pstats
+import threading
+import time
+import weakref
+import zipfile
+
+from odoo import SUPERUSER_ID, models, fields, api, tools
+
+_logger = logging.getLogger(__name__)
+
+METRICS_PARAM = 'contractor_statement.metrics_enabled'
+FLUSH_INTERVAL = 60  # seconds
+EXPLAIN_THRESHOLD_PARAM = 'contractor_statement.profile_explain_threshold_ms'
+EXPLAIN_MAX_QUERIES = 20
+
+# Per-process buffer {(dbname, metric): [calls, wall time, max time, queries, rows read, rows written]}
+_buffer = {}
+_buffer_lock = threading.Lock()
+_last_flush = [time.monotonic()]
+
+# Profiled calls already consumed by each open transaction {cursor: count}
+_profile_used = weakref.WeakKeyDictionary()
+_profiling = threading.local()
+
+ROWS_TOUCHED_QUERY = """
+    SELECT COALESCE(SUM(seq_tup_read + COALESCE(idx_tup_fetch, 0)), 0),
+           COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0)
+    FROM pg_stat_xact_user_tables
+"""
+
+
+def instrument(method):
+    """Record wall time, SQL query count and rows touched of every call to ``method``
+    when the ``contractor_statement.metrics_enabled`` system parameter is set"""
+    # Computes run while their fields are protected: flushing there would write unrelated models
+    # out of order, so their deferred writes are counted by the caller's flush instead
+    flush = not method.__name__.startswith('_compute_')
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(_profiling, 'active', False):
+            # Nested calls are already part of the running capture
+            return method(self, *args, **kwargs)
+        if self.env.context.get('contractor_profile') and self.env.user.has_group('base.group_system'):
+            # Captures hold every SQL statement of the call, sudo ones included: administrators only
+            return _profile_call(self, method, args, kwargs)
+        # One cached lookup for both switches: no query while both are off
+        metrics_enabled, profiling_uids = self.env['contractor.performance.stat']._get_instrumentation_state()
+        if profiling_uids and _profile_requested(self.env, profiling_uids):
+            return _profile_call(self, method, args, kwargs)
+        if not metrics_enabled:
+            return method(self, *args, **kwargs)
+
+        cr = self.env.cr
+        cr.execute(ROWS_TOUCHED_QUERY)
+        rows_read, rows_written = cr.fetchone()
+        query_count = cr.sql_log_count
+        start = time.perf_counter()
+
+        result = method(self, *args, **kwargs)
+
+        if flush:
+            # Deferred ORM writes of an action belong to it
+            self.env.flush_all()
+        wall_time = time.perf_counter() - start
+        query_count = cr.sql_log_count - query_count
+        cr.execute(ROWS_TOUCHED_QUERY)
+        end_read, end_written = cr.fetchone()
+
+        _record(cr.dbname, f"{self._name}.{method.__name__}", wall_time, query_count,
+                end_read - rows_read, end_written - rows_written)
+        _flush_if_due(self.env)
+        return result
+    return wrapper
+
+
+def _record(dbname, metric, wall_time, query_count, rows_read, rows_written):
+    with _buffer_lock:
+        stat = _buffer.setdefault((dbname, metric), [0, 0.0, 0.0, 0, 0, 0])
+        stat[0] += 1
+        stat[1] += wall_time
+        stat[2] = max(stat[2], wall_time)
+        stat[3] += query_count
+        stat[4] += rows_read
+        stat[5] += rows_written
+
+
+def _flush_if_due(env):
+    if time.monotonic() - _last_flush[0] < FLUSH_INTERVAL:
+        return
+    with _buffer_lock:
+        _last_flush[0] = time.monotonic()
+        pending = {metric: stat for (dbname, metric), stat in _buffer.items() if dbname == env.cr.dbname}
+        for metric in pending:
+            del _buffer[(env.cr.dbname, metric)]
+    if pending:
+        # Separate cursor: metrics survive a rollback of the measured transaction
+        try:
+            with env.registry.cursor() as cr:
+                env(cr=cr)['contractor.performance.stat']._upsert(pending)
+        except Exception:
+            _logger.warning("Could not flush contractor statement metrics", exc_info=True)
+
+
+def _profile_requested(env, profiling_uids):
+    """Whether the current user has profiled calls left, not yet consumed by this transaction"""
+    return env.uid in profiling_uids and env.user.contractor_profile_calls > _profile_used.get(env.cr, 0)
+
+
+def _profile_call(record, method, args, kwargs):
+    """Run ``method`` under cProfile while collecting its SQL statements, then store the
+    capture as an attachment only administrators can read"""
+    env = record.env
+    cr = env.cr
+    queries = []
+
+    def query_hook(cursor, query, params, start, delay, *args):
+        if cursor is not cr:
+            return
+        try:
+            sql = cursor.mogrify(query, params).decode('utf-8', 'replace')
+        except Exception:
+            sql = str(query)
+        queries.append({'query': sql, 'start': start, 'duration_ms': delay * 1000})
+
+    thread = threading.current_thread()
+    if not hasattr(thread, 'query_hooks'):
+        thread.query_hooks = []
+    profiler = cProfile.Profile()
+    _profiling.active = True
+    thread.query_hooks.append(query_hook)
+    start = time.perf_counter()
+    error = None
+    try:
+        profiler.enable()
+        try:
+            return method(record, *args, **kwargs)
+        finally:
+            profiler.disable()
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        wall_time = time.perf_counter() - start
+        thread.query_hooks.remove(query_hook)
+        _profiling.active = False
+        try:
+            _store_profile(record, method.__name__, profiler, queries, wall_time, error)
+        except Exception:
+            _logger.warning("Could not store profile of %s.%s", record._name, method.__name__, exc_info=True)
+
+
+def _explain_slow_queries(cr, queries, threshold_ms):
+    """Add the plan of a re-run to the slow SELECT statements of the capture.
+
+    EXPLAIN ANALYZE executes the statement again, so writes (and CTEs that may write) are left
+    out; their plans are best captured as they run, with auto_explain.
+    """
+    slow = sorted(
+        (q for q in queries if q['duration_ms'] >= threshold_ms and q['query'].lstrip().lower().startswith('select')),
+        key=lambda q: q['duration_ms'], reverse=True,
+    )
+    for query in slow[:EXPLAIN_MAX_QUERIES]:
+        # Roll back whatever the re-run did (sequences aside)
+        try:
+            cr.execute("SAVEPOINT contractor_profile_explain")
+            try:
+                cr.execute("EXPLAIN (ANALYZE, BUFFERS) " + query['query'])
+                query['explain'] = '\n'.join(row[0] for row in cr.fetchall())
+            finally:
+                cr.execute("ROLLBACK TO SAVEPOINT contractor_profile_explain")
+                cr.execute("RELEASE SAVEPOINT contractor_profile_explain")
+        except Exception as e:
+            query['explain'] = f"EXPLAIN failed: {e}"
+
+
+def _store_profile(record, method_name, profiler, queries, wall_time, error):
+    env = record.env
+    threshold = float(env['ir.config_parameter'].sudo().get_param(EXPLAIN_THRESHOLD_PARAM, 100))
+    if error is None:
+        _explain_slow_queries(env.cr, queries, threshold)
+
+    stats = pstats.Stats(profiler)
+    summary = io.StringIO()
+    stats.stream = summary
+    stats.sort_stats('cumulative').print_stats(60)
+    sql = {
+        'model': record._name,
+        'method': method_name,
+        'record_ids': [rid for rid in record.ids if isinstance(rid, int)],
+        'user_id': env.uid,
+        'wall_time': wall_time,
+        'error': str(error) if error else None,
+        'query_count': len(queries),
+        'query_time_ms': sum(q['duration_ms'] for q in queries),
+        'explain_threshold_ms': threshold,
+        'queries': queries,
+    }
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, 'w', zipfile.ZIP_DEFLATED) as archive:
+        # profile.pstats loads with pstats.Stats('profile.pstats') or snakeviz
+        archive.writestr('profile.pstats', marshal.dumps(stats.stats))
+        archive.writestr('profile.txt', summary.getvalue())
+        archive.writestr('sql.json', json.dumps(sql, indent=2, default=str))
+
+    if record._name == 'contractor.statement':
+        statement_ids = sql['record_ids']
+    else:
+        statement_ids = [sid for sid in record.statement_id.ids if isinstance(sid, int)]
+    name = f"profile-{record._name}.{method_name}-{fields.Datetime.now():%Y%m%d-%H%M%S}.zip"
+
+    # Separate cursor: the capture survives a failing call
+    with env.registry.cursor() as cr:
+        # Not attached to a record and created by the superuser: the attachment access rules leave
+        # it to administrators, who find it with the performance statistics' attachments
+        pending = env(cr=cr, user=SUPERUSER_ID)
+        pending['ir.attachment'].create({
+            'name': name,
+            'type': 'binary',
+            'raw': content.getvalue(),
+            'mimetype': 'application/zip',
+            'res_model': 'contractor.performance.stat',
+            'res_id': False,
+            'description': f"Profiled by user {env.uid}; statements: {statement_ids}",
+        })
+        if not env.context.get('contractor_profile'):
+            cr.execute("""
+                UPDATE res_users SET contractor_profile_calls = GREATEST(contractor_profile_calls - 1, 0)
+                WHERE id = %s
+                RETURNING contractor_profile_calls
+            """, (env.uid,))
+            if not cr.fetchone()[0]:
+                # Last profiled call: drop the user from the cached instrumentation state
+                env.registry.clear_cache()
+    if not env.context.get('contractor_profile'):
+        _profile_used[env.cr] = _profile_used.get(env.cr, 0) + 1
+
+
+class ContractorPerformanceStat(models.Model):
+    _name = 'contractor.performance.stat'
+    _description = 'Contractor Statement Performance Statistics'
+    _order = 'total_time desc'
+
+    name = fields.Char(string='Method', required=True, readonly=True)
+    call_count = fields.Integer(string='Calls', readonly=True)
+    total_time = fields.Float(string='Total Time (s)', readonly=True, digits=(16, 4))
+    max_time = fields.Float(string='Max Time (s)', readonly=True, digits=(16, 4))
+    avg_time = fields.Float(string='Avg Time (s)', compute='_compute_averages', digits=(16, 4))
+    # Running totals outgrow a 32-bit integer: stored as numeric
+    query_count = fields.Float(string='Queries', readonly=True, digits=(20, 0))
+    avg_query_count = fields.Float(string='Avg Queries', compute='_compute_averages')
+    rows_read = fields.Float(string='Rows Read', readonly=True, digits=(20, 0))
+    rows_written = fields.Float(string='Rows Written', readonly=True, digits=(20, 0))
+    last_call = fields.Datetime(string='Last Call', readonly=True)
+
+    _sql_constraints = [
+        ('name_unique', 'unique(name)', 'Performance statistics must be unique per method!'),
+    ]
+
+    @api.model
+    @tools.ormcache()
+    def _get_instrumentation_state(self):
+        """Return (metrics enabled, ids of the users with profiled calls left).
+
+        Cached per process; the system parameters and the users' profile counters clear the
+        cache when they change.
+        """
+        metrics_enabled = bool(self.env['ir.config_parameter'].sudo().get_param(METRICS_PARAM))
+        self.env['res.users'].flush_model(['contractor_profile_calls'])
+        self.env.cr.execute("SELECT id FROM res_users WHERE contractor_profile_calls > 0")
+        return metrics_enabled, frozenset(row[0] for row in self.env.cr.fetchall())
+
+    @api.depends('call_count', 'total_time', 'query_count')
+    def _compute_averages(self):
+        for record in self:
+            record.avg_time = record.total_time / record.call_count if record.call_count else 0.0
+            record.avg_query_count = record.query_count / record.call_count if record.call_count else 0.0
+
+    @api.model
+    def _upsert(self, stats):
+        """Add the buffered {metric: stat} values to the stored statistics in one statement"""
+        values = []
+        params = []
+        for metric, (calls, wall_time, max_time, queries, rows_read, rows_written) in stats.items():
+            values.append("(%s, %s, %s, %s, %s, %s, %s, now() at time zone 'UTC')")
+            params.extend([metric, calls, wall_time, max_time, queries, rows_read, rows_written])
+        self.env.cr.execute("""
+            INSERT INTO contractor_performance_stat
+                (name, call_count, total_time, max_time, query_count, rows_read, rows_written, last_call)
+            VALUES %s
+            ON CONFLICT (name) DO UPDATE SET
+                call_count = contractor_performance_stat.call_count + EXCLUDED.call_count,
+                total_time = contractor_performance_stat.total_time + EXCLUDED.total_time,
+                max_time = GREATEST(contractor_performance_stat.max_time, EXCLUDED.max_time),
+                query_count = contractor_performance_stat.query_count + EXCLUDED.query_count,
+                rows_read = contractor_performance_stat.rows_read + EXCLUDED.rows_read,
+                rows_written = contractor_performance_stat.rows_written + EXCLUDED.rows_written,
+                last_call = EXCLUDED.last_call
+        """ % ', '.join(values), params)
+
+    @api.model
+    def render_prometheus(self):
+        """Return the statistics in the Prometheus text exposition format"""
+        series = [
+            ('contractor_statement_calls_total', 'counter', 'Number of calls', 'call_count'),
+            ('contractor_statement_wall_seconds_total', 'counter', 'Total wall time in seconds', 'total_time'),
+            ('contractor_statement_wall_seconds_max', 'gauge', 'Slowest call in seconds', 'max_time'),
+            ('contractor_statement_queries_total', 'counter', 'Number of SQL queries', 'query_count'),
+            ('contractor_statement_rows_read_total', 'counter', 'Rows read by SQL queries', 'rows_read'),
+            ('contractor_statement_rows_written_total', 'counter', 'Rows inserted, updated or deleted', 'rows_written'),
+        ]
+        stats = self.search_read([], ['name'] + [column for __, __, __, column in series], order='name')
+        lines = []
+        for metric, metric_type, help_text, column in series:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for stat in stats:
+                lines.append(f'{metric}{{method="{stat["name"]}"}} {stat[column]:.15g}')
+        return '\n'.join(lines) + '\n'
+
+    def action_reset(self):
+        """Clear the selected statistics"""
+        self.unlink()
+        return True
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
 
 from . import contractor_statement_report
-from . import contractor_analysis_report
\ No newline at end of file
+from . import contractor_analysis_report
+from . import contractor_statement_account_report
\ No newline at end of file
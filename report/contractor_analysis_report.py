@@ -3,11 +3,13 @@
 from odoo import models, fields, tools, api
 from datetime import datetime, timedelta
 
+from ..models.read_replica import call_on_replica
+
 class ContractorStatementAnalysisReport(models.Model):
     _name = 'contractor.statement.analysis.report'
     _description = 'Contractor Statement Analysis Report'
     _auto = False
-    _order = 'statement_date desc'
+    _order = 'month_key desc, statement_date desc'
     _rec_name = 'name'
 
     # Basic Fields
@@ -78,6 +80,13 @@ class ContractorStatementAnalysisReport(models.Model):
     year = fields.Char(string='Year', readonly=True)
     quarter = fields.Char(string='Quarter', readonly=True)
     week = fields.Char(string='Week', readonly=True)
+    # Sortable period keys from the date dimension (YYYYMM, YYYYQ, IYYYIW, fiscal YYYYPP)
+    month_key = fields.Integer(string='Month Key', readonly=True, group_operator=False)
+    quarter_key = fields.Integer(string='Quarter Key', readonly=True, group_operator=False)
+    week_key = fields.Integer(string='Week Key', readonly=True, group_operator=False)
+    fiscal_year = fields.Integer(string='Fiscal Year', readonly=True, group_operator=False)
+    fiscal_period_key = fields.Integer(string='Fiscal Period Key', readonly=True, group_operator=False)
+    fiscal_period = fields.Char(string='Fiscal Period', readonly=True)
     
     # Payment Analysis
     payment_delay_days = fields.Integer(string='Payment Delay Days', readonly=True)
@@ -111,12 +120,15 @@ class ContractorStatementAnalysisReport(models.Model):
     project_start_date = fields.Date(string='Project Start Date', readonly=True)
     project_end_date = fields.Date(string='Project End Date', readonly=True)
 
-    def init(self):
-        tools.drop_view_if_exists(self.env.cr, self._table)
-        self.env.cr.execute("""
-            CREATE OR REPLACE VIEW %s AS (
+    # Archive
+    is_archived = fields.Boolean(string='Archived', readonly=True)
+
+    def _select_statement_lines(self, statement_table, line_table, is_archived):
+        """One branch of the view; the line id is stable, so filters are pushed down into each branch"""
+        return """
                 SELECT
-                    row_number() OVER () AS id,
+                    l.id AS id,
+                    %s AS is_archived,
                     s.name,
                     s.project_id,
                     s.work_type_id,
@@ -166,10 +178,16 @@ class ContractorStatementAnalysisReport(models.Model):
                         ELSE 'xlarge'
                     END AS value_range,
                     s.state,
-                    to_char(s.statement_date, 'Month YYYY') AS month,
-                    to_char(s.statement_date, 'YYYY') AS year,
-                    'Q' || to_char(s.statement_date, 'Q') || ' ' || to_char(s.statement_date, 'YYYY') AS quarter,
-                    to_char(s.statement_date, 'YYYY-"W"IW') AS week,
+                    d.month_name AS month,
+                    d.year::varchar AS year,
+                    d.quarter_name AS quarter,
+                    d.week_name AS week,
+                    d.month_key,
+                    d.quarter_key,
+                    d.week_key,
+                    d.fiscal_year,
+                    d.fiscal_period_key,
+                    d.fiscal_period_name AS fiscal_period,
                     'on_time' AS payment_status,
                     0 AS payment_delay_days,
                     CASE 
@@ -196,21 +214,49 @@ class ContractorStatementAnalysisReport(models.Model):
                     0 AS quality_score,
                     0 AS delivery_score
                 FROM
-                    contractor_statement s
+                    %s s
                 JOIN
-                    contractor_statement_line l ON l.statement_id = s.id
+                    %s l ON l.statement_id = s.id
                 LEFT JOIN
-                    project_config p ON p.id = s.project_id
+                    account_journal j ON j.id = s.journal_id
+                -- Periods of the journal's company, the main company without journal
                 LEFT JOIN
-                    res_partner c ON c.id = s.contractor_id
+                    contractor_date_dimension d ON d.date = s.statement_date
+                    AND d.company_id = COALESCE(j.company_id, (SELECT MIN(id) FROM res_company))
                 WHERE
                     s.state != 'cancelled'
+        """ % (is_archived, statement_table, line_table)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        # Archived statements live in their own tables; is_archived lets the planner skip them
+        self.env.cr.execute("""
+            CREATE OR REPLACE VIEW %s AS (
+                %s
+                UNION ALL
+                %s
             )
-        """ % self._table)
+        """ % (
+            self._table,
+            self._select_statement_lines('contractor_statement', 'contractor_statement_line', 'false'),
+            self._select_statement_lines('contractor_statement_archive', 'contractor_statement_line_archive', 'true'),
+        ))
     
+    @api.model
+    def search_read(self, domain=None, fields=None, offset=0, limit=None, order=None, **read_kwargs):
+        if not self.env.context.get('on_read_replica'):
+            return call_on_replica(self.env, lambda env: env[self._name].with_context(on_read_replica=True).search_read(
+                domain, fields, offset=offset, limit=limit, order=order, **read_kwargs))
+        return super(ContractorStatementAnalysisReport, self).search_read(
+            domain, fields, offset=offset, limit=limit, order=order, **read_kwargs)
+
     @api.model
     def read_group(self, domain, fields, groupby, offset=0, limit=None, orderby=False, lazy=True):
         """Override read_group to add custom aggregations"""
+        # Pivot and graph queries run on the read replica when one is configured
+        if not self.env.context.get('on_read_replica'):
+            return call_on_replica(self.env, lambda env: env[self._name].with_context(on_read_replica=True).read_group(
+                domain, fields, groupby, offset=offset, limit=limit, orderby=orderby, lazy=lazy))
         result = super(ContractorStatementAnalysisReport, self).read_group(
             domain, fields, groupby, offset=offset, limit=limit, orderby=orderby, lazy=lazy
         )
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, tools
+
+from ..models.schema import create_index_concurrently
+
+
+class ContractorStatementAccountReport(models.Model):
+    """Statement of account of each contractor and project: approved statements and their payments
+    in date order, with running balances computed by window functions.
+
+    Filters on the contractor and project are pushed below the window (they are its partition),
+    so a contractor's account reads only its own rows through the (contractor, project) indexes;
+    other filters, such as dates, apply after the balances are computed and keep them brought forward.
+    """
+    _name = 'contractor.statement.account.report'
+    _description = 'Contractor Statement of Account'
+    _auto = False
+    _order = 'contractor_id, project_id, date, id'
+    _rec_name = 'name'
+
+    date = fields.Date(string='Date', readonly=True)
+    entry_type = fields.Selection([
+        ('statement', 'Statement'),
+        ('payment', 'Payment'),
+    ], string='Type', readonly=True)
+    name = fields.Char(string='Statement Number', readonly=True)
+    contractor_id = fields.Many2one('res.partner', string='Contractor', readonly=True)
+    project_id = fields.Many2one('project.config', string='Project', readonly=True)
+    work_type_id = fields.Many2one('work.type.config', string='Work Type', readonly=True)
+    statement_id = fields.Many2one('contractor.statement', string='Statement', readonly=True)
+    payment_id = fields.Many2one('account.payment', string='Payment', readonly=True)
+    gross_value = fields.Float(string='Gross Value', readonly=True)
+    deductions = fields.Float(string='Deductions', readonly=True)
+    retention = fields.Float(string='Retention', readonly=True)
+    net_payable = fields.Float(string='Net Payable', readonly=True)
+    payment = fields.Float(string='Payment', readonly=True)
+    balance = fields.Float(string='Balance', readonly=True, group_operator=False)
+    retention_held = fields.Float(string='Retention Held', readonly=True, group_operator=False)
+    is_archived = fields.Boolean(string='Archived', readonly=True)
+
+    def _select_entries(self, statement_table, is_archived):
+        # Ids: 2 * statement id for the statement, + 1 for its payment (archived statements keep their ids)
+        return """
+            SELECT s.id * 2 AS id, s.statement_date AS date, 'statement' AS entry_type, s.name,
+                   s.contractor_id, s.project_id, s.work_type_id,
+                   CASE WHEN %(is_archived)s THEN NULL ELSE s.id END AS statement_id, NULL::integer AS payment_id,
+                   s.gross_value, COALESCE(s.advance_payment_deduction, 0) + COALESCE(s.other_deductions, 0) AS deductions,
+                   COALESCE(s.retention, 0) AS retention, s.net_payable, 0.0 AS payment,
+                   %(is_archived)s AS is_archived
+            FROM %(table)s s
+            WHERE s.state IN ('approved', 'paid')
+            UNION ALL
+            SELECT s.id * 2 + 1, COALESCE(s.paid_date::date, s.statement_date), 'payment', s.name,
+                   s.contractor_id, s.project_id, s.work_type_id,
+                   CASE WHEN %(is_archived)s THEN NULL ELSE s.id END, s.payment_id,
+                   0.0, 0.0, 0.0, 0.0, COALESCE(p.amount, s.net_payable),
+                   %(is_archived)s
+            FROM %(table)s s
+            LEFT JOIN account_payment p ON p.id = s.payment_id
+            WHERE s.state = 'paid'
+        """ % {'table': statement_table, 'is_archived': is_archived}
+
+    def init(self):
+        create_index_concurrently(self.env.cr, 'contractor_statement_contractor_project_idx', 'contractor_statement',
+                                  '(contractor_id, project_id, statement_date)')
+        create_index_concurrently(self.env.cr, 'contractor_statement_archive_contractor_project_idx',
+                                  'contractor_statement_archive', '(contractor_id, project_id, statement_date)')
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute("""
+            CREATE OR REPLACE VIEW %s AS (
+                SELECT e.*,
+                       SUM(e.net_payable - e.payment) OVER running AS balance,
+                       SUM(e.retention) OVER running AS retention_held
+                FROM (
+                    %s
+                    UNION ALL
+                    %s
+                ) AS e
+                WINDOW running AS (PARTITION BY e.contractor_id, e.project_id ORDER BY e.date, e.id
+                                   ROWS UNBOUNDED PRECEDING)
+            )
+        """ % (
+            self._table,
+            self._select_entries('contractor_statement', 'false'),
+            self._select_entries('contractor_statement_archive', 'true'),
+        ))
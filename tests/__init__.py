@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+from . import test_query_counts
+from . import test_statement_workflow
+from . import test_statement_performance
+from . import test_statement_kpi
+from . import test_schema
+from . import test_change_log
+from . import test_read_replica
+from . import test_posting_simulator
+from . import test_statement_account_report
+from . import test_price_index
+from . import test_contract_quantity
+from . import test_completion_forecast
+from . import test_line_amounts
+from . import test_statement_export
+from . import test_progress_snapshot
+from . import test_statement_taxes
+from . import test_statement_archive
+from . import test_date_dimension
+from . import test_billing_run
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+from odoo import Command, fields
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+SMALL_STATEMENT = 3
+LARGE_STATEMENT = 30
+
+
+class ContractorStatementCommon(AccountTestInvoicingCommon):
+    """A project, a work type and a contractor with a BOQ of LARGE_STATEMENT + 1 items"""
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.project = cls.env['project.config'].create({'name': 'Tower A', 'code': 'TWA'})
+        cls.work_type = cls.env['work.type.config'].create({'name': 'Concrete', 'code': 'CON'})
+        cls.contractor = cls.env['res.partner'].create({'name': 'Builder Co', 'is_company': True})
+        deduction_account = cls.env['account.account'].create({
+            'name': 'Contractor Deductions',
+            'code': '299001',
+            'account_type': 'liability_current',
+        })
+        cls.env['deductions.config'].create({
+            'name': 'Default Deductions',
+            'is_default': True,
+            'advance_payment_account_id': deduction_account.id,
+            'retention_account_id': deduction_account.id,
+            'other_deductions_account_id': deduction_account.id,
+        })
+        cls.payment_method = cls.env['payment.method.config'].create({
+            'name': 'Bank Transfer',
+            'code': 'BT',
+            'journal_id': cls.company_data['default_journal_bank'].id,
+        })
+        cls.products = cls.env['contractor.product'].create([{
+            'name': f'Item {i}',
+            'code': f'ITEM-{i}',
+            'unit': 'm3',
+            'work_type_id': cls.work_type.id,
+            'in_account_id': cls.company_data['default_account_expense'].id,
+        } for i in range(LARGE_STATEMENT + 1)])
+        cls.env['contract.quantity'].create([{
+            'project_id': cls.project.id,
+            'work_type_id': cls.work_type.id,
+            'contractor_id': cls.contractor.id,
+            'product_id': product.id,
+            'quantity': 1000.0,
+        } for product in cls.products])
+
+    def _create_statement(self, line_count, state='draft', **vals):
+        statement = self.env['contractor.statement'].create({
+            'project_id': self.project.id,
+            'work_type_id': self.work_type.id,
+            'contractor_id': self.contractor.id,
+            'work_period_from': fields.Date.today(),
+            'work_period_to': fields.Date.today(),
+            'journal_id': self.company_data['default_journal_misc'].id,
+            'payment_method_id': self.payment_method.id,
+            'statement_line_ids': [Command.create({
+                'product_id': product.id,
+                'current_qty': 5.0,
+                'unit_price': 10.0,
+            }) for product in self.products[:line_count]],
+            **vals,
+        })
+        if state in ('confirmed', 'approved', 'paid'):
+            statement.action_confirm()
+        if state in ('approved', 'paid'):
+            statement.action_approve()
+        if state == 'paid':
+            statement.action_mark_as_paid()
+        return statement
+
+    def _get_contract(self, product):
+        return self.env['contract.quantity'].search([
+            ('contractor_id', '=', self.contractor.id),
+            ('product_id', '=', product.id),
+        ])
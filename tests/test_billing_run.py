@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestBillingRun(ContractorStatementCommon):
+    """Month-end billing runs"""
+
+    def _run_line(self, period_end):
+        run = self.env['contractor.billing.run'].create({'name': f"Billing Run {period_end}", 'period_end': period_end})
+        run.action_prepare()
+        line = run.line_ids.filtered(lambda line: line.contractor_id == self.contractor)
+        self.assertEqual(len(line), 1)
+        line._generate_statements()
+        return line
+
+    def test_period_already_billed_is_skipped(self):
+        # Dated in April but covering May as well
+        self._create_statement(SMALL_STATEMENT, state='confirmed', statement_date=date(2024, 4, 30),
+                               work_period_from=date(2024, 4, 1), work_period_to=date(2024, 5, 31))
+
+        line = self._run_line(date(2024, 5, 31))
+        self.assertEqual(line.state, 'skipped')
+        self.assertFalse(line.statement_id)
+
+        line = self._run_line(date(2024, 6, 30))
+        self.assertEqual(line.state, 'done')
+        self.assertEqual(line.statement_id.work_period_from, date(2024, 6, 1))
+        self.assertEqual(line.statement_id.work_period_to, date(2024, 6, 30))
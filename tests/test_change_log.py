@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestChangeLog(ContractorStatementCommon):
+    """Change feed of statements, lines and quantities"""
+
+    def test_change_log_captures_deletes(self):
+        statement = self._create_statement(SMALL_STATEMENT, state='confirmed')
+        line_ids = statement.statement_line_ids.ids
+        self.env.cr.execute("SELECT COALESCE(MAX(id), 0) FROM contractor_change_log")
+        watermark = self.env.cr.fetchone()[0]
+        # Resetting to draft cleans the tracker rows up in SQL, unlink cascades to the lines
+        statement.action_reset_to_draft()
+        statement.unlink()
+        self.env.flush_all()
+        self.env.cr.execute("""
+            SELECT table_name, record_id FROM contractor_change_log
+            WHERE id > %s AND operation = 'D'
+        """, [watermark])
+        deleted = self.env.cr.fetchall()
+        self.assertIn(('contractor_statement', statement.id), deleted)
+        self.assertEqual({record_id for table, record_id in deleted if table == 'contractor_statement_line'}, set(line_ids))
+        self.assertEqual(len([table for table, _record_id in deleted if table == 'contractor_quantity_tracker']), SMALL_STATEMENT)
+
+    def test_fetch_changes_follows_transaction_order(self):
+        cr = self.env.cr
+        cr.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        xmin = cr.fetchone()[0]
+        # A transaction that took its sequence number first but committed last (higher txid), one
+        # that took a later number and committed first, and the running test transaction
+        cr.execute("""
+            INSERT INTO contractor_change_log (table_name, record_id, operation, txid)
+            VALUES ('test_table', 1, 'I', %(late)s), ('test_table', 2, 'I', %(early)s), ('test_table', 3, 'I', DEFAULT)
+            RETURNING id
+        """, {'late': xmin - 1, 'early': xmin - 2})
+        late_seq, early_seq, _running_seq = (seq for seq, in cr.fetchall())
+        self.assertLess(late_seq, early_seq)
+
+        change_log = self.env['contractor.change.log']
+        changes, _watermark = change_log.fetch_changes((xmin - 3, 0))
+        self.assertEqual([change['id'] for change in changes if change['table'] == 'test_table'], [2, 1])
+        # Paging after the first transaction's change still returns the lower sequence number
+        changes, watermark = change_log.fetch_changes((xmin - 2, early_seq), limit=1)
+        self.assertEqual([change['seq'] for change in changes], [late_seq])
+        self.assertEqual(watermark, (xmin - 1, late_seq))
+        # The running transaction's change waits for it to end
+        changes, _watermark = change_log.fetch_changes(watermark)
+        self.assertNotIn(3, [change['id'] for change in changes if change['table'] == 'test_table'])
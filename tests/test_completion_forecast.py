@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestCompletionForecast(ContractorStatementCommon):
+    """Completion forecasts from the progress trends"""
+
+    def test_completion_forecast(self):
+        today = fields.Date.today()
+        for months in (2, 1):
+            statement = self._create_statement(SMALL_STATEMENT)
+            statement.statement_date = today - relativedelta(months=months)
+            statement.action_confirm()
+        contract = self._get_contract(self.products[0])
+        contract.quantity = 20.0
+        self.env['contractor.progress.snapshot']._cron_take_snapshots()
+        self.env['contractor.completion.forecast']._cron_refresh()
+        forecast = self.env['contractor.completion.forecast'].search([('product_id', '=', self.products[0].id)])
+        # 5 per month, 10 left after last month
+        self.assertEqual(forecast.forecast_state, 'forecast')
+        self.assertAlmostEqual(forecast.monthly_rate, 5.0)
+        self.assertEqual(forecast.forecast_date, today + relativedelta(months=1, day=31))
+        self.assertAlmostEqual(forecast.cost_at_completion, 200.0)
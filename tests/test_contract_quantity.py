@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import fields
+
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestContractQuantity(ContractorStatementCommon):
+    """Contract quantity balances and effective-dated revisions"""
+
+    def test_contract_balance_follows_confirmations(self):
+        statement = self._create_statement(SMALL_STATEMENT, state='confirmed')
+        quantity = self._get_contract(self.products[0])
+        self.assertEqual(quantity.billed_qty, 5.0)
+        self.assertEqual(quantity.billed_value, 50.0)
+        self.assertEqual(quantity.remaining_qty, 995.0)
+        self.assertAlmostEqual(quantity.progress_percent, 0.5)
+        statement.action_reset_to_draft()
+        self.assertEqual(quantity.billed_qty, 0.0)
+        self.assertEqual(quantity.remaining_qty, 1000.0)
+
+    def test_contract_balance_approved_reset_and_reconfirm(self):
+        statement = self._create_statement(SMALL_STATEMENT, state='approved')
+        quantity = self._get_contract(self.products[0])
+        tracker = self.env['contractor.quantity.tracker'].search([
+            ('contractor_id', '=', self.contractor.id), ('product_id', '=', self.products[0].id)])
+        self.assertEqual(quantity.billed_qty, 5.0)
+        statement.action_reset_to_draft()
+        self.assertEqual(quantity.billed_qty, 0.0)
+        self.assertEqual(quantity.remaining_qty, 1000.0)
+        self.assertFalse(tracker.exists() and tracker.accumulated_quantity)
+        # Confirming again counts the statement once, not on top of the approved quantities
+        statement.action_confirm()
+        self.assertEqual(quantity.billed_qty, 5.0)
+        self.assertEqual(quantity.billed_value, 50.0)
+        self.assertEqual(quantity.remaining_qty, 995.0)
+        tracker = self.env['contractor.quantity.tracker'].search([
+            ('contractor_id', '=', self.contractor.id), ('product_id', '=', self.products[0].id)])
+        self.assertEqual(tracker.accumulated_quantity, 5.0)
+
+    def test_contract_quantity_as_of_statement_date(self):
+        earlier = self._create_statement(SMALL_STATEMENT)
+        earlier.statement_date = fields.Date.today() - timedelta(days=10)
+        contract = self._get_contract(self.products[0])
+        self.env['contract.quantity.revision'].create({
+            'contract_quantity_id': contract.id,
+            'name': 'VO-1',
+            'quantity': 500.0,
+            'date_from': fields.Date.today() - timedelta(days=5),
+        })
+        later = self._create_statement(SMALL_STATEMENT)
+        self.assertEqual(contract.quantity, 500.0)
+        self.assertEqual(earlier.statement_line_ids[0].contract_qty, 1000.0)
+        self.assertEqual(later.statement_line_ids[0].contract_qty, 500.0)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestDateDimension(ContractorStatementCommon):
+    """Period keys of the analysis from the date dimension"""
+
+    def _analysis(self, statements, fields):
+        self.env.flush_all()
+        rows = self.env['contractor.statement.analysis.report'].search_read(
+            [('name', 'in', statements.mapped('name'))], ['name', *fields])
+        return {row['name']: {field: row[field] for field in fields} for row in rows}
+
+    def test_iso_week_at_year_boundary(self):
+        day = self.env['contractor.date.dimension'].search([
+            ('company_id', '=', self.env.company.id), ('date', '=', date(2021, 1, 1))])
+        # 1 January 2021 is in the last ISO week of 2020: the label uses the ISO year as the key does
+        self.assertEqual((day.week_key, day.week_name), (202053, '2020-W53'))
+        self.assertEqual((day.month_key, day.quarter_key), (202101, 20211))
+
+    def test_fiscal_periods_per_company(self):
+        other_company = self.company_data_2['company']
+        other_company.fiscalyear_last_month = '3'
+        self.env.company.fiscalyear_last_month = '12'
+        main = self._create_statement(SMALL_STATEMENT, statement_date=date(2024, 4, 15))
+        other = self._create_statement(SMALL_STATEMENT, statement_date=date(2024, 4, 15),
+                                       journal_id=self.company_data_2['default_journal_misc'].id)
+        rows = self._analysis(main | other, ['month_key', 'quarter_key', 'week_key', 'fiscal_year', 'fiscal_period_key'])
+        self.assertEqual(rows[main.name], {
+            'month_key': 202404, 'quarter_key': 20242, 'week_key': 202416,
+            'fiscal_year': 2024, 'fiscal_period_key': 202404,
+        })
+        # Fiscal year ending in March: April opens fiscal year 2025
+        self.assertEqual(rows[other.name], {
+            'month_key': 202404, 'quarter_key': 20242, 'week_key': 202416,
+            'fiscal_year': 2025, 'fiscal_period_key': 202501,
+        })
+
+        other_company.fiscalyear_last_month = '6'
+        self.assertEqual(self._analysis(other, ['fiscal_period_key'])[other.name]['fiscal_period_key'], 202410)
+
+    def test_period_groups_are_chronological(self):
+        self.env.company.fiscalyear_last_month = '12'
+        statements = self._create_statement(SMALL_STATEMENT, statement_date=date(2024, 2, 1)) \
+            | self._create_statement(SMALL_STATEMENT, statement_date=date(2023, 12, 1)) \
+            | self._create_statement(SMALL_STATEMENT, statement_date=date(2024, 1, 1))
+        self.env.flush_all()
+        report = self.env['contractor.statement.analysis.report']
+        domain = [('name', 'in', statements.mapped('name'))]
+
+        def labels(groupby):
+            return [group[groupby] for group in report.read_group(domain, ['current_value:sum'], [groupby])]
+
+        # The group-bys of the search view: readable labels, in the order of the period keys
+        groups = report.read_group(domain, ['current_value:sum'], ['month_key'])
+        self.assertEqual([group['month_key'] for group in groups], [202312, 202401, 202402])
+        self.assertEqual(labels('statement_date:month'), ['December 2023', 'January 2024', 'February 2024'])
+        self.assertEqual(labels('statement_date:quarter'), ['Q4 2023', 'Q1 2024'])
+        self.assertEqual(labels('week'), ['2023-W48', '2024-W01', '2024-W05'])
+        self.assertEqual(labels('fiscal_period'), ['FY2023 P12', 'FY2024 P01', 'FY2024 P02'])
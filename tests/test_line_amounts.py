@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from odoo import Command, fields
+from odoo.tests import tagged
+
+from odoo.addons.constructor.models import contractor_statement
+
+from .common import ContractorStatementCommon
+
+
+@tagged('post_install', '-at_install')
+@unittest.skipIf(contractor_statement.numpy is None, "NumPy is not installed")
+class TestLineAmounts(ContractorStatementCommon):
+    """NumPy branch of the statement line amounts"""
+
+    def _line_commands(self):
+        return [Command.create({
+            'product_id': self.products[index % len(self.products)].id,
+            'current_qty': 5.0,
+            'unit_price': 10.0,
+        }) for index in range(contractor_statement.VECTORIZE_MIN_LINES)]
+
+    def test_vectorized_amounts_are_stored(self):
+        statement = self._create_statement(0, statement_line_ids=self._line_commands())
+        lines = statement.statement_line_ids
+        self.assertEqual(len(lines), contractor_statement.VECTORIZE_MIN_LINES)
+        lines.invalidate_recordset(['total_value'])
+        lines._compute_line_amounts()
+        lines.flush_recordset()
+        self.env.cr.execute("""
+            SELECT count(*), sum(current_value), sum(total_value), max(progress_percent)
+            FROM contractor_statement_line WHERE statement_id = %s
+        """, [statement.id])
+        self.assertEqual(self.env.cr.fetchone(), (len(lines), 50.0 * len(lines), 50.0 * len(lines), 0.5))
+
+    def test_vectorized_amounts_of_new_lines(self):
+        # Onchange works on new records, which the dirty cache does not accept
+        statement = self.env['contractor.statement'].new({
+            'project_id': self.project.id,
+            'work_type_id': self.work_type.id,
+            'contractor_id': self.contractor.id,
+            'work_period_from': fields.Date.today(),
+            'work_period_to': fields.Date.today(),
+            'statement_line_ids': self._line_commands(),
+        })
+        lines = statement.statement_line_ids
+        self.assertFalse(any(lines._ids))
+        lines._compute_line_amounts()
+        self.assertEqual(set(lines.mapped('total_value')), {50.0})
+        self.assertEqual(set(lines.mapped('current_value')), {50.0})
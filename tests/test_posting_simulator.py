@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestPostingSimulator(ContractorStatementCommon):
+    """Dry run of the approval postings"""
+
+    def test_simulate_posting_reports_blockers(self):
+        statement = self._create_statement(SMALL_STATEMENT, state='confirmed')
+        self.products[0].in_account_id = False
+        report = statement._simulate_posting()
+        self.assertEqual(len(report['blocked']), 1)
+        self.assertIn(self.products[0].name, report['blocked'][0]['blockers'][0])
+        self.assertAlmostEqual(report['debit'], report['credit'])
+        self.assertFalse(statement.move_id)
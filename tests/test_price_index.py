@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestPriceIndex(ContractorStatementCommon):
+    """Unit price index per project, contractor and product"""
+
+    def test_price_index_follows_confirmations(self):
+        first = self._create_statement(SMALL_STATEMENT, state='confirmed')
+        second = self._create_statement(SMALL_STATEMENT)
+        second.statement_line_ids[0].unit_price = 12.0
+        second.action_confirm()
+        line = second.statement_line_ids[0]
+        self.assertEqual(line.last_unit_price, 10.0)
+        self.assertTrue(line.price_deviates)
+        self.assertEqual(second._get_last_unit_prices([line.product_id.id]), {line.product_id.id: 12.0})
+        # Back to the first statement's price once the second one is reset
+        second.action_reset_to_draft()
+        self.assertEqual(first._get_last_unit_prices([line.product_id.id]), {line.product_id.id: 10.0})
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestProgressSnapshot(ContractorStatementCommon):
+    """Month-end progress snapshots"""
+
+    def _create_dated_statement(self, months_ago, state='draft'):
+        statement = self._create_statement(SMALL_STATEMENT)
+        statement.statement_date = fields.Date.today() - relativedelta(months=months_ago)
+        if state == 'confirmed':
+            statement.action_confirm()
+        return statement
+
+    def _cumulative_qty(self):
+        """{period end: cumulative quantity} of the first item, after the scheduled action ran"""
+        snapshots = self.env['contractor.progress.snapshot']
+        snapshots._cron_take_snapshots()
+        return {
+            snapshot.snapshot_date: snapshot.cumulative_qty
+            for snapshot in snapshots.search([
+                ('contractor_id', '=', self.contractor.id), ('product_id', '=', self.products[0].id)])
+        }
+
+    def test_snapshots_follow_late_confirmations_and_resets(self):
+        today = fields.Date.today()
+        periods = [today - relativedelta(months=months, day=31) for months in (2, 1)]
+        earlier = self._create_dated_statement(2, state='confirmed')
+        self._create_dated_statement(1, state='confirmed')
+        self.assertEqual(self._cumulative_qty(), dict(zip(periods, [5.0, 10.0])))
+
+        # Confirmed after both periods were taken: both are taken again
+        late = self._create_dated_statement(2, state='confirmed')
+        self.assertEqual(self._cumulative_qty(), dict(zip(periods, [10.0, 15.0])))
+
+        earlier.action_reset_to_draft()
+        self.assertEqual(self._cumulative_qty(), dict(zip(periods, [5.0, 10.0])))
+
+        # Unlinking a confirmed statement takes its period and the later ones off as well; nothing
+        # is billed before last month any more
+        late.unlink()
+        self.assertEqual(self._cumulative_qty(), {periods[1]: 5.0})
+
+    def test_current_period_confirmation_keeps_snapshots(self):
+        self._create_dated_statement(1, state='confirmed')
+        before = self._cumulative_qty()
+        self._create_dated_statement(0, state='confirmed')
+        self.env.cr.execute("SELECT COUNT(*) FROM contractor_progress_snapshot")
+        self.assertTrue(self.env.cr.fetchone()[0])
+        self.assertEqual(self._cumulative_qty(), before)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+from odoo import Command
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, LARGE_STATEMENT, SMALL_STATEMENT
+
+# Tolerated difference between the small and large statement before a path counts as O(lines)
+QUERY_SLACK = 3
+
+
+@tagged('post_install', '-at_install')
+class TestStatementQueryCounts(ContractorStatementCommon):
+    """Query-count ceilings of the statement hot paths.
+
+    Every path runs on a statement with few lines and one with many lines under the same
+    ceiling, and the two counts must stay within QUERY_SLACK of each other.
+    """
+
+    def assertFlatQueryCount(self, ceiling, operation, prepare):
+        """Run ``operation(prepare(line_count))`` for a small and a large statement"""
+        counts = []
+        for line_count in (SMALL_STATEMENT, LARGE_STATEMENT):
+            records = prepare(line_count)
+            self.env.flush_all()
+            self.env.invalidate_all()
+            with self.assertQueryCount(ceiling):
+                start = self.cr.sql_log_count
+                operation(records)
+                self.env.flush_all()
+                counts.append(self.cr.sql_log_count - start)
+        self.assertLessEqual(
+            counts[1] - counts[0], QUERY_SLACK,
+            f"Query count grows with the number of lines: {counts[0]} for {SMALL_STATEMENT} lines, "
+            f"{counts[1]} for {LARGE_STATEMENT} lines",
+        )
+
+    def test_statement_create(self):
+        self.assertFlatQueryCount(45, self._create_statement, lambda line_count: line_count)
+
+    def test_line_add(self):
+        def add_line(statement):
+            statement.write({'statement_line_ids': [Command.create({
+                'product_id': self.products[-1].id,
+                'current_qty': 1.0,
+                'unit_price': 10.0,
+            })]})
+        self.assertFlatQueryCount(30, add_line, self._create_statement)
+
+    def test_prefill_lines(self):
+        def prepare(line_count):
+            # A contractor whose BOQ holds exactly line_count items
+            contractor = self.env['res.partner'].create({'name': f'BOQ {line_count}', 'is_company': True})
+            self.env['contract.quantity'].create([{
+                'project_id': self.project.id,
+                'work_type_id': self.work_type.id,
+                'contractor_id': contractor.id,
+                'product_id': product.id,
+                'quantity': 1000.0,
+            } for product in self.products[:line_count]])
+            statement = self._create_statement(0)
+            statement.contractor_id = contractor
+            return statement
+        self.assertFlatQueryCount(35, lambda statement: statement.action_prefill_lines(), prepare)
+
+    def test_action_confirm(self):
+        self.assertFlatQueryCount(40, lambda statement: statement.action_confirm(), self._create_statement)
+
+    def test_action_reset_to_draft(self):
+        self.assertFlatQueryCount(
+            35, lambda statement: statement.action_reset_to_draft(),
+            lambda line_count: self._create_statement(line_count, state='confirmed'),
+        )
+
+    def test_action_approve(self):
+        self.assertFlatQueryCount(
+            200, lambda statement: statement.action_approve(),
+            lambda line_count: self._create_statement(line_count, state='confirmed'),
+        )
+
+    def test_action_mark_as_paid(self):
+        self.assertFlatQueryCount(
+            150, lambda statement: statement.action_mark_as_paid(),
+            lambda line_count: self._create_statement(line_count, state='approved'),
+        )
+
+    def test_unlink(self):
+        self.assertFlatQueryCount(
+            35, lambda statement: statement.unlink(),
+            lambda line_count: self._create_statement(line_count, state='confirmed'),
+        )
+
+    def test_analysis_report(self):
+        def read_analysis(statement):
+            self.env['contractor.statement.analysis.report'].read_group(
+                [('project_id', '=', self.project.id)],
+                ['net_payable:sum', 'gross_value:sum', 'progress_percent:avg'],
+                ['contractor_id'],
+            )
+        self.assertFlatQueryCount(
+            5, read_analysis,
+            lambda line_count: self._create_statement(line_count, state='confirmed'),
+        )
+
+    def test_simulate_posting(self):
+        self.assertFlatQueryCount(
+            40, lambda statement: statement._simulate_posting(),
+            lambda line_count: self._create_statement(line_count, state='confirmed'),
+        )
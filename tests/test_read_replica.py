@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from odoo.addons.constructor.models import read_replica
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestReadReplica(ContractorStatementCommon):
+    """Routing of reports to the read replica"""
+
+    def test_analysis_report_replica_fallback(self):
+        self._create_statement(SMALL_STATEMENT, state='confirmed')
+        report = self.env['contractor.statement.analysis.report']
+        args = ([('project_id', '=', self.project.id)], ['net_payable:sum'], ['contractor_id'])
+        expected = report.read_group(*args)
+        # Nothing listens on port 1: the query runs on the primary instead
+        self.env['ir.config_parameter'].sudo().set_param(
+            read_replica.REPLICA_PARAM, 'postgresql://localhost:1/unreachable')
+        self.assertEqual(report.read_group(*args), expected)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from odoo.addons.constructor.models.schema import backfill_stored_computes
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestSchema(ContractorStatementCommon):
+    """Set-based backfill of the stored computed columns"""
+
+    def test_backfill_repairs_stored_computes(self):
+        statement = self._create_statement(SMALL_STATEMENT)
+        line = statement.statement_line_ids[0]
+        contract = self._get_contract(self.products[0])
+        self.env.flush_all()
+        self.env.cr.execute("UPDATE contract_quantity SET display_name = NULL WHERE id = %s", [contract.id])
+        self.env.cr.execute("UPDATE contractor_statement_line SET total_value = 0, contract_qty = 0 WHERE id = %s", [line.id])
+        backfill_stored_computes(self.env.cr)
+        self.env.invalidate_all()
+        self.assertEqual(contract.display_name, f"Tower A - Concrete - Builder Co - {self.products[0].name}")
+        self.assertEqual(line.total_value, 50.0)
+        self.assertEqual(line.contract_qty, 1000.0)
+
+    def test_backfill_adds_previous_quantities(self):
+        self._create_statement(SMALL_STATEMENT, state='confirmed',
+                               statement_date=fields.Date.today() - timedelta(days=10))
+        later = self._create_statement(SMALL_STATEMENT)
+        self.env.flush_all()
+        self.env.cr.execute("ALTER TABLE contractor_statement_line DROP COLUMN prev_qty")
+        backfill_stored_computes(self.env.cr)
+        self.env.cr.execute("SELECT prev_qty FROM contractor_statement_line WHERE statement_id = %s", [later.id])
+        self.assertEqual({row[0] for row in self.env.cr.fetchall()}, {5.0})
+
+    def test_backfill_previous_quantities_from_tracker(self):
+        earlier = self._create_statement(SMALL_STATEMENT, state='confirmed',
+                                         statement_date=fields.Date.today() - timedelta(days=10))
+        later = self._create_statement(SMALL_STATEMENT)
+        trackers = self.env['contractor.quantity.tracker'].search([('contractor_id', '=', self.contractor.id)])
+        trackers.filtered(lambda tracker: tracker.product_id == self.products[0]).accumulated_quantity = 12.0
+        # Without tracker, the earlier statements are summed
+        trackers.filtered(lambda tracker: tracker.product_id == self.products[1]).unlink()
+        self.env.flush_all()
+        self.env.cr.execute("ALTER TABLE contractor_statement_line DROP COLUMN prev_qty")
+        backfill_stored_computes(self.env.cr)
+        self.env.cr.execute("""
+            SELECT statement_id, product_id, prev_qty FROM contractor_statement_line WHERE statement_id IN %s
+        """, [(earlier.id, later.id)])
+        backfilled = {row[:2]: row[2] for row in self.env.cr.fetchall()}
+        products = self.products[:SMALL_STATEMENT].ids
+        self.assertEqual(backfilled, {
+            (earlier.id, products[0]): 12.0, (earlier.id, products[1]): 0.0, (earlier.id, products[2]): 5.0,
+            (later.id, products[0]): 12.0, (later.id, products[1]): 5.0, (later.id, products[2]): 5.0,
+        })
+        # The values the compute gives
+        self.env.invalidate_all()
+        computed = (earlier | later).statement_line_ids._get_previous_quantities()
+        self.assertEqual({(line.statement_id.id, line.product_id.id): qty for line, qty in computed.items()}, backfilled)
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestStatementAccountReport(ContractorStatementCommon):
+    """Contractor statement of account"""
+
+    def test_statement_of_account_running_balance(self):
+        first = self._create_statement(SMALL_STATEMENT, state='approved')
+        first.action_mark_as_paid()
+        second = self._create_statement(SMALL_STATEMENT, state='approved')
+        self.env.flush_all()
+        entries = self.env['contractor.statement.account.report'].search_read(
+            [('contractor_id', '=', self.contractor.id), ('project_id', '=', self.project.id)],
+            ['entry_type', 'net_payable', 'payment', 'balance'])
+        self.assertEqual([entry['entry_type'] for entry in entries], ['statement', 'payment', 'statement'])
+        self.assertAlmostEqual(entries[0]['balance'], first.net_payable)
+        self.assertAlmostEqual(entries[1]['balance'], 0.0)
+        self.assertAlmostEqual(entries[2]['balance'], second.net_payable)
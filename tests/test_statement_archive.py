@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestStatementArchive(ContractorStatementCommon):
+    """Archiving of paid statements and their restore"""
+
+    def _analysis_totals(self):
+        groups = self.env['contractor.statement.analysis.report'].read_group(
+            [('project_id', '=', self.project.id)], ['current_value:sum', 'current_qty:sum'], ['is_archived'])
+        return {group['is_archived']: (group['current_value'], group['current_qty']) for group in groups}
+
+    def test_archive_restore_round_trip(self):
+        statement = self._create_statement(SMALL_STATEMENT, state='paid')
+        name, line_count, statement_id = statement.name, len(statement.statement_line_ids), statement.id
+        message = statement.message_post(body="Paid in full")
+        attachment = self.env['ir.attachment'].create({
+            'name': 'invoice.pdf',
+            'raw': b'%PDF',
+            'res_model': 'contractor.statement',
+            'res_id': statement_id,
+        })
+        statement.message_subscribe(partner_ids=self.contractor.ids)
+        price = self.env['contractor.price.index'].search([('product_id', '=', self.products[0].id)])
+        self.assertEqual(price.statement_id, statement)
+
+        archive = self.env['contractor.statement.archive']
+        self.assertEqual(archive.archive_statements(statement), 1)
+        self.assertFalse(statement.exists())
+        archived = archive.browse(statement_id)
+        self.assertEqual(archived.name, name)
+        self.assertEqual(len(archived.statement_line_ids), line_count)
+        self.assertEqual(message.model, archive._name)
+        self.assertEqual(attachment.res_model, archive._name)
+        followers = self.env['mail.followers'].search([('res_model', '=', archive._name), ('res_id', '=', statement_id)])
+        self.assertIn(self.contractor, followers.partner_id)
+        # The price stays, without the statement the live table no longer holds
+        self.assertFalse(price.statement_id)
+        self.assertEqual(price.unit_price, 10.0)
+
+        archived.action_restore()
+        statement = self.env['contractor.statement'].browse(statement_id)
+        self.assertFalse(archived.exists())
+        self.assertEqual(statement.name, name)
+        self.assertEqual(statement.state, 'paid')
+        self.assertEqual(len(statement.statement_line_ids), line_count)
+        self.assertIn(message, statement.message_ids)
+        self.assertEqual(attachment.res_model, 'contractor.statement')
+        self.assertIn(self.contractor, statement.message_partner_ids)
+        self.assertEqual(price.statement_id, statement)
+
+    def test_analysis_report_covers_archive(self):
+        paid = self._create_statement(SMALL_STATEMENT, state='paid')
+        paid_line_ids = paid.statement_line_ids.ids
+        self._create_statement(SMALL_STATEMENT, state='confirmed')
+        self.env.flush_all()
+        self.assertEqual(self._analysis_totals(), {False: (300.0, 30.0)})
+
+        self.env['contractor.statement.archive'].archive_statements(paid)
+        self.env.flush_all()
+        self.assertEqual(self._analysis_totals(), {False: (150.0, 15.0), True: (150.0, 15.0)})
+        # Same line ids in both branches of the view
+        live = self.env['contractor.statement.analysis.report'].search([
+            ('project_id', '=', self.project.id), ('is_archived', '=', False)])
+        archived = self.env['contractor.statement.analysis.report'].search([
+            ('project_id', '=', self.project.id), ('is_archived', '=', True)])
+        self.assertEqual(len(live), SMALL_STATEMENT)
+        self.assertEqual(set(archived.ids), set(paid_line_ids))
+        self.assertFalse(set(live.ids) & set(archived.ids))
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from odoo import Command
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestStatementExport(ContractorStatementCommon):
+    """NDJSON export paginated on (write_date, id)"""
+
+    def setUp(self):
+        super().setUp()
+        # The rows are streamed on a cursor of their own, which must see the test transaction
+        self.registry.enter_test_mode(self.cr)
+        self.addCleanup(self.registry.leave_test_mode)
+
+    def _export(self, statement, after=None, user=None):
+        export = self.env['contractor.statement.export']
+        if user:
+            export = export.with_user(user)
+        rows = export._iter_ndjson('lines', ['statement_id', 'current_value'], after)
+        return [row for row in map(json.loads, rows) if row['statement_id'] == statement.id]
+
+    def test_export_resumes_after_position(self):
+        statement = self._create_statement(SMALL_STATEMENT)
+        statement.flush_recordset()
+        rows = self._export(statement)
+        self.assertEqual(len(rows), SMALL_STATEMENT)
+        self.assertEqual({row['current_value'] for row in rows}, {50.0})
+        self.assertEqual(rows[0].keys(), {'write_date', 'id', 'statement_id', 'current_value'})
+        resumed = self._export(statement, (rows[0]['write_date'], str(rows[0]['id'])))
+        self.assertEqual([row['id'] for row in resumed], [row['id'] for row in rows[1:]])
+
+    def test_export_applies_record_rules(self):
+        statement = self._create_statement(SMALL_STATEMENT)
+        statement.flush_recordset()
+        user = self.env['res.users'].create({
+            'name': 'Site Engineer',
+            'login': 'site_engineer',
+            'groups_id': [Command.set(self.env.ref('base.group_user').ids)],
+        })
+        self.env['ir.rule'].create({
+            'name': 'Lines of the first product only',
+            'model_id': self.env['ir.model']._get_id('contractor.statement.line'),
+            'domain_force': f"[('product_id', '=', {self.products[0].id})]",
+            'groups': [Command.set(self.env.ref('base.group_user').ids)],
+        })
+        self.assertEqual(len(self._export(statement)), SMALL_STATEMENT)
+        rows = self._export(statement, user=user)
+        self.assertEqual([row['id'] for row in rows], statement.statement_line_ids.filtered(
+            lambda line: line.product_id == self.products[0]).ids)
+
+    def test_export_rejects_bad_position_before_streaming(self):
+        export = self.env['contractor.statement.export']
+        for after in [('yesterday', '1'), ('2024-01-01 00:00:00', 'x'), ('2024-13-01', '1')]:
+            with self.assertRaises(ValidationError):
+                export._iter_ndjson('lines', None, after)
+        with self.assertRaises(ValidationError):
+            export._iter_ndjson('lines', ['no_such_field'])
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from odoo.tests import tagged
+
+from odoo.addons.constructor.models import read_replica
+
+from .common import ContractorStatementCommon, LARGE_STATEMENT, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestStatementKpi(ContractorStatementCommon):
+    """Dashboard KPIs and their cache"""
+
+    def test_kpis_per_project(self):
+        statement = self._create_statement(SMALL_STATEMENT, state='approved')
+        kpis = self.env['contractor.statement.kpi'].get_kpis()
+        project = next(row for row in kpis['projects'] if row['id'] == self.project.id)
+        self.assertAlmostEqual(project['billed_to_date'], statement.gross_value)
+        self.assertAlmostEqual(project['retention_held'], statement.retention)
+        self.assertAlmostEqual(project['net_payable_outstanding'], statement.net_payable)
+        # Only the billed items have a price: 995 left on each at 10
+        self.assertAlmostEqual(project['remaining_contract_value'], SMALL_STATEMENT * 995 * 10.0)
+        self.assertEqual(project['progress_distribution']['0-25'], LARGE_STATEMENT + 1)
+
+    def test_cached_kpis_follow_the_generation(self):
+        kpi = self.env['contractor.statement.kpi']
+        etag, body = kpi.get_cached_kpis()
+        self.assertEqual(kpi.get_cached_kpis(), (etag, body))
+        # What the post-commit hook of a state change does
+        self.env.cr.execute("SELECT nextval('contractor_statement_kpi_generation')")
+        self.assertNotEqual(kpi.get_cached_kpis()[0], etag)
+
+    def test_cached_kpis_are_computed_on_the_primary(self):
+        self.env['ir.config_parameter'].sudo().set_param(read_replica.REPLICA_PARAM, 'postgresql://replica/db')
+
+        def open_replica_cursor(uri, dbname):
+            raise AssertionError("KPIs cached under the primary's generation must not be read on a replica")
+        self.patch(read_replica, 'open_replica_cursor', open_replica_cursor)
+        statement = self._create_statement(SMALL_STATEMENT, state='approved')
+        self.env.cr.execute("SELECT nextval('contractor_statement_kpi_generation')")
+        _etag, body = self.env['contractor.statement.kpi'].get_cached_kpis()
+        project = next(row for row in json.loads(body)['projects'] if row['id'] == self.project.id)
+        self.assertAlmostEqual(project['billed_to_date'], statement.gross_value)
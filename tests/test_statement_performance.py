@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+from odoo import Command
+from odoo.exceptions import AccessError
+from odoo.tests import tagged
+
+from odoo.addons.constructor.models import statement_performance
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestStatementPerformance(ContractorStatementCommon):
+    """Opt-in performance metrics of the statement hot paths"""
+
+    def test_metrics_are_buffered_per_method(self):
+        self.env['ir.config_parameter'].sudo().set_param(statement_performance.METRICS_PARAM, 'True')
+        self.addCleanup(statement_performance._buffer.clear)
+        # Keep the figures in the process buffer
+        self.patch(statement_performance, 'FLUSH_INTERVAL', float('inf'))
+        statement = self._create_statement(SMALL_STATEMENT)
+        statement.action_confirm()
+        calls, _wall, _max, _queries, _read, written = statement_performance._buffer[
+            (self.env.cr.dbname, 'contractor.statement.action_confirm')]
+        self.assertEqual(calls, 1)
+        self.assertGreater(written, 0)
+        self.assertIn((self.env.cr.dbname, 'contractor.statement.line._compute_line_amounts'), statement_performance._buffer)
+
+    def test_totals_beyond_32_bits(self):
+        stats = self.env['contractor.performance.stat']
+        stats._upsert({'contractor.statement.action_confirm': [1, 0.5, 0.5, 10, 3_000_000_000, 3_000_000_000]})
+        stats._upsert({'contractor.statement.action_confirm': [1, 0.5, 0.5, 10, 3_000_000_000, 1]})
+        body = stats.render_prometheus()
+        self.assertIn('contractor_statement_rows_read_total{method="contractor.statement.action_confirm"} 6000000000\n', body)
+
+    def _captures(self):
+        return self.env['ir.attachment'].search([
+            ('res_model', '=', 'contractor.performance.stat'), ('name', '=like', 'profile-%'),
+        ])
+
+    def test_profile_next_call_of_the_user(self):
+        # The capture is stored on a cursor of its own, which must see the test transaction
+        self.registry.enter_test_mode(self.cr)
+        self.addCleanup(self.registry.leave_test_mode)
+        statement = self._create_statement(SMALL_STATEMENT)
+        self.env.user.contractor_profile_calls = 1
+        statement.action_confirm()
+        captures = self._captures()
+        self.assertEqual(len(captures), 1)
+        self.assertIn(str(statement.id), captures.description)
+        self.env.invalidate_all()
+        self.assertEqual(self.env.user.contractor_profile_calls, 0)
+        # Nothing left to profile: the next call runs plainly
+        statement.action_reset_to_draft()
+        self.assertEqual(self.env['ir.attachment'].search_count([('id', 'in', captures.ids)]), 1)
+        self.assertEqual(self._captures(), captures)
+
+        # Only administrators can read the capture, and ask for one through the context
+        user = self.env['res.users'].create({
+            'name': 'Site Engineer',
+            'login': 'site_engineer',
+            'groups_id': [Command.set(self.env.ref('base.group_user').ids)],
+        })
+        with self.assertRaises(AccessError):
+            captures.with_user(user).read(['raw'])
+        statement.with_user(user).with_context(contractor_profile=True).action_confirm()
+        self.assertEqual(self._captures(), captures)
+
+    def test_explain_only_reruns_selects(self):
+        queries = [
+            {'query': "SELECT 1", 'duration_ms': 500.0},
+            {'query': "UPDATE res_partner SET name = name WHERE id = 0", 'duration_ms': 500.0},
+            {'query': "SELECT 2", 'duration_ms': 1.0},
+        ]
+        statement_performance._explain_slow_queries(self.env.cr, queries, 100)
+        self.assertIn('explain', queries[0])
+        self.assertNotIn('explain', queries[1])
+        self.assertNotIn('explain', queries[2])
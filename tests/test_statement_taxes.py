@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+from odoo import Command
+
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestStatementTaxes(ContractorStatementCommon):
+    """Tax amounts from the account.tax engine and the tax lines of the journal entries"""
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.tax = cls.company_data['default_tax_purchase'].copy({'name': 'VAT 10', 'amount': 10.0})
+        cls.included_tax = cls.company_data['default_tax_purchase'].copy({
+            'name': 'VAT 15 included',
+            'amount': 15.0,
+            'price_include': True,
+        })
+
+    def _backdate(self, taxes):
+        """Date the taxes and their repartition lines before the test transaction, which is when
+        the records edited by the test are written"""
+        repartition_lines = taxes.invoice_repartition_line_ids | taxes.refund_repartition_line_ids
+        for records in (taxes, repartition_lines):
+            self.env.flush_all()
+            self.env.cr.execute(f"""
+                UPDATE {records._table} SET write_date = write_date - interval '1 day' WHERE id IN %s
+            """, [tuple(records.ids)])
+            records.invalidate_recordset(['write_date'])
+
+    def test_tax_amount_follows_repartition_changes(self):
+        self._backdate(self.tax)
+        statement = self._create_statement(SMALL_STATEMENT, tax_ids=[Command.set(self.tax.ids)])
+        self.assertAlmostEqual(statement.tax_amount, 15.0)
+        self.assertAlmostEqual(statement.subtotal, 165.0)
+
+        # Edited on the repartition lines alone: the tax's own write date does not move
+        tax_lines = (self.tax.invoice_repartition_line_ids | self.tax.refund_repartition_line_ids).filtered(
+            lambda line: line.repartition_type == 'tax')
+        tax_lines.factor_percent = 50.0
+        self.env.add_to_compute(statement._fields['tax_amount'], statement)
+        self.assertAlmostEqual(statement.tax_amount, 7.5)
+        self.assertAlmostEqual(statement.subtotal, 157.5)
+
+    def test_group_tax_results_follow_children(self):
+        group = self.env['account.tax'].create({
+            'name': 'VAT group',
+            'amount_type': 'group',
+            'type_tax_use': 'purchase',
+            'children_tax_ids': [Command.set(self.tax.ids)],
+        })
+        self._backdate(group | self.tax)
+        statement = self._create_statement(SMALL_STATEMENT, tax_ids=[Command.set(group.ids)])
+        self.assertAlmostEqual(statement.tax_amount, 15.0)
+        self.tax.amount = 20.0
+        self.env.add_to_compute(statement._fields['tax_amount'], statement)
+        self.assertAlmostEqual(statement.tax_amount, 30.0)
+
+    def test_tax_results_follow_rounding_method(self):
+        statement = self._create_statement(SMALL_STATEMENT, tax_ids=[Command.set(self.tax.ids)], statement_line_ids=[
+            Command.create({'product_id': self.products[0].id, 'current_qty': 1.0, 'unit_price': 150.05}),
+        ])
+        # 10% of 150.05: rounded to the cent per line, kept unrounded when rounding globally
+        self.env.company.tax_calculation_rounding_method = 'round_per_line'
+        self.assertAlmostEqual(statement._get_tax_results()[statement]['taxes'][0]['amount'], 15.01)
+        self.env.company.tax_calculation_rounding_method = 'round_globally'
+        self.assertAlmostEqual(statement._get_tax_results()[statement]['taxes'][0]['amount'], 15.005, places=5)
+
+    def test_price_included_tax_move_vals(self):
+        statement = self._create_statement(SMALL_STATEMENT, tax_ids=[Command.set(self.included_tax.ids)])
+        # 150 tax included: 130.43 net and 19.57 of tax
+        self.assertAlmostEqual(statement.tax_amount, 19.57)
+        self.assertAlmostEqual(statement.subtotal, 150.0)
+
+        move_vals = statement._prepare_move_vals()[statement]
+        lines = [vals for _command, _id, vals in move_vals['line_ids']]
+        product_debits = [line['debit'] for line in lines[:SMALL_STATEMENT]]
+        # 50 / 1.15 = 43.478 rounds to 43.48 three times; the cent too many comes off the last line
+        self.assertEqual(product_debits[:-1], [43.48] * (SMALL_STATEMENT - 1))
+        self.assertAlmostEqual(product_debits[-1], 43.47)
+        self.assertAlmostEqual(sum(product_debits), 130.43)
+        tax_line = lines[SMALL_STATEMENT]
+        self.assertTrue(tax_line['name'].startswith('Tax - '))
+        self.assertAlmostEqual(tax_line['debit'], 19.57)
+        self.assertAlmostEqual(sum(line['debit'] for line in lines), sum(line['credit'] for line in lines))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+from odoo import fields
+from odoo.exceptions import ValidationError
+
+from odoo.tests import tagged
+
+from .common import ContractorStatementCommon, SMALL_STATEMENT
+
+
+@tagged('post_install', '-at_install')
+class TestStatementWorkflow(ContractorStatementCommon):
+    """State transitions, numbering and locking of statements"""
+
+    def test_statement_create_numbers_in_bulk(self):
+        first = self._create_statement(SMALL_STATEMENT)
+        number = int(first.name.rsplit('-', 1)[1])
+        statements = self.env['contractor.statement'].create([{
+            'project_id': self.project.id,
+            'work_type_id': self.work_type.id,
+            'contractor_id': self.contractor.id,
+            'work_period_from': fields.Date.today(),
+            'work_period_to': fields.Date.today(),
+        } for _ in range(3)])
+        self.assertEqual(statements.mapped('name'), [
+            f'TWA-CON-{number + i:03d}' for i in (1, 2, 3)
+        ])
+
+    def test_action_confirm_locks_tracker_keys(self):
+        statements = self._create_statement(SMALL_STATEMENT) | self._create_statement(SMALL_STATEMENT)
+        statements.action_confirm()
+        self.cr.execute("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND pid = pg_backend_pid()")
+        self.assertGreaterEqual(self.cr.fetchone()[0], SMALL_STATEMENT)
+        trackers = self.env['contractor.quantity.tracker'].search([('contractor_id', '=', self.contractor.id)])
+        self.assertEqual(set(trackers.mapped('accumulated_quantity')), {10.0})
+
+    def test_action_approve_and_pay_are_idempotent(self):
+        statement = self._create_statement(SMALL_STATEMENT, state='confirmed')
+        statement.action_approve()
+        move = statement.move_id
+        statement.action_approve()
+        self.assertEqual(statement.move_id, move)
+        self.assertEqual(self.env['account.move'].search_count([('ref', '=', statement.name)]), 1)
+
+        statement.action_mark_as_paid()
+        payment = statement.payment_id
+        statement.action_mark_as_paid()
+        self.assertEqual(statement.payment_id, payment)
+        self.assertEqual(statement.state, 'paid')
+
+    def test_transitions_apply_to_the_whole_recordset(self):
+        statements = self._create_statement(SMALL_STATEMENT) | self._create_statement(SMALL_STATEMENT)
+        statements.action_confirm()
+        self.assertEqual(set(statements.mapped('state')), {'confirmed'})
+        self.assertEqual(statements.confirmed_by, self.env.user)
+        tracker = self.env['contractor.quantity.tracker'].search([
+            ('contractor_id', '=', self.contractor.id), ('product_id', '=', self.products[0].id)])
+        self.assertEqual(tracker.accumulated_quantity, 10.0)
+
+        statements.action_reset_to_draft()
+        self.assertEqual(set(statements.mapped('state')), {'draft'})
+        self.assertFalse(self.env['contractor.quantity.tracker'].search([('contractor_id', '=', self.contractor.id)]))
+
+    def test_transition_guards(self):
+        paid = self._create_statement(SMALL_STATEMENT, state='paid')
+        draft = self._create_statement(SMALL_STATEMENT)
+        with self.assertRaises(ValidationError):
+            (draft | paid).action_reset_to_draft()
+        approved = self._create_statement(SMALL_STATEMENT, state='approved')
+        with self.assertRaises(ValidationError):
+            (draft | approved).unlink()
+        self.assertTrue(draft.exists())